@@ -26,9 +26,11 @@ class GenerateKeysFrame(ctk.CTkFrame):
     # @brief Constructor. Initializes UI layout, USB monitor, and labels.
     # @param parent The parent frame.
     # @param controller The main controller to access app dimensions and state transitions.
-    def __init__(self, parent, controller):
+    # @param usb_backend Drive backend for the USB monitor (None = platform default, see `drive_backends`).
+    def __init__(self, parent, controller, usb_backend=None):
         super().__init__(parent)
         self.dir_path = None
+        self.key_pool = controller.get_key_pool()
         title = ctk.CTkLabel(self, text="RSA Key Generation",
                              fg_color="transparent",
                              height=(controller.get_height() / 5),
@@ -84,7 +86,7 @@ class GenerateKeysFrame(ctk.CTkFrame):
         self.empty.pack(pady=5)
 
         self.running_animation = False
-        self.usb_monitor = USBMonitor(self.update_ui)
+        self.usb_monitor = USBMonitor(self.update_ui, usb_backend)
         self.usb_monitor.start_monitoring()
         self.usb_monitor.initial_drive_check()
 
@@ -127,9 +129,13 @@ class GenerateKeysFrame(ctk.CTkFrame):
 
     ##
     # @brief Worker thread that generates RSA key pair using `utils.generate_key_pair`.
+    #
+    # Takes a pre-generated key from the key pool, so usually only encryption is left to do.
+    #
     # @param pwd The password used to encrypt the private key.
     def gen_thread(self, pwd):
-        utils.generate_key_pair(self.dir_path, self.usb_monitor.get_drive(), pwd)
+        key = self.key_pool.take()
+        utils.generate_key_pair(self.dir_path, self.usb_monitor.get_drive(), pwd, key=key)
         self.running_animation = False
         self.private_key_label.configure(text="Key pair generated!")
         self.generate_button.configure(state="normal")
@@ -0,0 +1,254 @@
+##
+# @file drive_backends.py
+# @brief Platform backends used by `USBMonitor` to list removable drives and watch for changes.
+#
+# - `Win32Backend`: removable drives from the Win32 API, changes from `WM_DEVICECHANGE` messages,
+# - `LinuxBackend`: mount points under `/media` and `/run/media`, changes detected by polling,
+# - `FakeBackend`: scripted plug/unplug of ordinary directories for tests and benchmarks.
+#
+# The same module is shipped with PdfSigningApp and KeyGenerationApp.
+
+import os
+import re
+import sys
+import threading
+import time
+
+##
+# @class DriveBackend
+# @brief Interface of a removable drive backend.
+class DriveBackend:
+    ##
+    # @brief Returns the currently attached removable drives.
+    # @return List of drive root paths.
+    def get_removable_drives(self):
+        raise NotImplementedError
+
+    ##
+    # @brief Watches for drive changes until the process ends or `stop()` is called.
+    #
+    # Blocks the calling thread. `on_change` is called (on that thread) whenever
+    # drives may have been attached or removed; the caller compares drive lists itself.
+    #
+    # @param on_change Callback without arguments.
+    def run(self, on_change):
+        raise NotImplementedError
+
+    ##
+    # @brief Stops `run()` if the backend supports it.
+    def stop(self):
+        pass
+
+    ##
+    # @brief Returns an identifier of the volume mounted at the drive.
+    # @param drive Drive root path.
+    # @return Volume serial/UUID, or None if unknown.
+    def get_volume_serial(self, drive):
+        return None
+
+##
+# @class Win32Backend
+# @brief Windows backend based on `win32api` and a hidden window receiving `WM_DEVICECHANGE`.
+class Win32Backend(DriveBackend):
+    # Windows USB Events
+    # https://learn.microsoft.com/en-us/windows/win32/devio/wm-devicechange
+    WM_DEVICECHANGE = 0x0219
+    DBT_DEVICEARRIVAL = 0x8000
+    DBT_DEVICEREMOVECOMPLETE = 0x8004
+
+    def __init__(self):
+        import win32api
+        import win32con
+        import win32file
+        import win32gui
+        self.win32api = win32api
+        self.win32con = win32con
+        self.win32file = win32file
+        self.win32gui = win32gui
+        self.hwnd = None
+        self.on_change = None
+
+    def get_removable_drives(self):
+        drives = [i for i in self.win32api.GetLogicalDriveStrings().split('\\\x00') if i]
+        return [d for d in drives if self.win32file.GetDriveType(d) == self.win32con.DRIVE_REMOVABLE]
+
+    def run(self, on_change):
+        self.on_change = on_change
+        wc = self.win32gui.WNDCLASS()
+        wc.lpfnWndProc = self.window_proc
+        wc.lpszClassName = "USBMonitorWindow"
+        wc.hInstance = self.win32gui.GetModuleHandle(None)
+        class_atom = self.win32gui.RegisterClass(wc)
+        self.hwnd = self.win32gui.CreateWindow(class_atom, "USB Monitor", 0, 0, 0, 0, 0, 0, 0, wc.hInstance, None)
+        self.win32gui.PumpMessages()
+
+    ##
+    # @brief Handles Windows messages for USB plug/unplug events.
+    def window_proc(self, hwnd, msg, wparam, lparam):
+        if msg == self.WM_DEVICECHANGE and wparam in (self.DBT_DEVICEARRIVAL, self.DBT_DEVICEREMOVECOMPLETE):
+            self.on_change()
+        return 0
+
+    def get_volume_serial(self, drive):
+        try:
+            return self.win32api.GetVolumeInformation(drive)[1]
+        except Exception:
+            return None
+
+##
+# @brief Decodes a field of `/proc/mounts`, where space, tab, newline and backslash
+# are written as octal escapes (e.g. `\040` for a space).
+# @param field Field as read from the file.
+# @return Decoded field.
+def _unescape_mount_field(field):
+    return re.sub(r"\\([0-7]{3})", lambda m: chr(int(m.group(1), 8)), field)
+
+##
+# @class LinuxBackend
+# @brief Linux backend: removable media are the mount points under the desktop automount roots.
+#
+# Covers `/media/<label>`, `/media/<user>/<label>` (Debian/Ubuntu) and
+# `/run/media/<user>/<label>` (Fedora, Arch). Changes are detected by polling.
+class LinuxBackend(DriveBackend):
+    MOUNT_ROOTS = ("/media", "/run/media")
+    MOUNTS_FILE = "/proc/mounts"
+    BY_UUID_DIR = "/dev/disk/by-uuid"
+
+    ##
+    # @param poll_interval Seconds between two checks of the mount points.
+    # @param mount_roots Directories searched for mount points.
+    def __init__(self, poll_interval=1.0, mount_roots=MOUNT_ROOTS):
+        self.poll_interval = poll_interval
+        self.mount_roots = mount_roots
+        self.stop_event = threading.Event()
+
+    def get_removable_drives(self):
+        drives = []
+        for root in self.mount_roots:
+            for path in self._subdirs(root):
+                if os.path.ismount(path):
+                    drives.append(path)
+                else:
+                    drives.extend(p for p in self._subdirs(path) if os.path.ismount(p))
+        return sorted(drives)
+
+    def run(self, on_change):
+        drives = self.get_removable_drives()
+        while not self.stop_event.wait(self.poll_interval):
+            new_drives = self.get_removable_drives()
+            if new_drives != drives:
+                drives = new_drives
+                on_change()
+
+    def stop(self):
+        self.stop_event.set()
+
+    ##
+    # @brief Returns the filesystem UUID of the device mounted at the drive.
+    def get_volume_serial(self, drive):
+        try:
+            with open(self.MOUNTS_FILE) as f:
+                devices = [_unescape_mount_field(fields[0]) for fields in map(str.split, f)
+                           if len(fields) > 1 and _unescape_mount_field(fields[1]) == drive]
+            if not devices:
+                return None
+            device = os.path.realpath(devices[-1])
+            for uuid in os.listdir(self.BY_UUID_DIR):
+                if os.path.realpath(os.path.join(self.BY_UUID_DIR, uuid)) == device:
+                    return uuid
+        except OSError:
+            pass
+        return None
+
+    @staticmethod
+    def _subdirs(path):
+        try:
+            with os.scandir(path) as entries:
+                return [entry.path for entry in entries if entry.is_dir(follow_symlinks=False)]
+        except OSError:
+            return []
+
+##
+# @class FakeBackend
+# @brief Scripted backend for tests and benchmarks: ordinary directories act as drives.
+#
+# Drives are "plugged" and "unplugged" with `plug()` / `unplug()`, or by replaying
+# a script of `(delay_seconds, "plug" | "unplug", path)` steps with `play()`.
+# Change notifications are delivered on the thread running `run()`, like real backends do.
+class FakeBackend(DriveBackend):
+    ##
+    # @param drives Directories attached from the start.
+    # @param script Optional list of `(delay_seconds, action, path)` steps for `play()`.
+    def __init__(self, drives=(), script=()):
+        self.drives = list(drives)
+        self.script = list(script)
+        self.serials = {}
+        self.condition = threading.Condition()
+        self.changes = 0
+        self.stopped = False
+
+    def get_removable_drives(self):
+        with self.condition:
+            return list(self.drives)
+
+    def run(self, on_change):
+        delivered = 0
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: self.changes > delivered or self.stopped)
+                if self.stopped:
+                    return
+                delivered = self.changes
+            on_change()
+
+    def stop(self):
+        with self.condition:
+            self.stopped = True
+            self.condition.notify_all()
+
+    def get_volume_serial(self, drive):
+        return self.serials.get(drive)
+
+    ##
+    # @brief Simulates attaching a drive.
+    # @param path Directory acting as the drive root.
+    # @param serial Optional volume serial reported for the drive.
+    def plug(self, path, serial=None):
+        with self.condition:
+            if path not in self.drives:
+                self.drives.append(path)
+            if serial is not None:
+                self.serials[path] = serial
+            self.changes += 1
+            self.condition.notify_all()
+
+    ##
+    # @brief Simulates removing a drive.
+    # @param path Directory acting as the drive root.
+    def unplug(self, path):
+        with self.condition:
+            if path in self.drives:
+                self.drives.remove(path)
+            self.changes += 1
+            self.condition.notify_all()
+
+    ##
+    # @brief Replays the script on a background thread.
+    # @return The started thread.
+    def play(self):
+        def replay():
+            for delay, action, path in self.script:
+                time.sleep(delay)
+                getattr(self, action)(path)
+
+        thread = threading.Thread(target=replay, daemon=True)
+        thread.start()
+        return thread
+
+##
+# @brief Creates the backend for the current platform.
+# @return `Win32Backend` on Windows, `LinuxBackend` elsewhere.
+def default_backend():
+    if sys.platform == "win32":
+        return Win32Backend()
+    return LinuxBackend()
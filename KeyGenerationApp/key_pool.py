@@ -0,0 +1,172 @@
+##
+# @file key_pool.py
+# @brief Background pre-generation of RSA keys.
+#
+# Generating a 4096-bit RSA key takes seconds to tens of seconds. The pool fills
+# a bounded number of keys in worker processes while the application is idle,
+# so a "Generate Keys" click only has to take a ready key and encrypt it.
+#
+# Keys are kept in memory only and are never written to disk unencrypted.
+# They are not wiped: the DER arrives from the worker as immutable `bytes` and
+# `RsaKey` holds plain integers, so Python cannot reliably overwrite them.
+# On shutdown unused keys are dropped and the workers are terminated, also
+# in the middle of a generation, so closing the window ends the process at once.
+#
+# A failed generation is retried after `RETRY_DELAY` seconds, doubling with every
+# failure in a row up to `MAX_RETRY_DELAY`, so a broken worker does not spin.
+
+from collections import deque
+import multiprocessing
+from Cryptodome.PublicKey import RSA
+import threading
+
+# Default number of keys kept ready
+DEFAULT_POOL_SIZE = 2
+
+# Size of generated keys in bits
+KEY_SIZE = 4096
+
+# Delay before the first retry after a failed generation and its upper bound (s)
+RETRY_DELAY = 1.0
+MAX_RETRY_DELAY = 60.0
+
+##
+# @brief Generates an RSA key in a worker process.
+# @param bits Size of the key in bits.
+# @return Unencrypted DER encoding of the private key (sent back through a pipe, never to disk).
+def _generate_key_der(bits):
+    return RSA.generate(bits).export_key(format="DER")
+
+##
+# @class KeyPool
+# @brief Bounded pool of pre-generated RSA keys filled by worker processes.
+#
+# Usage:
+# - `start()` at application startup begins filling the pool,
+# - `take()` returns a ready key (waiting for one if necessary) and schedules a refill,
+# - `shutdown()` terminates the workers and drops keys that were not taken.
+class KeyPool:
+    ##
+    # @brief Creates an empty pool.
+    # @param size Maximum number of ready keys kept in memory.
+    # @param bits Size of generated keys in bits.
+    def __init__(self, size=DEFAULT_POOL_SIZE, bits=KEY_SIZE):
+        self.size = size
+        self.bits = bits
+        self.workers = None
+
+        # Ready keys as DER-encoded `bytes`
+        self.ready = deque()
+        self.pending = 0
+        self.closed = False
+        self.condition = threading.Condition()
+
+        # Generations failed in a row and the timer of the scheduled retry
+        self.failures = 0
+        self.retry_timer = None
+
+    ##
+    # @brief Starts filling the pool in the background.
+    #
+    # The workers of `multiprocessing.Pool` are daemonic and can be terminated,
+    # unlike those of `ProcessPoolExecutor`, which are joined at interpreter exit.
+    def start(self):
+        with self.condition:
+            if self.workers is None and not self.closed:
+                self.workers = multiprocessing.Pool(processes=self.size)
+                self._refill()
+
+    ##
+    # @brief Returns a ready key, waiting for a worker if the pool is empty.
+    #
+    # If the pool was not started (or is already shut down) the key is generated
+    # in the calling thread, exactly like before the pool existed.
+    #
+    # @param timeout Maximum time to wait in seconds (None = wait as long as needed).
+    # @return `RsaKey` object.
+    # @throws TimeoutError If no key became ready within the timeout.
+    def take(self, timeout=None):
+        with self.condition:
+            key_der = None
+            if self.workers is not None:
+                # Without pending jobs (e.g. the workers failed) no key will ever arrive
+                if not self.condition.wait_for(lambda: self.ready or self.closed or not self.pending, timeout):
+                    raise TimeoutError("No pre-generated RSA key is ready")
+                if self.ready:
+                    key_der = self.ready.popleft()
+                    self._refill()
+
+        if key_der is None:
+            return RSA.generate(self.bits)
+        return RSA.import_key(key_der)
+
+    ##
+    # @brief Returns the number of keys ready to be taken.
+    # @return Number of ready keys.
+    def ready_count(self):
+        with self.condition:
+            return len(self.ready)
+
+    ##
+    # @brief Terminates the workers, including running generations, and drops all keys that were not taken.
+    def shutdown(self):
+        with self.condition:
+            self.closed = True
+            workers = self.workers
+            self.workers = None
+            self.ready.clear()
+            if self.retry_timer is not None:
+                self.retry_timer.cancel()
+                self.retry_timer = None
+            self.condition.notify_all()
+
+        if workers is not None:
+            workers.terminate()
+            workers.join()
+
+    ##
+    # @brief Submits generation jobs until ready plus pending keys reach the pool size.
+    #
+    # Must be called with `condition` held.
+    def _refill(self):
+        while not self.closed and len(self.ready) + self.pending < self.size:
+            try:
+                self.workers.apply_async(_generate_key_der, (self.bits,),
+                                         callback=self._on_generated, error_callback=self._on_failed)
+            except ValueError:
+                # Pool no longer running, `take()` falls back to generating in place
+                return
+            self.pending += 1
+
+    ##
+    # @brief Stores a key produced by a worker (runs on the pool's result thread).
+    # @param key_der DER encoding returned by `_generate_key_der`.
+    def _on_generated(self, key_der):
+        with self.condition:
+            self.pending -= 1
+            self.failures = 0
+            if not self.closed:
+                self.ready.append(key_der)
+            self.condition.notify_all()
+
+    ##
+    # @brief Records a failed generation and schedules a retry (runs on the pool's result thread).
+    # @param error Exception raised in the worker.
+    def _on_failed(self, error):
+        with self.condition:
+            self.pending -= 1
+            self.failures += 1
+            if not self.closed and self.retry_timer is None:
+                delay = min(RETRY_DELAY * 2 ** (self.failures - 1), MAX_RETRY_DELAY)
+                self.retry_timer = threading.Timer(delay, self._retry)
+                self.retry_timer.daemon = True
+                self.retry_timer.start()
+            self.condition.notify_all()
+
+    ##
+    # @brief Refills the pool after the retry delay (runs on the timer thread).
+    def _retry(self):
+        with self.condition:
+            self.retry_timer = None
+            if self.workers is not None:
+                self._refill()
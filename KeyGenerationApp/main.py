@@ -6,6 +6,7 @@
 # and manages switching between different frames (views).
 
 import customtkinter as ctk
+from key_pool import KeyPool
 from UI.generate_keys_frame import GenerateKeysFrame
 
 ctk.set_appearance_mode("dark")
@@ -20,7 +21,9 @@ class MainApp(ctk.CTk):
     # @brief Initializes the main application window.
     #
     # Sets the window size, centers it, and initializes the first frame.
-    def __init__(self):
+    #
+    # @param usb_backend Drive backend for the USB monitor (None = platform default, see `drive_backends`).
+    def __init__(self, usb_backend=None):
         super().__init__()
 
         # Initial settings
@@ -38,13 +41,19 @@ class MainApp(ctk.CTk):
         self.geometry(f"{self.window_width}x{self.window_height}+{x}+{y}")
         self.resizable(False, False)
 
+        # Start generating RSA keys in the background right away
+        self.key_pool = KeyPool()
+        self.key_pool.start()
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+
         self.container = ctk.CTkFrame(self)
         self.container.pack(fill="both", expand=True)
 
         self.frames = {}
 
         # Load initial frame
-        self.frames["GenerateKeysFrame"] = GenerateKeysFrame(self.container, controller=self)
+        self.frames["GenerateKeysFrame"] = GenerateKeysFrame(self.container, controller=self,
+                                                           usb_backend=usb_backend)
         self.frames["GenerateKeysFrame"].grid(row=0, column=0, sticky="nsew")
         self.show_frame("GenerateKeysFrame")
 
@@ -56,6 +65,19 @@ class MainApp(ctk.CTk):
         frame = self.frames[page_name]
         frame.tkraise()
 
+    ##
+    # @brief Returns the pool of pre-generated RSA keys.
+    #
+    # @return `KeyPool` instance shared by all frames.
+    def get_key_pool(self):
+        return self.key_pool
+
+    ##
+    # @brief Stops the key pool workers and closes the window.
+    def on_close(self):
+        self.key_pool.shutdown()
+        self.destroy()
+
     ##
     # @brief Returns the width of the application window.
     #
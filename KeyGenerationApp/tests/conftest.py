@@ -0,0 +1,14 @@
+##
+# @file conftest.py
+# @brief Shared setup of the KeyGenerationApp tests.
+#
+# The application modules are flat (`import utils`), so the application directory
+# is put on `sys.path`. Run the suite from the repository root with
+# `python -m pytest KeyGenerationApp/tests`.
+
+import os
+import sys
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPO_DIR = os.path.dirname(APP_DIR)
+sys.path.insert(0, APP_DIR)
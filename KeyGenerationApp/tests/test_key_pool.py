@@ -0,0 +1,87 @@
+##
+# @file test_key_pool.py
+# @brief Background key pool: taking keys, fallback, retries and shutdown.
+
+import multiprocessing
+import threading
+import time
+import key_pool
+from key_pool import KeyPool
+
+# Small keys keep the tests fast
+BITS = 1024
+
+def test_take_returns_pooled_key():
+    pool = KeyPool(size=1, bits=BITS)
+    pool.start()
+    try:
+        key = pool.take(timeout=60)
+        assert key.has_private()
+        assert key.size_in_bits() == BITS
+
+        # Taking a key schedules a refill
+        deadline = time.monotonic() + 60
+        while pool.ready_count() < 1:
+            assert time.monotonic() < deadline
+            time.sleep(0.05)
+    finally:
+        pool.shutdown()
+
+def test_take_without_start_generates_in_place():
+    pool = KeyPool(size=1, bits=BITS)
+
+    assert pool.take().size_in_bits() == BITS
+
+def test_shutdown_terminates_running_generations():
+    # 8192-bit keys take far longer than the shutdown may
+    pool = KeyPool(size=2, bits=8192)
+    pool.start()
+    time.sleep(0.5)
+
+    started = time.monotonic()
+    pool.shutdown()
+
+    assert time.monotonic() - started < 5
+    assert multiprocessing.active_children() == []
+    assert pool.ready_count() == 0
+
+def test_take_after_shutdown_generates_in_place():
+    pool = KeyPool(size=1, bits=BITS)
+    pool.start()
+    pool.shutdown()
+
+    assert pool.take(timeout=1).size_in_bits() == BITS
+
+def test_failed_generation_is_retried_with_backoff(monkeypatch):
+    delays = []
+
+    class RecordingTimer(threading.Timer):
+        def __init__(self, interval, function):
+            delays.append(interval)
+            super().__init__(interval, function)
+
+    monkeypatch.setattr(key_pool, "RETRY_DELAY", 0.05)
+    monkeypatch.setattr(key_pool, "MAX_RETRY_DELAY", 0.1)
+    monkeypatch.setattr(key_pool.threading, "Timer", RecordingTimer)
+
+    # Keys below 1024 bits are rejected by the worker
+    pool = KeyPool(size=1, bits=512)
+    pool.start()
+    try:
+        deadline = time.monotonic() + 60
+        while len(delays) < 3:
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+        assert delays[:3] == [0.05, 0.1, 0.1]
+
+        # Once generation works again the retry fills the slot
+        pool.bits = BITS
+        while pool.ready_count() < 1:
+            assert time.monotonic() < deadline
+            time.sleep(0.05)
+        assert pool.failures == 0
+        assert pool.take(timeout=1).size_in_bits() == BITS
+    finally:
+        pool.shutdown()
+
+    assert pool.retry_timer is None
@@ -0,0 +1,49 @@
+##
+# @file test_provision.py
+# @brief Batch provisioning of key pairs: manifest, failures and signer names.
+
+import json
+import os
+import pytest
+from Cryptodome.PublicKey import RSA
+import utils
+
+def _manifest(public_dir):
+    with open(os.path.join(public_dir, utils.MANIFEST_NAME), encoding="utf-8") as f:
+        return json.load(f)
+
+def test_provision_writes_keys_and_manifest(tmp_path):
+    public_dir = str(tmp_path / "public")
+    private_path = str(tmp_path / "alice.pem")
+
+    entries = utils.provision_key_pairs([("alice", private_path, "pw")], public_dir, max_workers=1, profile="low")
+
+    assert _manifest(public_dir) == entries
+    with open(private_path, "rb") as f:
+        key = RSA.import_key(f.read(), passphrase="pw")
+    assert entries[0]["fingerprint"] == utils.public_key_fingerprint(key)
+    assert os.path.exists(os.path.join(public_dir, "alice_public_key.pem"))
+
+def test_failed_signer_keeps_the_others_in_manifest(tmp_path):
+    public_dir = str(tmp_path / "public")
+    signers = [
+        ("alice", str(tmp_path / "alice.pem"), "pw"),
+        ("bob", str(tmp_path / "missing" / "bob.pem"), "pw"),
+    ]
+
+    with pytest.raises(utils.ProvisioningError) as error:
+        utils.provision_key_pairs(signers, public_dir, max_workers=2, profile="low")
+
+    assert [name for name, _ in error.value.failures] == ["bob"]
+    assert [entry["name"] for entry in _manifest(public_dir)] == ["alice"]
+    assert sorted(os.listdir(public_dir)) == ["alice_public_key.pem", utils.MANIFEST_NAME]
+
+@pytest.mark.parametrize("name", ["../evil", "a/b", "..", "", ".hidden", "a b"])
+def test_unsafe_names_are_rejected(tmp_path, name):
+    public_dir = tmp_path / "public"
+
+    with pytest.raises(ValueError):
+        utils.provision_key_pairs([(name, str(tmp_path / "key.pem"), "pw")], str(public_dir))
+
+    # Validation happens before anything is written
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,85 @@
+##
+# @file test_usb_monitor.py
+# @brief USB monitor driven by the scripted fake drive backend.
+
+import filecmp
+import os
+import queue
+import pytest
+import drive_backends
+from conftest import APP_DIR, REPO_DIR
+from usb_monitor import USBMonitor
+
+##
+# @class CountingBackend
+# @brief Fake backend that counts how often the drives are listed.
+class CountingBackend(drive_backends.FakeBackend):
+    def __init__(self, drives=()):
+        super().__init__(drives)
+        self.listings = 0
+
+    def get_removable_drives(self):
+        self.listings += 1
+        return super().get_removable_drives()
+
+@pytest.fixture
+def running_monitor():
+    backend = drive_backends.FakeBackend()
+    updates = queue.Queue()
+    usb_monitor = USBMonitor(updates.put, backend)
+    usb_monitor.start_monitoring()
+    yield usb_monitor, backend, updates
+    usb_monitor.stop_monitoring()
+
+def test_plug_and_unplug(running_monitor, tmp_path):
+    usb_monitor, backend, updates = running_monitor
+
+    backend.plug(str(tmp_path))
+    assert updates.get(timeout=5) is True
+    assert usb_monitor.get_drive() == str(tmp_path)
+
+    backend.unplug(str(tmp_path))
+    assert updates.get(timeout=5) is False
+    assert usb_monitor.get_drive() is None
+
+def test_unplug_of_other_drive_keeps_selection(tmp_path):
+    first, second = str(tmp_path / "a"), str(tmp_path / "b")
+    backend = drive_backends.FakeBackend([first, second])
+    usb_monitor = USBMonitor(lambda key_found: None, backend)
+    usb_monitor.initial_drive_check()
+    assert usb_monitor.get_drive() == second
+
+    backend.unplug(first)
+    usb_monitor.handle_drive_change()
+
+    assert usb_monitor.get_drive() == second
+    assert usb_monitor.current_drives == [second]
+
+def test_swap_lists_drives_once(tmp_path):
+    old, new = str(tmp_path / "old"), str(tmp_path / "new")
+    backend = CountingBackend([old])
+    updates = []
+    usb_monitor = USBMonitor(updates.append, backend)
+    usb_monitor.initial_drive_check()
+    backend.listings = 0
+
+    # Both changes are seen by a single notification
+    backend.unplug(old)
+    backend.plug(new)
+    usb_monitor.handle_drive_change()
+
+    assert backend.listings == 1
+    assert usb_monitor.get_drive() == new
+    assert usb_monitor.current_drives == [new]
+    assert updates == [True, False, True]
+
+def test_initial_check_without_drives():
+    updates = []
+    USBMonitor(updates.append, drive_backends.FakeBackend()).initial_drive_check()
+
+    assert updates == [False]
+
+def test_drive_backends_shared_with_pdf_signing_app():
+    # The module is shipped with both applications and must not drift apart
+    assert filecmp.cmp(os.path.join(APP_DIR, "drive_backends.py"),
+                       os.path.join(REPO_DIR, "PdfSigningApp", "drive_backends.py"), shallow=False)
@@ -2,49 +2,32 @@
 # @file usb_monitor.py
 # @brief USB monitoring module for detecting private key storage devices.
 #
-# Monitors USB plug/unplug events on Windows using Win32 API.
+# Monitors USB plug/unplug events through a `drive_backends` backend
+# (Win32 API on Windows, mount point polling on Linux, scripted fake drives in tests).
 # Used to detect insertion/removal of USB drives containing private keys.
 
 import os
-import win32api
-import win32file
-import win32con
-import win32gui
+import drive_backends
 import threading
 
 ##
 # @brief File extension for private key files.
 PRIVATE_KEY_EXTENSIONS = ".pem"
 
-##
-# @brief Windows USB event constants for WM_DEVICECHANGE messages.
-WM_DEVICECHANGE = 0x0219
-DBT_DEVICEARRIVAL = 0x8000
-DBT_DEVICEREMOVECOMPLETE = 0x8004
-
-
-##
-# @brief Returns list of currently connected removable (USB) drives.
-#
-# @return List of drive letters representing USB drives.
-def get_removable_drives():
-    drives = [i for i in win32api.GetLogicalDriveStrings().split('\\\x00') if i]
-    return [d for d in drives if win32file.GetDriveType(d) == win32con.DRIVE_REMOVABLE]
-
-
 ##
 # @class USBMonitor
 # @brief Class to monitor USB plug/unplug events and detect private key presence.
 #
-# Creates a hidden window to receive device change notifications from Windows.
+# Receives device change notifications from a drive backend.
 class USBMonitor:
     ##
     # @brief Constructor.
     #
     # @param update_ui Function to call when USB state changes (True/False).
-    def __init__(self, update_ui):
-        self.hwnd = None                    # Handle to the hidden window.
-        self.current_drives = get_removable_drives()  # Initially connected USB drives.
+    # @param backend Drive backend (None = `drive_backends.default_backend()`).
+    def __init__(self, update_ui, backend=None):
+        self.backend = backend if backend is not None else drive_backends.default_backend()
+        self.current_drives = self.backend.get_removable_drives()  # Initially connected USB drives.
         self.drive = None                   # Currently selected drive containing private key.
         self.update_ui = update_ui          # Callback to update UI state.
 
@@ -55,64 +38,53 @@ class USBMonitor:
         thread.start()
 
     ##
-    # @brief Creates a hidden window and enters message loop to monitor USB events.
+    # @brief Runs the backend's change detection (blocks the monitor thread).
     def run_monitor(self):
-        wc = win32gui.WNDCLASS()
-        wc.lpfnWndProc = self.window_proc
-        wc.lpszClassName = "USBMonitorWindow"
-        wc.hInstance = win32gui.GetModuleHandle(None)
-        class_atom = win32gui.RegisterClass(wc)
+        self.backend.run(self.handle_drive_change)
 
-        self.hwnd = win32gui.CreateWindow(class_atom, "USB Monitor", 0, 0, 0, 0, 0,
-                                          0, 0, wc.hInstance, None)
-        win32gui.PumpMessages()
+    ##
+    # @brief Stops the backend's change detection where the backend supports it.
+    def stop_monitoring(self):
+        self.backend.stop()
 
     ##
-    # @brief Windows procedure for USB device change messages.
-    #
-    # @param hwnd Handle to the window.
-    # @param msg Message type.
-    # @param wparam Additional message-specific information.
-    # @param lparam Additional message-specific information.
-    #
-    # @return 0 (message processed)
-    def window_proc(self, hwnd, msg, wparam, lparam):
-        if msg == WM_DEVICECHANGE:
-            if wparam == DBT_DEVICEARRIVAL:
-                self.handle_usb_plug()
-            elif wparam == DBT_DEVICEREMOVECOMPLETE:
-                self.handle_usb_unplug()
-        return 0
+    # @brief Compares attached drives with the last known state and handles the difference.
+    def handle_drive_change(self):
+        new_drives = self.backend.get_removable_drives()
+        added_drives = [d for d in new_drives if d not in self.current_drives]
+        removed_drives = [d for d in self.current_drives if d not in new_drives]
+        self.current_drives = new_drives
+
+        if removed_drives:
+            self.handle_usb_unplug(removed_drives)
+        if added_drives:
+            self.handle_usb_plug(added_drives)
 
     ##
     # @brief Handles USB plug-in event.
     #
-    # Checks for new drives and updates internal state and UI.
-    def handle_usb_plug(self):
-        new_drives = get_removable_drives()
-        added_drives = [d for d in new_drives if d not in self.current_drives]
-
+    # Selects the newly attached drive and updates the UI.
+    #
+    # @param added_drives Drives that appeared since the last check.
+    def handle_usb_plug(self, added_drives):
         for drive in added_drives:
             print(f"[USB Plugged In] Drive {drive}")
             self.drive = drive
 
         self.update_ui(True)
-        self.current_drives = new_drives
 
     ##
     # @brief Handles USB unplug event.
     #
     # Updates drive state and notifies UI if drive was removed.
-    def handle_usb_unplug(self):
-        new_drives = get_removable_drives()
-        removed_drives = [d for d in self.current_drives if d not in new_drives]
-
+    #
+    # @param removed_drives Drives that disappeared since the last check.
+    def handle_usb_unplug(self, removed_drives):
         if self.drive in removed_drives:
             print(f"[USB Removed] Drive {self.drive} has been unplugged.")
             self.drive = None
 
         self.update_ui(False)
-        self.current_drives = new_drives
 
     ##
     # @brief Checks for private key on startup in already connected drives.
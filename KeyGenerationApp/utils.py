@@ -4,10 +4,76 @@
 #
 # Generates a 4096-bit RSA key pair, encrypts the private key with a passphrase using AES-256,
 # and saves both keys in PEM format to the specified directories.
+# Many key pairs can be provisioned at once in parallel worker processes.
 
 import time
+from concurrent.futures import ProcessPoolExecutor
+from Cryptodome.Hash import SHA256
 from Cryptodome.PublicKey import RSA
+import json
 import os
+import re
+
+# Name of the manifest file written by `provision_key_pairs`
+MANIFEST_NAME = "manifest.json"
+
+# Key protection profiles: name -> (PKCS#8 protection scheme, KDF parameters),
+# ordered from the weakest to the strongest protection.
+# Same table as `KDF_PROFILES` in PdfSigningApp/utils.py (checked by the tests), which
+# detects the profile of a key file from the KDF parameters stored inside it.
+KDF_PROFILES = {
+    "compat": ("PBKDF2WithHMAC-SHA256AndAES256-CBC", {"iteration_count": 10000}),
+    "low": ("scryptAndAES256-CBC", {"iteration_count": 2 ** 12}),
+    "default": ("scryptAndAES256-CBC", {"iteration_count": 2 ** 14}),
+    "high": ("scryptAndAES256-CBC", {"iteration_count": 2 ** 16}),
+    "max": ("scryptAndAES256-CBC", {"iteration_count": 2 ** 18}),
+}
+
+# Profile matching the PyCryptodome defaults used by earlier versions
+DEFAULT_KDF_PROFILE = "default"
+
+# Allowed signer names; they become part of the public key file name
+SIGNER_NAME_PATTERN = re.compile(r"[A-Za-z0-9][A-Za-z0-9._-]*")
+
+##
+# @brief Raised when some key pairs of `provision_key_pairs` could not be provisioned.
+#
+# The manifest already lists the signers in `entries`; `failures` holds
+# `(name, exception)` tuples of the others.
+class ProvisioningError(Exception):
+    def __init__(self, entries, failures):
+        names = ", ".join(name for name, _ in failures)
+        super().__init__(f"Failed to provision key pairs for: {names}")
+        self.entries = entries
+        self.failures = failures
+
+##
+# @brief Encrypts a private RSA key with a passphrase.
+#
+# The key is exported as PKCS#8 and protected with the KDF of the given profile + AES-256-CBC.
+#
+# @param key `RsaKey` object with the private key.
+# @param pwd Passphrase to encrypt the private key with.
+# @param profile Name of a profile from `KDF_PROFILES`.
+#
+# @return Encrypted private key in PEM format (bytes).
+def encrypt_private_key(key, pwd, profile=DEFAULT_KDF_PROFILE):
+    protection, prot_params = KDF_PROFILES[profile]
+    return key.export_key(
+        passphrase=pwd,
+        pkcs=8,
+        protection=protection,
+        prot_params=prot_params
+    )
+
+##
+# @brief Computes the fingerprint of a public key.
+#
+# @param key `RsaKey` object (public or private).
+#
+# @return Hex SHA-256 digest of the DER-encoded public key.
+def public_key_fingerprint(key):
+    return SHA256.new(key.publickey().export_key(format="DER")).hexdigest()
 
 ##
 # @brief Generates and saves a 4096-bit RSA key pair.
@@ -18,21 +84,21 @@ import os
 # @param dir_path Path to directory where the public key will be saved.
 # @param priv_path Path to directory where the private key will be saved.
 # @param pwd Passphrase to encrypt the private key with AES-256.
+# @param key Optional already generated `RsaKey` (e.g. taken from `key_pool.KeyPool`).
+#            A new 4096-bit key is generated when None.
+# @param profile Name of the key protection profile (see `KDF_PROFILES`).
 #
 # @return None
-def generate_key_pair(dir_path, priv_path, pwd):
+def generate_key_pair(dir_path, priv_path, pwd, key=None, profile=DEFAULT_KDF_PROFILE):
 
     start = time.time()
 
-    key = RSA.generate(4096)
+    if key is None:
+        key = RSA.generate(4096)
     print(f"Czas generowania RSA: {time.time() - start:.2f} sekundy")
 
     start = time.time()
-    private_key_encrypted = key.export_key(
-        passphrase=pwd,
-        pkcs=8,
-        protection="scryptAndAES256-CBC"
-    )
+    private_key_encrypted = encrypt_private_key(key, pwd, profile)
     print(f"Czas AES: {time.time() - start:.2f} sekundy")
 
     public_key = key.publickey().export_key()
@@ -45,3 +111,111 @@ def generate_key_pair(dir_path, priv_path, pwd):
 
     with open(private_key_path, "wb") as f:
         f.write(private_key_encrypted)
+
+##
+# @brief Generates and encrypts one key pair in a worker process.
+#
+# @param pwd Passphrase to encrypt the private key with.
+# @param profile Name of the key protection profile.
+#
+# @return Tuple `(public_key_pem, private_key_encrypted_pem, fingerprint)`.
+def _provision_key_pair(pwd, profile):
+    key = RSA.generate(4096)
+    return key.publickey().export_key(), encrypt_private_key(key, pwd, profile), public_key_fingerprint(key)
+
+##
+# @brief Checks that a signer name is safe to use in a file name.
+#
+# @param name Signer name.
+# @throws ValueError If the name contains path separators or other unsafe characters.
+def _check_signer_name(name):
+    if os.path.basename(name) != name or not SIGNER_NAME_PATTERN.fullmatch(name):
+        raise ValueError(f"Invalid signer name: {name!r} (allowed: letters, digits, '.', '_', '-')")
+
+##
+# @brief Saves one provisioned key pair, removing partially written files on failure.
+#
+# @param public_key_path Target path of the public key.
+# @param private_key_path Target path of the private key.
+# @param public_key Public key in PEM format.
+# @param private_key_encrypted Encrypted private key in PEM format.
+def _save_key_pair(public_key_path, private_key_path, public_key, private_key_encrypted):
+    written = []
+    try:
+        for path, data in ((private_key_path, private_key_encrypted), (public_key_path, public_key)):
+            with open(path, "wb") as f:
+                written.append(path)
+                f.write(data)
+    except OSError:
+        for path in written:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        raise
+
+##
+# @brief Generates many key pairs in parallel, each encrypted with its own passphrase.
+#
+# Key generation and encryption run in a process pool. Public keys are saved
+# in `public_dir` as `<name>_public_key.pem` and listed in `manifest.json` in the same
+# directory together with the private key path and the public key fingerprint.
+# Each private key is saved to its own target path. Passphrases are never stored.
+# Entries of an existing manifest are kept unless a signer with the same name is provisioned again.
+#
+# A signer that fails (generation or writing its files) does not stop the others:
+# the manifest is written for all provisioned signers before `ProvisioningError` is raised,
+# so no saved key is left out of it.
+#
+# @param signers Iterable of `(name, private_key_path, passphrase)` tuples.
+# @param public_dir Directory for the public keys and the manifest.
+# @param max_workers Number of worker processes (None = number of CPUs).
+# @param profile Name of the key protection profile (see `KDF_PROFILES`).
+#
+# @return List of manifest entries (dictionaries) of the provisioned signers.
+# @throws ValueError If signer names are not unique or not safe file name parts (nothing is provisioned).
+# @throws ProvisioningError If some signers could not be provisioned.
+def provision_key_pairs(signers, public_dir, max_workers=None, profile=DEFAULT_KDF_PROFILE):
+    signers = list(signers)
+    names = [name for name, _, _ in signers]
+    if len(set(names)) != len(names):
+        raise ValueError("Signer names must be unique")
+    for name in names:
+        _check_signer_name(name)
+
+    os.makedirs(public_dir, exist_ok=True)
+    manifest_path = os.path.join(public_dir, MANIFEST_NAME)
+    manifest = []
+    if os.path.exists(manifest_path):
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = [entry for entry in json.load(f) if entry["name"] not in names]
+
+    entries = []
+    failures = []
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(_provision_key_pair, pwd, profile) for _, _, pwd in signers]
+
+        for (name, private_key_path, _), future in zip(signers, futures):
+            public_key_path = os.path.join(public_dir, f"{name}_public_key.pem")
+            try:
+                public_key, private_key_encrypted, fingerprint = future.result()
+                _save_key_pair(public_key_path, private_key_path, public_key, private_key_encrypted)
+            except Exception as e:
+                failures.append((name, e))
+                continue
+
+            entries.append({
+                "name": name,
+                "public_key": public_key_path,
+                "private_key": private_key_path,
+                "fingerprint": fingerprint,
+                "kdf_profile": profile,
+                "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            })
+
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest + entries, f, indent=2)
+
+    if failures:
+        raise ProvisioningError(entries, failures)
+    return entries
@@ -5,15 +5,31 @@
 # The frame provides UI elements to pick a PDF file, display status,
 # monitor USB insertion/removal for private key presence,
 # and sign the PDF after password input.
+# Signing runs on a worker thread, the UI shows its progress and can cancel it.
 
 import os
+import queue
+import threading
 import customtkinter as ctk
 from tkinter import filedialog as fd
-from sign import sign_pdf
+import sign
+from sign import sign_pdf, SigningCancelled
 from UI.password_dialog import PasswordDialog
 from usb_monitor import USBMonitor
 from tkinter import messagebox
 
+# Text shown for each signing stage
+STAGE_LABELS = {
+    sign.STAGE_KEY_UNLOCK: "Unlocking private key",
+    sign.STAGE_NORMALIZE: "Normalizing document",
+    sign.STAGE_HASH: "Hashing document",
+    sign.STAGE_SIGN: "Signing hash",
+    sign.STAGE_WRITE: "Writing signed PDF",
+}
+
+# How often the worker thread queue is polled (ms)
+POLL_INTERVAL = 100
+
 ##
 # @brief Frame to handle PDF signing functionality.
 #
@@ -25,7 +41,8 @@ class SignFrame(ctk.CTkFrame):
     #
     # @param parent Parent widget.
     # @param controller Controller providing window dimensions and frame switching.
-    def __init__(self, parent, controller):
+    # @param usb_backend Drive backend for the USB monitor (None = platform default, see `drive_backends`).
+    def __init__(self, parent, controller, usb_backend=None):
         super().__init__(parent)
 
         title = ctk.CTkLabel(self, text="Sign PDF document",
@@ -80,12 +97,21 @@ class SignFrame(ctk.CTkFrame):
                                     command=lambda: controller.show_frame("MainMenu"))
         back_button.pack(pady=5)
 
-        self.usb_monitor = USBMonitor(self.update_ui)
+        self.pdf_to_sign = None
+
+        # Messages from the signing worker thread, read on the Tk thread only
+        self.sign_queue = queue.Queue()
+        self.cancel_event = None
+
+        # Buttons stay disabled until the background key search reports a key
+        self.view_without_private_key()
+        self.info.configure(text="Searching USB drives for your private RSA key...")
+
+        self.usb_monitor = USBMonitor(self.update_ui, usb_backend)
+        self.usb_monitor.attach(self)
         self.usb_monitor.start_monitoring()
         self.usb_monitor.initial_key_check()
 
-        self.pdf_to_sign = None
-
     ##
     # @brief Opens file dialog for user to select a PDF file.
     # Updates label with selected file name.
@@ -99,26 +125,95 @@ class SignFrame(ctk.CTkFrame):
 
     ##
     # @brief Handles Sign button click:
+    # - while signing is running, cancels it
     # - disables buttons
     # - prompts for private key password
-    # - calls sign_pdf function
-    # - shows success or error message
-    # - re-enables buttons
+    # - starts signing on a worker thread
     def sign_btn(self):
+        if self.cancel_event is not None:
+            self.cancel_event.set()
+            self.sign_button.configure(state="disabled")
+            self.empty.configure(text="Cancelling...")
+            return
+
         self.select_file_button.configure(state="disabled")
         self.sign_button.configure(state="disabled")
         if self.pdf_to_sign:
             dialog = PasswordDialog(self, "Enter Private Key password")
             self.wait_window(dialog)
             if dialog.result:
-                if sign_pdf(self.pdf_to_sign, self.usb_monitor.get_key_file_path(), dialog.result):
-                    messagebox.showinfo(title="Signing complete", message="PDF Signed Successfully!")
-                else:
-                    messagebox.showerror(title="Wrong password", message="Incorrect private key password!")
+                self.cancel_event = threading.Event()
+                self.sign_button.configure(text="Cancel", state="normal")
+                threading.Thread(target=self.sign_thread,
+                                 args=(self.pdf_to_sign, self.usb_monitor.get_key_file_path(),
+                                       dialog.result, self.cancel_event),
+                                 daemon=True).start()
+                self.after(POLL_INTERVAL, self.poll_signing)
+                return
 
         self.select_file_button.configure(state="normal")
         self.sign_button.configure(state="normal")
 
+    ##
+    # @brief Worker thread that signs the PDF.
+    #
+    # Never touches widgets, all results are passed to the Tk thread through `sign_queue`.
+    #
+    # @param pdf_path Path to the PDF to sign.
+    # @param key_path Path to the encrypted private key.
+    # @param pwd Private key password.
+    # @param cancel_event Event set by the Cancel button.
+    def sign_thread(self, pdf_path, key_path, pwd, cancel_event):
+        try:
+            success = sign_pdf(pdf_path, key_path, pwd,
+                               progress=lambda stage: self.sign_queue.put(("stage", stage)),
+                               cancel_event=cancel_event,
+                               key_loaded=lambda key: self.usb_monitor.register_fingerprint(key_path, key))
+            self.sign_queue.put(("done", success))
+        except SigningCancelled:
+            self.sign_queue.put(("cancelled", None))
+        except Exception as e:
+            self.sign_queue.put(("error", str(e)))
+
+    ##
+    # @brief Reads worker messages on the Tk thread and updates the UI.
+    #
+    # Reschedules itself with `after()` until the worker reports completion.
+    def poll_signing(self):
+        while True:
+            try:
+                kind, value = self.sign_queue.get_nowait()
+            except queue.Empty:
+                break
+
+            if kind == "stage":
+                step = sign.STAGES.index(value) + 1
+                self.empty.configure(text=f"{STAGE_LABELS[value]}... ({step}/{len(sign.STAGES)})")
+                continue
+
+            self.finish_signing()
+            if kind == "done" and value:
+                messagebox.showinfo(title="Signing complete", message="PDF Signed Successfully!")
+            elif kind == "done":
+                messagebox.showerror(title="Wrong password", message="Incorrect private key password!")
+            elif kind == "cancelled":
+                messagebox.showinfo(title="Signing cancelled", message="Signing was cancelled.")
+            else:
+                messagebox.showerror(title="Signing failed", message=f"Could not sign the PDF: {value}")
+            return
+
+        self.after(POLL_INTERVAL, self.poll_signing)
+
+    ##
+    # @brief Restores the UI after signing has finished.
+    def finish_signing(self):
+        self.cancel_event = None
+        self.empty.configure(text="")
+        self.sign_button.configure(text="Sign")
+        if self.usb_monitor.get_key_file_path():
+            self.select_file_button.configure(state="normal")
+            self.sign_button.configure(state="normal")
+
     ##
     # @brief Updates UI to indicate private key found on USB drive.
     def view_with_private_key(self):
@@ -129,6 +224,9 @@ class SignFrame(ctk.CTkFrame):
             label_text = '...%s' % label_text[-33:]
 
         self.info.configure(text=f"Private key found: {label_text}")
+        if self.cancel_event is not None:
+            # Buttons are restored when signing finishes
+            return
         self.select_file_button.configure(state="normal")
         self.sign_button.configure(state="normal")
 
@@ -136,6 +234,8 @@ class SignFrame(ctk.CTkFrame):
     # @brief Updates UI to indicate no private key found and disables buttons.
     def view_without_private_key(self):
         self.info.configure(text="Insert a USB drive with your private RSA key")
+        if self.cancel_event is not None:
+            return
         self.select_file_button.configure(state="disabled")
         self.sign_button.configure(state="disabled")
 
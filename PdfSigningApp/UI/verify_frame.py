@@ -2,18 +2,33 @@
 # @file verify_frame.py
 # @brief GUI frame to select a PDF and public key to verify the digital signature.
 #
-# Allows user to select a signed PDF file and a public key file,
-# then verifies the signature and displays the result.
+# Allows user to select signed PDF files and a public key file,
+# then verifies the signatures in worker processes and lists the results as they finish.
 
 import customtkinter as ctk
 import os
+import queue
+from concurrent.futures import ProcessPoolExecutor
 from tkinter import filedialog as fd, messagebox
-from verify import verify_pdf
+import verify
+from verify import check_pdf_signature
+
+# Text shown in the results list for each verification status
+STATUS_LABELS = {
+    verify.VALID: "✔ valid",
+    verify.INVALID: "❌ invalid",
+    verify.UNSIGNED: "– unsigned",
+    verify.ERROR: "⚠ error",
+}
+
+# How often finished verifications are collected (ms)
+POLL_INTERVAL = 100
 
 ##
 # @brief Frame to handle PDF signature verification functionality.
 #
-# Allows user to select PDF and public key files, then verify the signature.
+# Allows user to select PDF and public key files, then verify the signatures.
+# Several PDFs can be queued, results stream into a list as they finish.
 class VerifyFrame(ctk.CTkFrame):
     ##
     # @brief Initializes the verify frame UI.
@@ -30,9 +45,9 @@ class VerifyFrame(ctk.CTkFrame):
                              font=("Arial", 30, "bold"))
         title.pack(pady=5)
 
-        self.info = ctk.CTkLabel(self, text="Select a PDF file and a public key to verify the signature.",
+        self.info = ctk.CTkLabel(self, text="Select PDF files and a public key to verify the signatures.",
                                  fg_color="transparent",
-                                 height=(controller.get_height() / 7),
+                                 height=(controller.get_height() / 14),
                                  width=controller.get_width(),
                                  font=("Arial", 25))
         self.info.pack(pady=5)
@@ -40,14 +55,14 @@ class VerifyFrame(ctk.CTkFrame):
         self.file_frame = ctk.CTkFrame(self, fg_color="transparent")
         self.file_frame.pack()
 
-        self.selected_file_label = ctk.CTkLabel(self.file_frame, text="No file selected",
+        self.selected_file_label = ctk.CTkLabel(self.file_frame, text="No files selected",
                                                 fg_color="transparent",
                                                 height=(controller.get_height() / 8),
                                                 width=(controller.get_width() / 4),
                                                 font=("Arial", 25))
         self.selected_file_label.pack(padx=10, pady=5, side="right")
 
-        self.select_file_button = ctk.CTkButton(self.file_frame, text="Select file",
+        self.select_file_button = ctk.CTkButton(self.file_frame, text="Select files",
                                                 font=("Arial", 25),
                                                 height=(controller.get_height() / 8),
                                                 width=(controller.get_width() / 4),
@@ -71,32 +86,55 @@ class VerifyFrame(ctk.CTkFrame):
                                                command=self.choose_pem)
         self.select_key_button.pack(padx=10, pady=5, side="left")
 
-        back_button = ctk.CTkButton(self, text="Verify",
-                                    font=("Arial", 25),
-                                    height=(controller.get_height() / 8),
-                                    width=(controller.get_width() / 4),
-                                    command=self.verify_btn)
-        back_button.pack(pady=5)
+        self.results_list = ctk.CTkTextbox(self, font=("Arial", 16),
+                                           height=(controller.get_height() / 5),
+                                           width=(controller.get_width() * 3 / 4))
+        self.results_list.pack(pady=5)
+        self.results_list.configure(state="disabled")
+
+        self.buttons_frame = ctk.CTkFrame(self, fg_color="transparent")
+        self.buttons_frame.pack()
+
+        verify_button = ctk.CTkButton(self.buttons_frame, text="Verify",
+                                      font=("Arial", 25),
+                                      height=(controller.get_height() / 8),
+                                      width=(controller.get_width() / 4),
+                                      command=self.verify_btn)
+        verify_button.pack(padx=10, pady=5, side="left")
 
-        back_button = ctk.CTkButton(self, text="Back to Menu",
+        back_button = ctk.CTkButton(self.buttons_frame, text="Back to Menu",
                                     font=("Arial", 25),
                                     height=(controller.get_height() / 8),
                                     width=(controller.get_width() / 4),
                                     command=lambda: controller.show_frame("MainMenu"))
-        back_button.pack(pady=5)
+        back_button.pack(padx=10, pady=5, side="right")
 
-        self.pdf_to_verify = None
+        self.pdfs_to_verify = []
         self.public_key_path = None
 
+        # Worker processes are started on the first verification
+        self.executor = None
+        self.results_queue = queue.Queue()
+        self.pending = 0
+
+        # Scheduled `poll_results` call; no callbacks may run once the frame is destroyed
+        self.poll_job = None
+        self.destroyed = False
+
     ##
-    # @brief Opens file dialog for user to select a PDF file to verify.
+    # @brief Opens file dialog for user to select PDF files to verify.
     def choose_pdf(self):
-        self.pdf_to_verify = fd.askopenfilename(title="Choose PDF file", filetypes=[("PDF files", "*.pdf")])
-
-        label_text = os.path.basename(self.pdf_to_verify)
-        if len(label_text) > 36:
-            label_text = '...%s' % label_text[-33:]
-        self.selected_file_label.configure(text=os.path.basename(label_text))
+        self.pdfs_to_verify = list(fd.askopenfilenames(title="Choose PDF files", filetypes=[("PDF files", "*.pdf")]))
+
+        if len(self.pdfs_to_verify) == 1:
+            label_text = os.path.basename(self.pdfs_to_verify[0])
+            if len(label_text) > 36:
+                label_text = '...%s' % label_text[-33:]
+        elif self.pdfs_to_verify:
+            label_text = f"{len(self.pdfs_to_verify)} files selected"
+        else:
+            label_text = "No files selected"
+        self.selected_file_label.configure(text=label_text)
 
     ##
     # @brief Opens file dialog for user to select a PEM public key file.
@@ -111,11 +149,84 @@ class VerifyFrame(ctk.CTkFrame):
     ##
     # @brief Called when Verify button clicked.
     #
-    # Checks if PDF and key are selected, calls verify_pdf,
-    # then displays messagebox with verification result.
+    # Queues the selected PDFs for verification in worker processes.
+    # The button can be clicked again to queue more files while others are still verified.
     def verify_btn(self):
-        if self.pdf_to_verify and self.public_key_path:
-            if verify_pdf(self.pdf_to_verify, self.public_key_path):
-                messagebox.showinfo(title="Signature verification", message="Signature is valid! File is authentic! ✔")
-            else:
-                messagebox.showerror(title="Signature verification", message="Invalid signature! File was modified! ❌")
+        if not (self.pdfs_to_verify and self.public_key_path):
+            messagebox.showerror(title="Signature verification", message="Select PDF files and a public key first!")
+            return
+
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor()
+
+        # A polling loop is already running while earlier files are pending
+        start_polling = self.pending == 0
+
+        for pdf_path in self.pdfs_to_verify:
+            future = self.executor.submit(check_pdf_signature, pdf_path, self.public_key_path)
+            # Runs on an executor thread, only the thread-safe queue is touched
+            future.add_done_callback(lambda f, p=pdf_path: self.results_queue.put((p, f)))
+            self.pending += 1
+
+        if start_polling:
+            self.poll_job = self.after(POLL_INTERVAL, self.poll_results)
+
+        self.info.configure(text=f"Verifying {self.pending} file(s)...")
+        self.pdfs_to_verify = []
+        self.selected_file_label.configure(text="No files selected")
+
+    ##
+    # @brief Stops the verification workers when the frame (or the whole application) is destroyed.
+    #
+    # Queued verifications are cancelled without waiting for running ones, whose results
+    # are dropped: the polling loop is cancelled and no longer touches the widgets.
+    def destroy(self):
+        self.destroyed = True
+        if self.poll_job is not None:
+            self.after_cancel(self.poll_job)
+            self.poll_job = None
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+        super().destroy()
+
+    ##
+    # @brief Moves finished verifications from the queue into the results list.
+    #
+    # Reschedules itself with `after()` while verifications are pending.
+    def poll_results(self):
+        self.poll_job = None
+        if self.destroyed:
+            return
+
+        while True:
+            try:
+                pdf_path, future = self.results_queue.get_nowait()
+            except queue.Empty:
+                break
+
+            self.pending -= 1
+            try:
+                result = future.result()
+            except Exception as e:
+                result = verify.VerificationResult(pdf_path, verify.ERROR, str(e))
+            self.add_result(result)
+
+        if self.pending:
+            self.info.configure(text=f"Verifying {self.pending} file(s)...")
+            self.poll_job = self.after(POLL_INTERVAL, self.poll_results)
+        else:
+            self.info.configure(text="Verification finished.")
+
+    ##
+    # @brief Appends one verification result to the results list.
+    # @param result `VerificationResult` to display.
+    def add_result(self, result):
+        line = f"{STATUS_LABELS[result.status]}  {os.path.basename(result.pdf_path)}"
+        if result.status == verify.ERROR:
+            line += f" ({result.message})"
+
+        self.results_list.configure(state="normal")
+        self.results_list.insert("end", line + "\n")
+        self.results_list.see("end")
+        self.results_list.configure(state="disabled")
@@ -0,0 +1,292 @@
+##
+# @file benchmark.py
+# @brief Reproducible benchmark of the signing, verification and key generation hot paths.
+#
+# Synthetic documents are built from `sample-1.pdf` by repeating its pages up to the
+# requested page count and padding them with a seeded random image to the requested size,
+# so the same arguments always produce the same inputs. Every stage runs once per document:
+#
+# - `normalize_pdf`,
+# - `create_pdf_hash` (of the normalized file),
+# - `sign_hash_with_pkey` (includes the private key unlock),
+# - `add_signature_to_metadata`,
+# - `verify_pdf`,
+# - key generation (`RSA.generate` + `encrypt_private_key`), run `--keygen-rounds` times.
+#
+# The report is a single JSON object with docs/s, MB/s and p50/p95 latency per stage.
+# `cumulative_peak_rss_mb` is the peak RSS of the whole process up to the end of the stage
+# (None where `resource` is not available). It never decreases, so a stage only shows
+# its own memory use when it raises the peak above that of the earlier stages.
+#
+# Example:
+#   python benchmark.py --docs 20 --pages 50 --size-mb 5 --output report.json
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from Cryptodome import __version__ as pycryptodome_version
+from Cryptodome.PublicKey import RSA
+import PyPDF2
+from PyPDF2 import PdfReader, PdfWriter
+from PyPDF2.generic import NameObject
+import sign
+import utils
+import verify
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# Document the synthetic PDFs are built from
+DEFAULT_SAMPLE = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "sample-1.pdf")
+
+# Password protecting the benchmark key
+BENCHMARK_PASSWORD = "benchmark"
+
+# Width in pixels of the padding image (its height follows from the padding size)
+PADDING_WIDTH = 1024
+
+##
+# @brief Returns the peak resident set size of the process since it started.
+# @return Peak RSS in megabytes, or None if the platform does not report it.
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+##
+# @brief Returns a percentile of sorted samples (nearest-rank method).
+# @param samples Sorted list of numbers.
+# @param percent Percentile between 0 and 100.
+# @return Value of the percentile.
+def percentile(samples, percent):
+    rank = max(1, -(-len(samples) * percent // 100))
+    return samples[int(rank) - 1]
+
+##
+# @brief Builds a seeded random grayscale image in a one-page in-memory PDF.
+#
+# PyPDF2 has no public API to add a new indirect object to a writer, so the image is
+# read from its own small document and copied into the writer with `clone()`.
+#
+# @param rows Height of the image in pixels (`PADDING_WIDTH` bytes per row).
+# @param seed Seed of the image data.
+# @return `IndirectObject` of the image in the in-memory document.
+def make_padding_image(rows, seed):
+    image_data = random.Random(seed).randbytes(rows * PADDING_WIDTH)
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 1 1] /Contents 4 0 R"
+        b" /Resources << /XObject << /BenchmarkPadding 5 0 R >> >> >>",
+        b"<< /Length 0 >>\nstream\n\nendstream",
+        b"<< /Type /XObject /Subtype /Image /Width %d /Height %d /ColorSpace /DeviceGray"
+        b" /BitsPerComponent 8 /Length %d >>\nstream\n%s\nendstream"
+        % (PADDING_WIDTH, rows, len(image_data), image_data),
+    ]
+    data = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(data))
+        data += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref_offset = len(data)
+    data += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    data += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    data += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_offset)
+
+    page = PdfReader(io.BytesIO(bytes(data))).pages[0]
+    return page["/Resources"]["/XObject"].raw_get("/BenchmarkPadding")
+
+##
+# @brief Writes a synthetic PDF built from the sample document.
+#
+# @param sample_path Path to the source PDF.
+# @param output_path Path of the generated PDF.
+# @param pages Number of pages (sample pages are repeated).
+# @param size_bytes Approximate target file size; 0 = no padding.
+# @param seed Seed of the padding data.
+def make_synthetic_pdf(sample_path, output_path, pages, size_bytes, seed):
+    reader = PdfReader(sample_path)
+    writer = PdfWriter()
+    writer.add_metadata(reader.metadata)
+    for i in range(pages):
+        writer.add_page(reader.pages[i % len(reader.pages)])
+
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    padding = size_bytes - buffer.tell()
+    if padding >= PADDING_WIDTH:
+        image = make_padding_image(padding // PADDING_WIDTH, seed).clone(writer)
+        # Referenced from the first page, so normalization keeps it
+        resources = writer.pages[0]["/Resources"].get_object()
+        if "/XObject" not in resources:
+            resources[NameObject("/XObject")] = type(resources)()
+        resources["/XObject"].get_object()[NameObject("/BenchmarkPadding")] = image
+
+    with open(output_path, "wb") as f:
+        writer.write(f)
+
+##
+# @brief Summarizes the measurements of one stage.
+# @param durations List of durations in seconds, one per document or round.
+# @param total_bytes Number of input bytes processed by the stage (None = not applicable).
+# @return Dictionary with the statistics.
+def summarize(durations, total_bytes=None):
+    total = sum(durations)
+    ordered = sorted(durations)
+    return {
+        "count": len(durations),
+        "total_s": round(total, 4),
+        "docs_per_s": round(len(durations) / total, 3) if total else None,
+        "mb_per_s": round(total_bytes / (1024 * 1024) / total, 3) if total and total_bytes is not None else None,
+        "p50_ms": round(percentile(ordered, 50) * 1000, 3),
+        "p95_ms": round(percentile(ordered, 95) * 1000, 3),
+        "cumulative_peak_rss_mb": peak_rss_mb(),
+    }
+
+##
+# @brief Runs one stage on every document and measures each call.
+# @param func Function called with a document index.
+# @param count Number of documents.
+# @return List of durations in seconds.
+def measure(func, count):
+    durations = []
+    for i in range(count):
+        start = time.perf_counter()
+        func(i)
+        durations.append(time.perf_counter() - start)
+    return durations
+
+##
+# @brief Runs the whole benchmark.
+# @param args Parsed command-line arguments.
+# @return Report dictionary.
+def run_benchmark(args):
+    report = {
+        "parameters": {
+            "docs": args.docs,
+            "pages": args.pages,
+            "size_mb": args.size_mb,
+            "seed": args.seed,
+            "key_bits": args.key_bits,
+            "kdf_profile": args.kdf_profile,
+            "keygen_rounds": args.keygen_rounds,
+        },
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+            "PyPDF2": PyPDF2.__version__,
+            "pycryptodome": pycryptodome_version,
+        },
+        "stages": {},
+    }
+    stages = report["stages"]
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        def path(kind, i):
+            return os.path.join(work_dir, f"doc{i}_{kind}.pdf")
+
+        for i in range(args.docs):
+            make_synthetic_pdf(args.sample, path("input", i), args.pages,
+                               int(args.size_mb * 1024 * 1024), args.seed + i)
+        input_bytes = sum(os.path.getsize(path("input", i)) for i in range(args.docs))
+        report["parameters"]["input_bytes"] = input_bytes
+
+        keygen_durations = []
+        for _ in range(max(args.keygen_rounds, 1)):
+            start = time.perf_counter()
+            key = RSA.generate(args.key_bits)
+            private_pem = utils.encrypt_private_key(key, BENCHMARK_PASSWORD, args.kdf_profile)
+            keygen_durations.append(time.perf_counter() - start)
+        if args.keygen_rounds > 0:
+            stages["keygen"] = summarize(keygen_durations)
+
+        key_path = os.path.join(work_dir, "private_key.pem")
+        public_key_path = os.path.join(work_dir, "public_key.pem")
+        with open(key_path, "wb") as f:
+            f.write(private_pem)
+        with open(public_key_path, "wb") as f:
+            f.write(key.publickey().export_key())
+
+        stages["normalize_pdf"] = summarize(
+            measure(lambda i: sign.normalize_pdf(path("input", i), path("normalized", i)), args.docs),
+            input_bytes)
+        normalized_bytes = sum(os.path.getsize(path("normalized", i)) for i in range(args.docs))
+
+        hashes = {}
+        def hash_doc(i):
+            hashes[i] = utils.create_pdf_hash(path("normalized", i))
+        stages["create_pdf_hash"] = summarize(measure(hash_doc, args.docs), normalized_bytes)
+
+        signatures = {}
+        def sign_doc(i):
+            signatures[i] = utils.sign_hash_with_pkey(key_path, hashes[i], BENCHMARK_PASSWORD)
+        stages["sign_hash_with_pkey"] = summarize(measure(sign_doc, args.docs))
+
+        stages["add_signature_to_metadata"] = summarize(
+            measure(lambda i: sign.add_signature_to_metadata(path("normalized", i), path("signed", i),
+                                                             signatures[i]), args.docs),
+            normalized_bytes)
+        signed_bytes = sum(os.path.getsize(path("signed", i)) for i in range(args.docs))
+
+        results = {}
+        def verify_doc(i):
+            results[i] = verify.verify_pdf(path("signed", i), public_key_path)
+        with contextlib.redirect_stdout(io.StringIO()):
+            stages["verify_pdf"] = summarize(measure(verify_doc, args.docs), signed_bytes)
+        if not all(results.values()):
+            raise RuntimeError("Verification of a benchmark document failed")
+
+    return report
+
+##
+# @brief Builds the command-line argument parser.
+# @return `argparse.ArgumentParser` instance.
+def build_parser():
+    parser = argparse.ArgumentParser(description="Benchmark PDF signing, verification and key generation.")
+    parser.add_argument("--docs", type=int, default=10, help="number of synthetic documents")
+    parser.add_argument("--pages", type=int, default=10, help="pages per document")
+    parser.add_argument("--size-mb", type=float, default=1.0, help="approximate size of each document in MB")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the padding data")
+    parser.add_argument("--sample", default=DEFAULT_SAMPLE, help="PDF the synthetic documents are built from")
+    parser.add_argument("--key-bits", type=int, default=4096, help="RSA key size")
+    parser.add_argument("--kdf-profile", choices=list(utils.KDF_PROFILES), default=utils.DEFAULT_KDF_PROFILE,
+                        help="protection profile of the benchmark key")
+    parser.add_argument("--keygen-rounds", type=int, default=1,
+                        help="number of measured key generations (0 = skip the keygen stage)")
+    parser.add_argument("--output", help="write the JSON report to this file instead of stdout")
+    return parser
+
+##
+# @brief Command-line entry point.
+# @param argv Arguments without the program name (None = `sys.argv[1:]`).
+# @return Process exit code.
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.docs < 1 or args.pages < 1:
+        print("Error: --docs and --pages must be at least 1", file=sys.stderr)
+        return 2
+
+    report = json.dumps(run_benchmark(args), indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report + "\n")
+    else:
+        print(report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
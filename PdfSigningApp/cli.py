@@ -0,0 +1,394 @@
+##
+# @file cli.py
+# @brief Headless command-line interface for signing, verification and key generation.
+#
+# Runs without a display and never imports the GUI stack, so it can be used
+# on servers and in pipelines. Every processed file is reported as one JSON object
+# per line on standard output; diagnostics go to standard error.
+#
+# Examples:
+#   python cli.py sign invoices/ --key E:/private_key.pem --password-env PDF_KEY_PASSWORD
+#   python cli.py verify "archive/**/*_signed.pdf" --public-key public_key.pem --workers 8
+#   python cli.py verify archive/ --recursive --public-key public_key.pem --cache verdicts.db
+#   python cli.py verify //fileserver/shared --recursive --public-key public_key.pem --triage
+#   python cli.py watch //dms/inbox --outbox //dms/signed --quarantine //dms/failed --key E:/private_key.pem
+#   python cli.py serve --key E:/private_key.pem --public-key public_key.pem --password-env PDF_KEY_PASSWORD
+#   python cli.py triage //fileserver/shared --recursive
+#   python cli.py keygen keys/ --password-stdin --kdf-profile high
+#   python cli.py kdf-benchmark --target-ms 250
+#   python cli.py --trace sign big.pdf --key E:/private_key.pem --password-stdin
+
+import argparse
+import contextlib
+import getpass
+import glob
+import json
+import os
+import sys
+import tracing
+import utils
+
+# Exit codes
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_USAGE = 2
+
+##
+# @brief Expands command-line inputs into a list of PDF files.
+#
+# Glob patterns are expanded (`**` matches subdirectories), directories are
+# replaced with the PDF files they contain and plain file paths are kept.
+#
+# @param patterns Paths, directories or glob patterns given on the command line.
+# @param recursive Whether directories are searched recursively.
+# @param skip_signed Whether files with the `_signed` suffix found in directories are skipped.
+# @return List of PDF file paths without duplicates, in input order.
+def expand_inputs(patterns, recursive=False, skip_signed=False):
+    paths = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern, recursive=True)) if glob.has_magic(pattern) else [pattern]
+        for match in matches:
+            if os.path.isdir(match):
+                found = utils.collect_pdf_files(match, recursive)
+                if skip_signed:
+                    found = [p for p in found if not os.path.splitext(p)[0].endswith("_signed")]
+                paths.extend(found)
+            else:
+                paths.append(match)
+
+    return list(dict.fromkeys(paths))
+
+##
+# @brief Reads the key password from the source selected on the command line.
+#
+# Order of precedence: `--password-env`, `--password-stdin`, interactive prompt.
+#
+# @param args Parsed command-line arguments.
+# @return Password string.
+# @throws ValueError If no password can be obtained.
+def read_password(args):
+    if args.password_env:
+        pwd = os.environ.get(args.password_env)
+        if pwd is None:
+            raise ValueError(f"Environment variable {args.password_env} is not set")
+        return pwd
+
+    if args.password_stdin:
+        return sys.stdin.readline().rstrip("\r\n")
+
+    if sys.stdin.isatty():
+        return getpass.getpass("Private key password: ", stream=sys.stderr)
+
+    raise ValueError("No password given, use --password-env or --password-stdin")
+
+##
+# @brief Writes a single result as one JSON line to standard output.
+# @param result Dictionary with the result.
+# @param file Stream to write to (None = current standard output).
+def emit(result, file=None):
+    print(json.dumps(result, ensure_ascii=False), file=file, flush=True)
+
+##
+# @brief Signs the given PDF files with one unlock of the private key.
+# @param args Parsed command-line arguments.
+# @return Process exit code.
+def cmd_sign(args):
+    import sign
+
+    pwd = read_password(args)
+    stdout = sys.stdout
+    exit_code = EXIT_OK
+
+    def report(pdf_path, output, error):
+        nonlocal exit_code
+        if error is None:
+            emit({"pdf_path": pdf_path, "status": "signed", "output": output}, stdout)
+        else:
+            emit({"pdf_path": pdf_path, "status": "error", "message": str(error)}, stdout)
+            exit_code = EXIT_FAILED
+
+    # Messages of sign_pdfs (e.g. a wrong password) must not mix with JSON output
+    with contextlib.redirect_stdout(sys.stderr):
+        results = sign.sign_pdfs(expand_inputs(args.inputs, args.recursive, skip_signed=True), args.key, pwd,
+                                 signature_format=args.format, low_memory=args.low_memory or None,
+                                 on_result=report)
+    if results is None:
+        return EXIT_USAGE
+
+    return exit_code
+
+##
+# @brief Runs the watch-folder signing service until interrupted.
+# @param args Parsed command-line arguments.
+# @return Process exit code.
+def cmd_watch(args):
+    import watch_service
+
+    pwd = read_password(args)
+    try:
+        private_key = utils.load_private_key(args.key, pwd)
+    except ValueError:
+        print("Error: Wrong private key password!", file=sys.stderr)
+        return EXIT_USAGE
+
+    service = watch_service.SigningService(
+        args.inbox, args.outbox, args.quarantine, private_key, args.format,
+        archive=args.archive, max_workers=args.workers, max_pending=args.max_pending,
+        poll_interval=args.poll_interval, stable_time=args.stable_time)
+    # Progress messages of the service must not mix with JSON output
+    with contextlib.redirect_stdout(sys.stderr):
+        service.run()
+
+    emit({"signed": service.signed, "failed": service.failed})
+    return EXIT_OK if service.failed == 0 else EXIT_FAILED
+
+##
+# @brief Runs the local HTTP signing and verification service until interrupted.
+# @param args Parsed command-line arguments.
+# @return Process exit code.
+def cmd_serve(args):
+    import asyncio
+    import http_service
+
+    if args.key is None and not args.public_key:
+        raise ValueError("Give --key, --public-key or both")
+
+    private_key = None
+    if args.key is not None:
+        pwd = read_password(args)
+        try:
+            private_key = utils.load_private_key(args.key, pwd)
+        except ValueError:
+            print("Error: Wrong private key password!", file=sys.stderr)
+            return EXIT_USAGE
+
+    token = None
+    if args.token_env is not None:
+        token = os.environ.get(args.token_env)
+        if not token:
+            raise ValueError(f"Environment variable {args.token_env} is not set")
+
+    service = http_service.SigningHttpService(private_key, args.public_key, args.workers, args.max_body, token)
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            if token is None:
+                print(f"Access token: {service.token}")
+            asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    return EXIT_OK
+
+##
+# @brief Verifies the given PDF files in parallel worker processes.
+# @param args Parsed command-line arguments.
+# @return Process exit code, `EXIT_OK` only if every signature is valid.
+def cmd_verify(args):
+    import verify
+
+    pdf_paths = expand_inputs(args.inputs, args.recursive)
+
+    exit_code = EXIT_OK
+    for result in verify.verify_pdfs(pdf_paths, args.public_key, args.workers, not args.unordered,
+                                     cache_path=args.cache, trust_mtime=args.cache_trust_mtime,
+                                     prefilter=args.triage):
+        emit(result.to_dict())
+        if not result.is_valid():
+            exit_code = EXIT_FAILED
+
+    return exit_code
+
+##
+# @brief Classifies PDF files by signature presence without parsing them.
+# @param args Parsed command-line arguments.
+# @return Process exit code.
+def cmd_triage(args):
+    import triage
+
+    exit_code = EXIT_OK
+    for pdf_path in expand_inputs(args.inputs, args.recursive):
+        try:
+            emit({"pdf_path": pdf_path, "triage": triage.triage_pdf(pdf_path)})
+        except OSError as e:
+            emit({"pdf_path": pdf_path, "triage": "error", "message": str(e)})
+            exit_code = EXIT_FAILED
+    return exit_code
+
+##
+# @brief Generates a new RSA key pair in the given directory.
+# @param args Parsed command-line arguments.
+# @return Process exit code.
+def cmd_keygen(args):
+    pwd = read_password(args)
+
+    # Timing messages of generate_key_pair must not mix with JSON output
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            utils.generate_key_pair(args.directory, pwd, args.kdf_profile)
+    except OSError as e:
+        emit({"directory": args.directory, "status": "error", "message": str(e)})
+        return EXIT_FAILED
+
+    emit({
+        "private_key": os.path.join(args.directory, "private_key.pem"),
+        "public_key": os.path.join(args.directory, "public_key.pem"),
+        "kdf_profile": args.kdf_profile,
+        "status": "generated",
+    })
+    return EXIT_OK
+
+##
+# @brief Measures key unlock time for every protection profile and picks one for a target latency.
+# @param args Parsed command-line arguments.
+# @return Process exit code.
+def cmd_kdf_benchmark(args):
+    profile, timings = utils.calibrate_kdf_profile(args.target_ms / 1000, args.rounds)
+
+    emit({
+        "target_ms": args.target_ms,
+        "profile": profile,
+        "unlock_ms": {name: round(elapsed * 1000, 1) for name, elapsed in timings.items()},
+    })
+    return EXIT_OK
+
+##
+# @brief Reports the key protection profile of private key files.
+# @param args Parsed command-line arguments.
+# @return Process exit code.
+def cmd_kdf_info(args):
+    exit_code = EXIT_OK
+    for key_path in args.keys:
+        with open(key_path, "rb") as f:
+            info = utils.detect_kdf_profile(f.read())
+        if info is None:
+            emit({"key": key_path, "status": "not an encrypted PKCS#8 key"})
+            exit_code = EXIT_FAILED
+        else:
+            emit({"key": key_path, **info})
+    return exit_code
+
+##
+# @brief Adds password source options to a subcommand parser.
+# @param parser Subcommand parser.
+def add_password_arguments(parser):
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--password-env", metavar="VAR",
+                       help="read the private key password from this environment variable")
+    group.add_argument("--password-stdin", action="store_true",
+                       help="read the private key password from the first line of stdin")
+
+##
+# @brief Builds the command-line argument parser.
+# @return `argparse.ArgumentParser` instance.
+def build_parser():
+    parser = argparse.ArgumentParser(description="Sign and verify PDF documents without the GUI.")
+    parser.add_argument("--trace", action="store_true",
+                        help="write per-stage timing spans as JSON lines to stderr "
+                             "(stages run in verification worker processes are not reported)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    sign_parser = subparsers.add_parser("sign", help="sign PDF files")
+    sign_parser.add_argument("inputs", nargs="+", help="PDF files, directories or glob patterns")
+    sign_parser.add_argument("--key", required=True, help="path to the encrypted private key")
+    sign_parser.add_argument("--format", choices=utils.FORMATS,
+                             default=utils.FORMAT_LEGACY, help="signature format")
+    sign_parser.add_argument("--low-memory", action="store_true",
+                             help="stream legacy signing through the hash instead of buffering the document "
+                                  "(used automatically for large files)")
+    sign_parser.add_argument("--recursive", action="store_true", help="search directories recursively")
+    add_password_arguments(sign_parser)
+    sign_parser.set_defaults(func=cmd_sign)
+
+    watch_parser = subparsers.add_parser("watch", help="sign PDF files dropped into an inbox directory")
+    watch_parser.add_argument("inbox", help="directory watched for new PDF files")
+    watch_parser.add_argument("--outbox", required=True, help="directory receiving signed files")
+    watch_parser.add_argument("--quarantine", required=True, help="directory receiving files that failed")
+    watch_parser.add_argument("--archive", help="directory receiving originals (default: originals are deleted)")
+    watch_parser.add_argument("--key", required=True, help="path to the encrypted private key")
+    watch_parser.add_argument("--format", choices=utils.FORMATS,
+                              default=utils.FORMAT_LEGACY, help="signature format")
+    watch_parser.add_argument("--workers", type=int, default=None,
+                              help="number of worker processes (default: number of CPUs)")
+    watch_parser.add_argument("--max-pending", type=int, default=None,
+                              help="files signed at once before new files wait in the inbox (default: 2x workers)")
+    watch_parser.add_argument("--poll-interval", type=float, default=1.0, help="seconds between inbox scans")
+    watch_parser.add_argument("--stable-time", type=float, default=2.0,
+                              help="seconds a file must stay unchanged before it is signed")
+    add_password_arguments(watch_parser)
+    watch_parser.set_defaults(func=cmd_watch)
+
+    serve_parser = subparsers.add_parser("serve", help="run the local HTTP signing/verification service")
+    serve_parser.add_argument("--host", default="127.0.0.1", help="address to bind")
+    serve_parser.add_argument("--port", type=int, default=8750, help="port to bind")
+    serve_parser.add_argument("--key", help="encrypted private key used by POST /sign")
+    serve_parser.add_argument("--public-key", action="append", default=[],
+                              help="public key used by POST /verify (repeat for more keys, the first is the default)")
+    serve_parser.add_argument("--workers", type=int, default=None,
+                              help="number of worker processes (default: number of CPUs)")
+    serve_parser.add_argument("--max-body", type=int, default=1024 * 1024 * 1024,
+                              help="largest accepted upload in bytes")
+    serve_parser.add_argument("--token-env", metavar="VAR",
+                              help="read the access token from this environment variable"
+                                   " (default: generate one and print it at startup)")
+    add_password_arguments(serve_parser)
+    serve_parser.set_defaults(func=cmd_serve)
+
+    verify_parser = subparsers.add_parser("verify", help="verify signed PDF files")
+    verify_parser.add_argument("inputs", nargs="+", help="PDF files, directories or glob patterns")
+    verify_parser.add_argument("--public-key", required=True, help="path to the public key")
+    verify_parser.add_argument("--workers", type=int, default=None,
+                               help="number of worker processes (default: number of CPUs)")
+    verify_parser.add_argument("--unordered", action="store_true",
+                               help="report results as soon as they are ready")
+    verify_parser.add_argument("--recursive", action="store_true", help="search directories recursively")
+    verify_parser.add_argument("--cache", metavar="DB",
+                               help="reuse verdicts of unchanged files stored in this SQLite database")
+    verify_parser.add_argument("--cache-trust-mtime", action="store_true",
+                               help="with --cache, skip reading files whose path, size and mtime are unchanged")
+    verify_parser.add_argument("--triage", action="store_true",
+                               help="report files the fast triage scan finds unsigned without parsing them")
+    verify_parser.set_defaults(func=cmd_verify)
+
+    triage_parser = subparsers.add_parser("triage", help="find signed PDF files without verifying them")
+    triage_parser.add_argument("inputs", nargs="+", help="PDF files, directories or glob patterns")
+    triage_parser.add_argument("--recursive", action="store_true", help="search directories recursively")
+    triage_parser.set_defaults(func=cmd_triage)
+
+    keygen_parser = subparsers.add_parser("keygen", help="generate a new RSA key pair")
+    keygen_parser.add_argument("directory", help="directory where both keys are saved")
+    keygen_parser.add_argument("--kdf-profile", choices=list(utils.KDF_PROFILES),
+                               default=utils.DEFAULT_KDF_PROFILE,
+                               help="cost of the private key protection")
+    add_password_arguments(keygen_parser)
+    keygen_parser.set_defaults(func=cmd_keygen)
+
+    benchmark_parser = subparsers.add_parser("kdf-benchmark",
+                                             help="pick a key protection profile for a target unlock time")
+    benchmark_parser.add_argument("--target-ms", type=float, default=250,
+                                  help="acceptable key unlock time in milliseconds")
+    benchmark_parser.add_argument("--rounds", type=int, default=3, help="measurements per profile")
+    benchmark_parser.set_defaults(func=cmd_kdf_benchmark)
+
+    info_parser = subparsers.add_parser("kdf-info", help="show the protection profile of private keys")
+    info_parser.add_argument("keys", nargs="+", help="private key files")
+    info_parser.set_defaults(func=cmd_kdf_info)
+
+    return parser
+
+##
+# @brief Command-line entry point.
+# @param argv Arguments without the program name (None = `sys.argv[1:]`).
+# @return Process exit code.
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.trace:
+        tracing.set_tracer(lambda span: print(json.dumps(span.to_dict()), file=sys.stderr, flush=True))
+
+    try:
+        return args.func(args)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return EXIT_USAGE
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,355 @@
+##
+# @file http_service.py
+# @brief Local HTTP service for signing and verifying PDF documents.
+#
+# Built on `asyncio` streams only. Request bodies are streamed into temporary files
+# (`Content-Length` or `Transfer-Encoding: chunked`), never held in memory as a whole.
+# Parsing, hashing and RSA work runs in a process pool, so the event loop keeps
+# accepting requests. Connections are kept alive between requests (HTTP/1.1).
+#
+# Everything expensive is done once:
+# - the private key is unlocked at startup and handed to the workers (see `signing_worker`),
+# - parsed public keys stay in the process-wide `key_cache` of each worker.
+#
+# Endpoints:
+# - `POST /sign[?format=legacy|incremental|detached]`: body is a PDF, response is the signed PDF
+#   (the JSON sidecar for the detached format),
+# - `POST /verify[?key=<name>]`: body is a PDF, response is the JSON verification result;
+#   `name` selects one of the configured public keys (file name without extension),
+# - `GET /health`: JSON with the service state.
+#
+# The service is meant for local clients and binds to 127.0.0.1 by default.
+# Any local process can connect to that address, so `/sign` and `/verify` require
+# the per-run access token in an `Authorization: Bearer <token>` header. The token
+# is generated at startup (and printed by `cli.py serve`) unless one is given.
+
+import asyncio
+import hmac
+import json
+import os
+import secrets
+import shutil
+import signal
+import tempfile
+from urllib.parse import parse_qs, urlsplit
+import sign
+import signing_worker
+import utils
+import verify
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8750
+
+# Largest accepted request body (bytes)
+DEFAULT_MAX_BODY = 1024 * 1024 * 1024
+
+# Largest accepted request line plus headers (bytes)
+MAX_HEADER_SIZE = 64 * 1024
+
+# Size of a single read or write when streaming bodies
+STREAM_CHUNK_SIZE = 256 * 1024
+
+# Idle time after which a kept-alive connection is closed (s)
+KEEP_ALIVE_TIMEOUT = 60
+
+_REASONS = {200: "OK", 400: "Bad Request", 401: "Unauthorized", 404: "Not Found", 405: "Method Not Allowed",
+            413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable"}
+
+# Path -> accepted method
+_ROUTES = {"/health": "GET", "/sign": "POST", "/verify": "POST"}
+
+##
+# @brief Raised while handling a request to send an error response.
+class HttpError(Exception):
+    ##
+    # @param status HTTP status code.
+    # @param message Error description sent to the client.
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+##
+# @brief Verifies a file in a worker process.
+# @return Dictionary from `VerificationResult.to_dict()` without the (temporary) file path.
+def _verify_file(pdf_path, public_key_path):
+    result = verify.check_pdf_signature(pdf_path, public_key_path).to_dict()
+    del result["pdf_path"]
+    return result
+
+##
+# @class SigningHttpService
+# @brief asyncio HTTP server exposing signing and verification.
+class SigningHttpService:
+    ##
+    # @param private_key Unlocked `RsaKey` used by `/sign`, or None to disable signing.
+    # @param public_keys List of public key paths usable by `/verify`; the first one is the default.
+    # @param max_workers Number of worker processes (None = number of CPUs).
+    # @param max_body Largest accepted request body in bytes.
+    # @param token Access token required by `/sign` and `/verify` (None = generate a random one).
+    def __init__(self, private_key=None, public_keys=(), max_workers=None, max_body=DEFAULT_MAX_BODY,
+                 token=None):
+        self.can_sign = private_key is not None
+        self.public_keys = {os.path.splitext(os.path.basename(p))[0]: p for p in public_keys}
+        self.default_public_key = public_keys[0] if public_keys else None
+        self.max_body = max_body
+        self.token = token or secrets.token_urlsafe(32)
+
+        self.executor = signing_worker.create_executor(private_key, max_workers)
+        self.server = None
+
+        # Tasks handling open connections, cancelled on shutdown
+        self.connections = set()
+        self.work_dir = tempfile.mkdtemp(prefix="pdf-signing-")
+        self.requests = 0
+
+    ##
+    # @brief Serves until cancelled or until `server` is closed.
+    # @param host Address to bind.
+    # @param port Port to bind (0 = any free port).
+    async def serve(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        server = self.server = await asyncio.start_server(self.handle_connection, host, port,
+                                                          limit=MAX_HEADER_SIZE)
+        try:
+            # Closing the server ends `serve_forever`, so temporary files are removed on SIGTERM too
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, server.close)
+        except (NotImplementedError, AttributeError, RuntimeError, ValueError):
+            # Not available on Windows or outside the main thread
+            pass
+
+        port = server.sockets[0].getsockname()[1]
+        print(f"Listening on http://{host}:{port}")
+        try:
+            async with server:
+                await server.serve_forever()
+        except asyncio.CancelledError:
+            pass
+        finally:
+            # Idle kept-alive connections would otherwise outlive the server
+            for task in self.connections:
+                task.cancel()
+            await asyncio.gather(*self.connections, return_exceptions=True)
+            self.close()
+
+    ##
+    # @brief Stops the workers and removes temporary files.
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    ##
+    # @brief Handles the requests of one connection until it is closed.
+    async def handle_connection(self, reader, writer):
+        task = asyncio.current_task()
+        self.connections.add(task)
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), KEEP_ALIVE_TIMEOUT)
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+                    break
+                except asyncio.LimitOverrunError:
+                    await self.send_json(writer, 400, {"error": "Request header too large"}, close=True)
+                    break
+
+                keep_alive = await self.handle_request(head, reader, writer)
+                if not keep_alive:
+                    break
+        finally:
+            writer.close()
+            self.connections.discard(task)
+
+    ##
+    # @brief Handles one request.
+    # @param head Raw request line and headers.
+    # @return Whether the connection may be reused.
+    async def handle_request(self, head, reader, writer):
+        self.requests += 1
+        upload = None
+        try:
+            method, target, version, headers = self.parse_head(head)
+            keep_alive = (version == "HTTP/1.1" and headers.get("connection", "").lower() != "close")
+            url = urlsplit(target)
+            query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+
+            # Everything is checked before the body is read, so rejected uploads are never stored
+            if url.path not in _ROUTES:
+                raise HttpError(404, f"Unknown path {url.path}")
+            if method != _ROUTES[url.path]:
+                raise HttpError(405, f"Method {method} not allowed")
+            if url.path != "/health":
+                self.check_token(headers)
+
+            if method == "POST":
+                if headers.get("expect", "").lower() == "100-continue":
+                    writer.write(b"HTTP/1.1 100 Continue\r\n\r\n")
+                upload = await self.receive_body(reader, headers)
+            elif "transfer-encoding" in headers or headers.get("content-length", "0") != "0":
+                # An unread body would be taken for the next request on this connection
+                raise HttpError(400, f"Unexpected request body for {method}")
+
+            if url.path == "/health":
+                await self.send_json(writer, 200, {"status": "ok", "sign": self.can_sign,
+                                                   "public_keys": list(self.public_keys),
+                                                   "requests": self.requests}, not keep_alive)
+            elif url.path == "/sign":
+                await self.handle_sign(writer, upload, query, keep_alive)
+            else:
+                result = await self.handle_verify(upload, query)
+                await self.send_json(writer, 200, result, not keep_alive)
+            return keep_alive
+        except HttpError as e:
+            # The rest of a rejected body is not read, so the connection cannot be reused
+            await self.send_json(writer, e.status, {"error": str(e)}, close=True)
+            return False
+        except ConnectionError:
+            return False
+        except Exception as e:
+            await self.send_json(writer, 500, {"error": str(e)}, close=True)
+            return False
+        finally:
+            if upload is not None:
+                for path in (upload, "%s_signed%s" % os.path.splitext(upload), utils.sidecar_path(upload)):
+                    if os.path.exists(path):
+                        os.remove(path)
+
+    ##
+    # @brief Checks the access token of a request.
+    # @param headers Request headers with lower-case names.
+    # @throws HttpError If the token is missing or wrong.
+    def check_token(self, headers):
+        scheme, _, token = headers.get("authorization", "").partition(" ")
+        if scheme.lower() != "bearer" or not hmac.compare_digest(token.strip().encode(), self.token.encode()):
+            raise HttpError(401, "Missing or invalid access token")
+
+    ##
+    # @brief Parses the request line and headers.
+    # @return Tuple `(method, target, version, headers)` with lower-case header names.
+    # @throws HttpError If the request is malformed.
+    def parse_head(self, head):
+        try:
+            lines = head.decode("latin-1").split("\r\n")
+            method, target, version = lines[0].split(" ")
+            headers = {}
+            for line in lines[1:]:
+                if line:
+                    name, value = line.split(":", 1)
+                    headers[name.strip().lower()] = value.strip()
+        except ValueError:
+            raise HttpError(400, "Malformed request")
+        return method, target, version, headers
+
+    ##
+    # @brief Streams the request body into a temporary file.
+    # @return Path to the temporary file.
+    # @throws HttpError If the body is missing or too large.
+    async def receive_body(self, reader, headers):
+        fd, path = tempfile.mkstemp(suffix=".pdf", dir=self.work_dir)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                if headers.get("transfer-encoding", "").lower() == "chunked":
+                    await self._receive_chunked(reader, f)
+                elif "content-length" in headers:
+                    try:
+                        length = int(headers["content-length"])
+                    except ValueError:
+                        raise HttpError(400, "Invalid Content-Length")
+                    if length > self.max_body:
+                        raise HttpError(413, f"Body larger than {self.max_body} bytes")
+                    await self._receive_exact(reader, f, length)
+                else:
+                    raise HttpError(400, "Request body required")
+        except BaseException:
+            os.remove(path)
+            raise
+        return path
+
+    async def _receive_exact(self, reader, f, length):
+        while length > 0:
+            data = await reader.read(min(length, STREAM_CHUNK_SIZE))
+            if not data:
+                raise ConnectionError("Connection closed during upload")
+            f.write(data)
+            length -= len(data)
+
+    async def _receive_chunked(self, reader, f):
+        total = 0
+        while True:
+            size_line = await reader.readuntil(b"\r\n")
+            try:
+                size = int(size_line.split(b";")[0], 16)
+            except ValueError:
+                raise HttpError(400, "Malformed chunk")
+            if size == 0:
+                # Skip trailers up to the empty line
+                while await reader.readuntil(b"\r\n") != b"\r\n":
+                    pass
+                return
+            total += size
+            if total > self.max_body:
+                raise HttpError(413, f"Body larger than {self.max_body} bytes")
+            await self._receive_exact(reader, f, size)
+            await reader.readexactly(2)
+
+    ##
+    # @brief Signs the uploaded PDF and streams the signed file (or detached signature) back.
+    async def handle_sign(self, writer, upload, query, keep_alive):
+        if not self.can_sign:
+            raise HttpError(503, "No private key loaded")
+        signature_format = query.get("format", utils.FORMAT_LEGACY)
+        if signature_format not in utils.FORMATS:
+            raise HttpError(400, f"Unknown signature format: {signature_format}")
+
+        loop = asyncio.get_running_loop()
+        try:
+            signed_path = await loop.run_in_executor(self.executor, signing_worker.sign_file, upload,
+                                                     signature_format)
+        except sign.SigningCancelled:
+            raise HttpError(503, "Signing cancelled")
+        except Exception as e:
+            raise HttpError(400, f"Could not sign the PDF: {e}")
+
+        if signature_format == utils.FORMAT_DETACHED:
+            content_type = "application/json; charset=utf-8"
+        else:
+            content_type = "application/pdf"
+        size = os.path.getsize(signed_path)
+        self.send_head(writer, 200, content_type, size, not keep_alive)
+        with open(signed_path, "rb") as f:
+            while True:
+                data = f.read(STREAM_CHUNK_SIZE)
+                if not data:
+                    break
+                writer.write(data)
+                await writer.drain()
+
+    ##
+    # @brief Verifies the uploaded PDF.
+    # @return Dictionary with the verification result.
+    async def handle_verify(self, upload, query):
+        name = query.get("key")
+        public_key_path = self.public_keys.get(name) if name else self.default_public_key
+        if public_key_path is None:
+            raise HttpError(400, f"Unknown public key: {name}" if name else "No public key configured")
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, _verify_file, upload, public_key_path)
+
+    ##
+    # @brief Writes the status line and headers of a response.
+    def send_head(self, writer, status, content_type, length, close):
+        writer.write((f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+                      f"Content-Type: {content_type}\r\n"
+                      f"Content-Length: {length}\r\n"
+                      f"Connection: {'close' if close else 'keep-alive'}\r\n"
+                      f"\r\n").encode("latin-1"))
+
+    ##
+    # @brief Sends a JSON response.
+    async def send_json(self, writer, status, body, close=False):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_head(writer, status, "application/json; charset=utf-8", len(data), close)
+        writer.write(data)
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
@@ -0,0 +1,136 @@
+##
+# @file key_cache.py
+# @brief Cache of parsed public keys used for signature verification.
+#
+# Parsing a PEM public key with `RSA.import_key` on every verification is pure overhead
+# when many documents are verified against a handful of signer keys. This module keeps
+# ready-to-use `pkcs1_15` verifier objects in memory with LRU eviction.
+
+from collections import OrderedDict
+from Cryptodome.Hash import SHA256
+from Cryptodome.PublicKey import RSA
+from Cryptodome.Signature import pkcs1_15
+import os
+import threading
+
+# Default number of public keys kept in a cache
+DEFAULT_MAX_KEYS = 32
+
+##
+# @class PublicKeyCache
+# @brief LRU cache of `pkcs1_15` verifiers keyed by key file path, mtime and content fingerprint.
+#
+# A cached entry is reused only while the file keeps the same modification time and size.
+# When the file changes its content is read again; if the content fingerprint matches
+# a key already in the cache (e.g. the same key under another path), the parsed key is reused.
+# All methods are thread-safe.
+class PublicKeyCache:
+    ##
+    # @brief Creates an empty cache.
+    # @param max_keys Maximum number of parsed keys kept in memory.
+    def __init__(self, max_keys=DEFAULT_MAX_KEYS):
+        self.max_keys = max_keys
+
+        # Absolute path -> (mtime_ns, size, fingerprint)
+        self._paths = {}
+
+        # Fingerprint -> (verifier, key fingerprint), ordered from least to most recently used
+        self._verifiers = OrderedDict()
+
+        self._lock = threading.Lock()
+
+    ##
+    # @brief Returns a verifier for the public key stored in the given file.
+    # @param public_key_path Path to the public key file (PEM format).
+    # @return `pkcs1_15` signature scheme object ready to call `verify()`.
+    # @throws ValueError If the file does not contain a valid RSA key.
+    def get_verifier(self, public_key_path):
+        return self._lookup(public_key_path)[0][0]
+
+    ##
+    # @brief Returns the content fingerprint of the given public key file.
+    # @param public_key_path Path to the public key file (PEM format).
+    # @return Hex SHA-256 digest of the key file content.
+    def get_fingerprint(self, public_key_path):
+        return self._lookup(public_key_path)[1]
+
+    ##
+    # @brief Returns the fingerprint of the key itself, independent of the file encoding.
+    # @param public_key_path Path to the public key file (PEM format).
+    # @return Hex SHA-256 digest of the DER-encoded public key (as `utils.public_key_fingerprint`).
+    def get_key_fingerprint(self, public_key_path):
+        return self._lookup(public_key_path)[0][1]
+
+    ##
+    # @brief Removes cached keys.
+    # @param public_key_path Path of the key to forget, or None to clear the whole cache.
+    def invalidate(self, public_key_path=None):
+        with self._lock:
+            if public_key_path is None:
+                self._paths.clear()
+                self._verifiers.clear()
+                return
+
+            entry = self._paths.pop(os.path.abspath(public_key_path), None)
+            if entry is not None and entry[2] not in (e[2] for e in self._paths.values()):
+                self._verifiers.pop(entry[2], None)
+
+    ##
+    # @brief Finds or loads the verifier and fingerprints for a key file.
+    # @param public_key_path Path to the public key file (PEM format).
+    # @return Tuple `((verifier, key_fingerprint), fingerprint)`.
+    def _lookup(self, public_key_path):
+        path = os.path.abspath(public_key_path)
+        stat = os.stat(path)
+
+        with self._lock:
+            entry = self._paths.get(path)
+            if (entry is not None and entry[0] == stat.st_mtime_ns and entry[1] == stat.st_size
+                    and entry[2] in self._verifiers):
+                self._verifiers.move_to_end(entry[2])
+                return self._verifiers[entry[2]], entry[2]
+
+        with open(path, "rb") as f:
+            public_key_data = f.read()
+        fingerprint = SHA256.new(public_key_data).hexdigest()
+
+        with self._lock:
+            loaded = self._verifiers.get(fingerprint)
+            if loaded is None:
+                public_key = RSA.import_key(public_key_data)
+                key_fingerprint = SHA256.new(public_key.export_key(format="DER")).hexdigest()
+                loaded = (pkcs1_15.new(public_key), key_fingerprint)
+                self._verifiers[fingerprint] = loaded
+            self._verifiers.move_to_end(fingerprint)
+            self._paths[path] = (stat.st_mtime_ns, stat.st_size, fingerprint)
+
+            while len(self._verifiers) > self.max_keys:
+                evicted, _ = self._verifiers.popitem(last=False)
+                for p in [p for p, e in self._paths.items() if e[2] == evicted]:
+                    del self._paths[p]
+
+        return loaded, fingerprint
+
+
+# Cache shared by all verifications in this process
+default_cache = PublicKeyCache()
+
+##
+# @brief Returns a verifier for a public key file using the process-wide cache.
+# @param public_key_path Path to the public key file (PEM format).
+# @return `pkcs1_15` signature scheme object ready to call `verify()`.
+def get_verifier(public_key_path):
+    return default_cache.get_verifier(public_key_path)
+
+##
+# @brief Returns the fingerprint of a public key using the process-wide cache.
+# @param public_key_path Path to the public key file (PEM format).
+# @return Hex SHA-256 digest of the DER-encoded public key.
+def get_key_fingerprint(public_key_path):
+    return default_cache.get_key_fingerprint(public_key_path)
+
+##
+# @brief Forgets cached public keys in the process-wide cache.
+# @param public_key_path Path of the key to forget, or None to clear the whole cache.
+def invalidate(public_key_path=None):
+    default_cache.invalidate(public_key_path)
@@ -23,7 +23,9 @@ class MainApp(ctk.CTk):
     # @brief Constructor for MainApp.
     #
     # Sets appearance, window size, and initializes all frames.
-    def __init__(self):
+    #
+    # @param usb_backend Drive backend for the USB monitor (None = platform default, see `drive_backends`).
+    def __init__(self, usb_backend=None):
         super().__init__()
 
         # Initial settings
@@ -49,7 +51,10 @@ class MainApp(ctk.CTk):
         # Initialize and place frames
         for F in (MainMenu, SignFrame, VerifyFrame):
             page_name = F.__name__
-            frame = F(parent=self.container, controller=self)
+            if F is SignFrame:
+                frame = F(parent=self.container, controller=self, usb_backend=usb_backend)
+            else:
+                frame = F(parent=self.container, controller=self)
             self.frames[page_name] = frame
             frame.grid(row=0, column=0, sticky="nsew")
 
@@ -6,8 +6,57 @@
 # to generate a hash and sign it with a private key.
 
 from PyPDF2 import PdfReader, PdfWriter
+import tracing
+import triage
 import utils
+import contextlib
+import io
+import json
 import os
+import shutil
+
+# Signing stages reported to the progress callback, in the order they run
+STAGE_KEY_UNLOCK = "key unlock"
+STAGE_NORMALIZE = "normalize"
+STAGE_HASH = "hash"
+STAGE_SIGN = "sign"
+STAGE_WRITE = "write"
+STAGES = (STAGE_KEY_UNLOCK, STAGE_NORMALIZE, STAGE_HASH, STAGE_SIGN, STAGE_WRITE)
+
+# Files of at least this size are signed in low-memory mode unless the caller decides (bytes)
+LOW_MEMORY_THRESHOLD = 256 * 1024 * 1024
+
+##
+# @brief Raised when signing is cancelled through the cancel event.
+class SigningCancelled(Exception):
+    pass
+
+##
+# @brief Reports the start of a signing stage and checks for cancellation.
+# @param stage One of the `STAGE_*` constants.
+# @param progress Optional callback called with the stage name.
+# @param cancel_event Optional `threading.Event`; when set, signing stops.
+# @throws SigningCancelled If the cancel event is set.
+def _enter_stage(stage, progress, cancel_event):
+    if cancel_event is not None and cancel_event.is_set():
+        raise SigningCancelled("Signing cancelled")
+    if progress is not None:
+        progress(stage)
+
+##
+# @brief Builds a normalized in-memory copy of a parsed PDF.
+#
+# Copies every page and the document metadata into a fresh `PdfWriter`.
+# Serializing the returned writer yields the same bytes as `normalize_pdf`.
+#
+# @param reader Parsed `PdfReader` of the original PDF file.
+# @return `PdfWriter` holding the normalized document.
+def build_normalized_writer(reader):
+    writer = PdfWriter()
+    writer.add_metadata(reader.metadata)
+    for page in reader.pages:
+        writer.add_page(page)
+    return writer
 
 ##
 # @brief Creates a normalized copy of a PDF file.
@@ -22,12 +71,7 @@ def normalize_pdf(input_path, output_path):
     Creates 1:1 copy of PDF file using PyPDF2 lib.
     Without normalization first (before signing) hash differs at verification.
     """
-    reader = PdfReader(input_path)
-    metadata = reader.metadata
-    writer = PdfWriter()
-    writer.add_metadata(metadata)
-    for page in reader.pages:
-        writer.add_page(page)
+    writer = build_normalized_writer(PdfReader(input_path))
 
     with open(output_path, "wb") as f:
         writer.write(f)
@@ -58,41 +102,383 @@ def add_signature_to_metadata(pdf_path, output_path, signature):
         writer.write(f)
 
 ##
-# @brief Creates a digital signature and embeds it in the PDF.
+# @brief Creates a legacy format signature with an unlocked key and embeds it in the PDF.
+#
+# The input file is parsed once. The normalized document is serialized and hashed,
+# signed with the private key, and the same writer is serialized again with
+# the signature in its metadata. No intermediate files are written to disk.
+# The result is saved as a new PDF file with a `_signed` suffix.
+#
+# Two memory modes produce identical output:
+# - default: the file is read into memory by `PdfReader` and the normalized
+#   document is serialized into an in-memory buffer that is hashed afterwards,
+#   so peak memory is about three times the document size,
+# - low memory: the reader works on the open file and the normalized document
+#   is serialized straight into the hash (`utils.HashingSink`), so neither the raw
+#   input nor the serialized output is ever held in memory. Peak memory is bounded
+#   by the object graph of the document held by the reader and writer (all page
+#   content streams, roughly one document size) plus a few buffers of constant size.
+#
+# @param pdf_path Path to the input PDF file.
+# @param private_key Decrypted `RsaKey` object (see `utils.load_private_key`).
+# @param progress Optional callback called with the name of each stage as it starts.
+# @param cancel_event Optional `threading.Event` checked before each stage.
+# @param low_memory True/False to choose the memory mode, None to use low memory
+#                   for files of at least `LOW_MEMORY_THRESHOLD` bytes.
+# @return Path to the signed PDF file.
+# @throws SigningCancelled If the cancel event was set; no output file is left behind.
+def sign_pdf_legacy(pdf_path, private_key, progress=None, cancel_event=None, low_memory=None):
+    base, ext = os.path.splitext(pdf_path)
+    singed_pdf_path = f"{base}_signed{ext}"
+
+    # The size is only needed to choose the memory mode and for the parse span
+    file_size = os.path.getsize(pdf_path) if low_memory is None or tracing.enabled() else None
+    if low_memory is None:
+        low_memory = file_size >= LOW_MEMORY_THRESHOLD
+
+    _enter_stage(STAGE_NORMALIZE, progress, cancel_event)
+    # In low-memory mode the reader loads objects from the open file on demand,
+    # so the file must stay open until the signed copy is written
+    with (open(pdf_path, "rb") if low_memory else contextlib.nullcontext(pdf_path)) as source:
+        with tracing.span(tracing.SPAN_PARSE, pdf_path, file_size):
+            writer = build_normalized_writer(PdfReader(source))
+
+        # Serializing the normalized writer gives exactly the bytes
+        # the verifier reconstructs from the signed file.
+        if low_memory:
+            _enter_stage(STAGE_HASH, progress, cancel_event)
+            with tracing.span(tracing.SPAN_HASH, pdf_path) as span:
+                sink = utils.HashingSink()
+                writer.write(sink)
+                span.bytes = sink.tell()
+            file_hash = sink.hash
+        else:
+            with tracing.span(tracing.SPAN_NORMALIZE_WRITE, pdf_path) as span:
+                normalized = io.BytesIO()
+                writer.write(normalized)
+                span.bytes = normalized.tell()
+
+            _enter_stage(STAGE_HASH, progress, cancel_event)
+            with tracing.span(tracing.SPAN_HASH, pdf_path, normalized.tell()):
+                file_hash = utils.create_stream_hash(normalized.getbuffer())
+            del normalized
+
+        _enter_stage(STAGE_SIGN, progress, cancel_event)
+        with tracing.span(tracing.SPAN_RSA, pdf_path):
+            signed_hash = utils.sign_hash_with_key(private_key, file_hash)
+
+        writer.add_metadata({
+            "/Signature": signed_hash
+        })
+
+        _enter_stage(STAGE_WRITE, progress, cancel_event)
+        with tracing.span(tracing.SPAN_OUTPUT_WRITE, pdf_path) as span, open(singed_pdf_path, "wb") as f:
+            writer.write(f)
+            span.bytes = f.tell()
+
+    return singed_pdf_path
+
+##
+# @brief Reads the offset of the last cross-reference section of a PDF file.
+# @param f PDF file opened in binary mode.
+# @param file_size Size of the file in bytes.
+# @return Offset stored after the last `startxref` keyword.
+# @throws ValueError If the file has no `startxref` keyword.
+def _read_startxref(f, file_size):
+    tail_size = min(file_size, 1024)
+    f.seek(file_size - tail_size)
+    tail = f.read(tail_size)
+    position = tail.rfind(b"startxref")
+    if position < 0:
+        raise ValueError("startxref not found")
+    return int(tail[position + len(b"startxref"):].split()[0])
+
+##
+# @brief Returns the first object number that is not used by a parsed PDF.
+#
+# Files with a cross-reference stream have no classic trailer, and PyPDF2 does not copy
+# `/Size` from the stream dictionary, so the highest number in the cross-reference
+# data is used as well.
+#
+# @param reader `PdfReader` of the file.
+# @return Object number for a new object.
+def _next_object_number(reader):
+    highest = max([number for section in reader.xref.values() for number in section]
+                  + list(reader.xref_objStm), default=0)
+    return max(int(reader.trailer.get("/Size", 0)), highest + 1)
+
+##
+# @brief Serializes a PyPDF2 object to PDF syntax.
+# @param obj PyPDF2 generic object (e.g. an indirect reference or an array).
+# @return PDF syntax of the object as a string.
+def _pdf_object_to_str(obj):
+    stream = io.BytesIO()
+    obj.write_to_stream(stream, None)
+    return stream.getvalue().decode("latin-1")
+
+##
+# @brief Builds the signature dictionary object of an incremental update.
+# @param obj_num Object number of the signature dictionary.
+# @param byte_range Four integers of the `/ByteRange` entry.
+# @param contents Hex string placed in `/Contents`.
+# @return Serialized indirect object.
+def _build_signature_object(obj_num, byte_range, contents):
+    byte_range_str = " ".join(f"{value:010d}" for value in byte_range)
+    return (f"{obj_num} 0 obj\n"
+            f"<< /Type /Sig /Filter /{utils.INCREMENTAL_FILTER} /SubFilter /{utils.INCREMENTAL_SUBFILTER}"
+            f" /ByteRange [{byte_range_str}] /Contents <{contents}> >>\n"
+            f"endobj\n").encode("latin-1")
+
+##
+# @brief Creates an incremental update signature with an unlocked key.
 #
-# Normalizes the input file, generates a hash, and signs it using a private key.
+# The original bytes are kept as they are. A signature dictionary, a cross-reference
+# section and a new trailer are appended after them, in the style of PAdES.
+# The signature covers the whole resulting file except the `/Contents` hex string,
+# as described by the `/ByteRange` entry. Only the trailer is parsed, pages are never
+# rewritten, so the cost is about one pass over the file.
 # The result is saved as a new PDF file with a `_signed` suffix.
 #
 # @param pdf_path Path to the input PDF file.
+# @param private_key Decrypted `RsaKey` object (see `utils.load_private_key`).
+# @param progress Optional callback called with the name of each stage as it starts.
+# @param cancel_event Optional `threading.Event` checked before each stage.
+# @return Path to the signed PDF file.
+# @throws SigningCancelled If the cancel event was set; no output file is left behind.
+# @throws ValueError If the PDF is encrypted.
+def sign_pdf_incremental(pdf_path, private_key, progress=None, cancel_event=None):
+    base, ext = os.path.splitext(pdf_path)
+    singed_pdf_path = f"{base}_signed{ext}"
+
+    # Nothing is normalized: the trailer is read and the original bytes are hashed as they are
+    _enter_stage(STAGE_HASH, progress, cancel_event)
+    with open(pdf_path, "rb") as src:
+        file_size = os.fstat(src.fileno()).st_size
+        with tracing.span(tracing.SPAN_PARSE, pdf_path, file_size):
+            prev_xref = _read_startxref(src, file_size)
+
+            # Reading from an open file only loads the cross-reference data and the trailer
+            reader = PdfReader(src)
+            trailer = reader.trailer
+        # Readers would decrypt the appended /Contents string with the document key,
+        # and without /Encrypt in the new trailer the original objects could not be read
+        if "/Encrypt" in trailer:
+            raise ValueError("Encrypted PDF files cannot be signed incrementally, use the detached format")
+        obj_num = _next_object_number(reader)
+        trailer_entries = [f"/Size {obj_num + 1}", f"/Root {_pdf_object_to_str(trailer.raw_get('/Root'))}"]
+        for key in ("/Info", "/ID"):
+            if key in trailer:
+                trailer_entries.append(f"{key} {_pdf_object_to_str(trailer.raw_get(key))}")
+        trailer_entries.append(f"/Prev {prev_xref}")
+        trailer_entries.append(f"{utils.INCREMENTAL_SIGNATURE_KEY} {obj_num} 0 R")
+
+        # Leading newline guarantees the object starts on its own line
+        obj_offset = file_size + 1
+        contents_len = private_key.size_in_bytes() * 2
+        placeholder = _build_signature_object(obj_num, [0, 0, 0, 0], "0" * contents_len)
+        xref_offset = obj_offset + len(placeholder)
+        tail = (f"xref\n"
+                f"{obj_num} 1\n"
+                f"{obj_offset:010d} 00000 n\r\n"
+                f"trailer\n"
+                f"<< {' '.join(trailer_entries)} >>\n"
+                f"startxref\n"
+                f"{xref_offset}\n"
+                f"%%EOF\n").encode("latin-1")
+
+        # Offsets of the `<...>` hex string relative to the signature object
+        contents_start = placeholder.index(b"/Contents <") + len(b"/Contents ")
+        contents_end = contents_start + contents_len + 2
+        total_size = obj_offset + len(placeholder) + len(tail)
+        byte_range = [0, obj_offset + contents_start,
+                      obj_offset + contents_end, total_size - obj_offset - contents_end]
+        signature_object = _build_signature_object(obj_num, byte_range, "0" * contents_len)
+
+        try:
+            with open(singed_pdf_path, "wb") as out:
+                # Copy the original bytes and hash them in the same pass
+                with tracing.span(tracing.SPAN_HASH, pdf_path, file_size):
+                    src.seek(0)
+                    sink = utils.HashingSink(out)
+                    shutil.copyfileobj(src, sink, utils.HASH_CHUNK_SIZE)
+
+                    sink.hash.update(b"\n")
+                    sink.hash.update(signature_object[:contents_start])
+                    sink.hash.update(signature_object[contents_end:])
+                    sink.hash.update(tail)
+
+                _enter_stage(STAGE_SIGN, progress, cancel_event)
+                with tracing.span(tracing.SPAN_RSA, pdf_path):
+                    signed_hash = utils.sign_hash_with_key(private_key, sink.hash)
+                signature_object = _build_signature_object(obj_num, byte_range, signed_hash)
+
+                _enter_stage(STAGE_WRITE, progress, cancel_event)
+                with tracing.span(tracing.SPAN_OUTPUT_WRITE, pdf_path, 1 + len(signature_object) + len(tail)):
+                    out.write(b"\n")
+                    out.write(signature_object)
+                    out.write(tail)
+        except SigningCancelled:
+            os.remove(singed_pdf_path)
+            raise
+
+    return singed_pdf_path
+
+##
+# @brief Creates a detached signature with an unlocked key.
+#
+# The PDF is not modified or copied. Its raw bytes are hashed in a single streaming pass
+# and the signature is written to a small JSON sidecar file next to it
+# (see `utils.sidecar_path`), together with the fingerprint of the signer key,
+# the hash algorithm, the digest and size of the signed bytes.
+#
+# @param pdf_path Path to the input PDF file.
+# @param private_key Decrypted `RsaKey` object (see `utils.load_private_key`).
+# @param progress Optional callback called with the name of each stage as it starts.
+# @param cancel_event Optional `threading.Event` checked before each stage.
+# @return Path to the sidecar file.
+# @throws SigningCancelled If the cancel event was set.
+# @throws ValueError If the file is not a PDF (see `triage.triage_pdf`).
+def sign_pdf_detached(pdf_path, private_key, progress=None, cancel_event=None):
+    output_path = utils.sidecar_path(pdf_path)
+
+    _enter_stage(STAGE_HASH, progress, cancel_event)
+    # Nothing parses the document, so reject files that are not PDFs at all
+    if triage.triage_pdf(pdf_path) == triage.MALFORMED:
+        raise ValueError("Malformed PDF file")
+    with open(pdf_path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        with tracing.span(tracing.SPAN_HASH, pdf_path, size):
+            file_hash = utils.create_stream_hash(f)
+
+    _enter_stage(STAGE_SIGN, progress, cancel_event)
+    with tracing.span(tracing.SPAN_RSA, pdf_path):
+        signed_hash = utils.sign_hash_with_key(private_key, file_hash)
+
+    sidecar = {
+        "version": utils.SIDECAR_VERSION,
+        "file": os.path.basename(pdf_path),
+        "size": size,
+        "hash_algorithm": utils.DETACHED_HASH_ALGORITHM,
+        "digest": file_hash.hexdigest(),
+        "key_fingerprint": utils.public_key_fingerprint(private_key),
+        "signature": signed_hash,
+    }
+
+    _enter_stage(STAGE_WRITE, progress, cancel_event)
+    with tracing.span(tracing.SPAN_OUTPUT_WRITE, pdf_path) as span, open(output_path, "w") as f:
+        json.dump(sidecar, f, indent=2)
+        span.bytes = f.tell()
+
+    return output_path
+
+##
+# @brief Creates a digital signature with an unlocked key.
+#
+# @param pdf_path Path to the input PDF file.
+# @param private_key Decrypted `RsaKey` object (see `utils.load_private_key`).
+# @param signature_format One of `utils.FORMATS`.
+# @param progress Optional callback called with the name of each stage as it starts.
+# @param cancel_event Optional `threading.Event` checked before each stage.
+# @param low_memory Memory mode of the legacy format (see `sign_pdf_legacy`); the incremental
+#                   format always streams the file and ignores it.
+# @return Path to the signed PDF file (the sidecar file for the detached format).
+# @throws ValueError If the signature format is unknown.
+# @throws SigningCancelled If the cancel event was set.
+def sign_pdf_with_key(pdf_path, private_key, signature_format=utils.FORMAT_LEGACY,
+                      progress=None, cancel_event=None, low_memory=None):
+    if signature_format == utils.FORMAT_LEGACY:
+        return sign_pdf_legacy(pdf_path, private_key, progress, cancel_event, low_memory)
+    if signature_format == utils.FORMAT_INCREMENTAL:
+        return sign_pdf_incremental(pdf_path, private_key, progress, cancel_event)
+    if signature_format == utils.FORMAT_DETACHED:
+        return sign_pdf_detached(pdf_path, private_key, progress, cancel_event)
+    raise ValueError(f"Unknown signature format: {signature_format}")
+
+##
+# @brief Creates a digital signature and embeds it in the PDF.
+#
+# Decrypts the private key and signs the file with `sign_pdf_with_key`.
+#
+# @param pdf_path Path to the input PDF file.
 # @param private_key_path Path to the encrypted private key.
 # @param pwd Password to decrypt the private key.
+# @param signature_format One of `utils.FORMATS`.
+# @param progress Optional callback called with the name of each stage as it starts
+#                 (see `STAGES`). It runs on the signing thread.
+# @param cancel_event Optional `threading.Event`; setting it stops signing before the next stage.
+# @param key_loaded Optional callback called with the unlocked `RsaKey` (e.g. to record its fingerprint,
+#                   see `usb_monitor.USBMonitor.register_fingerprint`). It runs on the signing thread.
 # @return True if signing was successful, False on error (e.g. wrong password).
-def sign_pdf(pdf_path, private_key_path, pwd):
+# @throws SigningCancelled If the cancel event was set.
+def sign_pdf(pdf_path, private_key_path, pwd, signature_format=utils.FORMAT_LEGACY,
+             progress=None, cancel_event=None, key_loaded=None):
     """
     Adds signed hash of PDF file to metadata with key '/Signature'
+    (or appends it as an incremental update).
     Signed PDF is saved at input file location with suffix '_signed'
     """
-    base, ext = os.path.splitext(pdf_path)
-    normalized_pdf_path = f"{base}_normalized{ext}"
-    singed_pdf_path = f"{base}_signed{ext}"
+    _enter_stage(STAGE_KEY_UNLOCK, progress, cancel_event)
+    try:
+        with tracing.span(tracing.SPAN_KEY_LOAD, private_key_path):
+            private_key = utils.load_private_key(private_key_path, pwd)
+    except ValueError:
+        print("Error: Wrong private key password!")
 
-    normalize_pdf(pdf_path, normalized_pdf_path)
+        return False
 
-    file_hash = utils.create_pdf_hash(normalized_pdf_path)
+    if key_loaded is not None:
+        key_loaded(private_key)
 
-    try:
-        signed_hash = utils.sign_hash_with_pkey(
-            private_key_path,
-            file_hash,
-            pwd
-        )
-        add_signature_to_metadata(normalized_pdf_path, singed_pdf_path, signed_hash)
+    sign_pdf_with_key(pdf_path, private_key, signature_format, progress, cancel_event)
 
-        os.remove(normalized_pdf_path)
+    return True
 
-        return True
+##
+# @brief Signs many PDF files while decrypting the private key only once.
+#
+# The key is unlocked at the start of the batch and kept in memory
+# until all files are signed. A file that cannot be signed does not stop the batch.
+# Files in a directory that already carry the `_signed` suffix are skipped.
+#
+# @param source Directory with PDF files or a list of PDF file paths.
+# @param private_key_path Path to the encrypted private key.
+# @param pwd Password to decrypt the private key.
+# @param recursive Whether subdirectories of a directory should be signed too.
+# @param signature_format One of `utils.FORMATS`.
+# @param low_memory Memory mode of the legacy format (see `sign_pdf_legacy`).
+# @param on_result Called as `on_result(pdf_path, output, error)` after each file, with the signed
+#        file path or the exception; errors are printed only without it.
+# @return Dictionary mapping each input path to its signed file path (None on error),
+#         or None if the private key could not be decrypted.
+def sign_pdfs(source, private_key_path, pwd, recursive=False, signature_format=utils.FORMAT_LEGACY,
+              low_memory=None, on_result=None):
+    """Signs a list or a directory of PDF files with one key unlock."""
+    try:
+        with tracing.span(tracing.SPAN_KEY_LOAD, private_key_path):
+            private_key = utils.load_private_key(private_key_path, pwd)
     except ValueError:
-        os.remove(normalized_pdf_path)
         print("Error: Wrong private key password!")
 
-        return False
+        return None
+
+    pdf_paths = utils.collect_pdf_files(source, recursive)
+    if isinstance(source, (str, os.PathLike)) and os.path.isdir(source):
+        pdf_paths = [p for p in pdf_paths if not os.path.splitext(p)[0].endswith("_signed")]
+
+    results = {}
+    for pdf_path in pdf_paths:
+        try:
+            results[pdf_path] = sign_pdf_with_key(pdf_path, private_key, signature_format,
+                                                  low_memory=low_memory)
+        except Exception as e:
+            results[pdf_path] = None
+            if on_result is None:
+                print(f"Error: Could not sign {pdf_path}: {e}")
+            else:
+                on_result(pdf_path, None, e)
+            continue
+
+        if on_result is not None:
+            on_result(pdf_path, results[pdf_path], None)
+
+    return results
@@ -0,0 +1,43 @@
+##
+# @file signing_worker.py
+# @brief Worker processes that sign with a private key unlocked once in the parent process.
+#
+# `RsaKey` objects cannot be pickled, so the unlocked key is exported as DER and
+# imported once in every worker process by the pool initializer. Used by the
+# watch-folder service (`watch_service`) and the HTTP service (`http_service`).
+
+from concurrent.futures import ProcessPoolExecutor
+from Cryptodome.PublicKey import RSA
+import sign
+
+# Key set in each worker by `init_worker`
+_key = None
+
+##
+# @brief Pool initializer: imports the unlocked private key in a worker process.
+# @param key_der DER encoding of the private key.
+def init_worker(key_der):
+    global _key
+    _key = RSA.import_key(key_der)
+
+##
+# @brief Signs a file in a worker process with the key set by `init_worker`.
+# @param pdf_path Path to the PDF file.
+# @param signature_format One of `utils.FORMATS`.
+# @return Path to the signed file (or sidecar file).
+# @throws RuntimeError If the worker has no key.
+def sign_file(pdf_path, signature_format):
+    if _key is None:
+        raise RuntimeError("No private key loaded")
+    return sign.sign_pdf_with_key(pdf_path, _key, signature_format)
+
+##
+# @brief Creates a process pool whose workers hold the private key.
+# @param private_key Unlocked `RsaKey` object, or None for workers that do not sign.
+# @param max_workers Number of worker processes (None = number of CPUs).
+# @return `ProcessPoolExecutor`; submit `sign_file` to it to sign.
+def create_executor(private_key=None, max_workers=None):
+    if private_key is None:
+        return ProcessPoolExecutor(max_workers=max_workers)
+    return ProcessPoolExecutor(max_workers=max_workers, initializer=init_worker,
+                               initargs=(private_key.export_key(format="DER"),))
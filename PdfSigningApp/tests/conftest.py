@@ -0,0 +1,93 @@
+##
+# @file conftest.py
+# @brief Shared fixtures of the PdfSigningApp tests.
+#
+# The application modules are flat (`import utils`), so the application directory
+# is put on `sys.path`. Run the suite from the repository root with
+# `python -m pytest PdfSigningApp/tests`.
+
+import os
+import shutil
+import sys
+import pytest
+from Cryptodome.PublicKey import RSA
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPO_DIR = os.path.dirname(APP_DIR)
+sys.path.insert(0, APP_DIR)
+
+import utils  # noqa: E402
+
+SAMPLE_PDF = os.path.join(REPO_DIR, "sample-1.pdf")
+PASSWORD = "test-password"
+
+##
+# @brief Writes a minimal one-page PDF that uses a cross-reference stream instead of an `xref` table.
+#
+# PyPDF2 only writes classic tables, so the file is assembled by hand.
+#
+# @param path Output path.
+def write_xref_stream_pdf(path):
+    content = b"BT /F1 12 Tf 20 100 Td (xref) Tj ET"
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 200 200] /Contents 4 0 R >>",
+        b"<< /Length %d >>\nstream\n%s\nendstream" % (len(content), content),
+        b"<< /Producer (xref stream fixture) >>",
+    ]
+    data = bytearray(b"%PDF-1.5\n%\xe2\xe3\xcf\xd3\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(data))
+        data += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+
+    xref_number = len(objects) + 1
+    offsets.append(len(data))
+    # /W [1 4 2]: type, offset, generation; entry 0 is the head of the free list
+    rows = b"\x00\x00\x00\x00\x00\xff\xff" + b"".join(
+        b"\x01" + offset.to_bytes(4, "big") + b"\x00\x00" for offset in offsets)
+    data += (b"%d 0 obj\n<< /Type /XRef /Size %d /W [1 4 2] /Root 1 0 R /Info 5 0 R /Length %d >>\nstream\n"
+             % (xref_number, xref_number + 1, len(rows)))
+    data += rows + b"\nendstream\nendobj\n"
+    data += b"startxref\n%d\n%%%%EOF\n" % offsets[-1]
+
+    with open(path, "wb") as f:
+        f.write(data)
+
+@pytest.fixture(scope="session")
+def key():
+    return RSA.generate(2048)
+
+##
+# @brief Encrypted private key and public key written to PEM files.
+# @return Tuple `(private_key_path, public_key_path)`.
+@pytest.fixture(scope="session")
+def key_files(tmp_path_factory, key):
+    directory = tmp_path_factory.mktemp("keys")
+    private_key_path = str(directory / "private_key.pem")
+    public_key_path = str(directory / "public_key.pem")
+    with open(private_key_path, "wb") as f:
+        f.write(utils.encrypt_private_key(key, PASSWORD, "low"))
+    with open(public_key_path, "wb") as f:
+        f.write(key.publickey().export_key())
+    return private_key_path, public_key_path
+
+@pytest.fixture(scope="session")
+def other_public_key_path(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("other") / "public_key.pem")
+    with open(path, "wb") as f:
+        f.write(RSA.generate(2048).publickey().export_key())
+    return path
+
+@pytest.fixture
+def sample_pdf(tmp_path):
+    path = str(tmp_path / "sample.pdf")
+    shutil.copyfile(SAMPLE_PDF, path)
+    return path
+
+@pytest.fixture
+def xref_stream_pdf(tmp_path):
+    path = str(tmp_path / "xref_stream.pdf")
+    write_xref_stream_pdf(path)
+    return path
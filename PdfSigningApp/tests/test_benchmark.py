@@ -0,0 +1,40 @@
+##
+# @file test_benchmark.py
+# @brief Benchmark inputs and report.
+
+import json
+import os
+import benchmark
+import sign
+from conftest import SAMPLE_PDF
+
+def test_synthetic_pdf_is_padded_and_reproducible(tmp_path):
+    first, second = str(tmp_path / "a.pdf"), str(tmp_path / "b.pdf")
+    size = 512 * 1024
+
+    benchmark.make_synthetic_pdf(SAMPLE_PDF, first, 3, size, seed=1)
+    benchmark.make_synthetic_pdf(SAMPLE_PDF, second, 3, size, seed=1)
+
+    with open(first, "rb") as f, open(second, "rb") as g:
+        assert f.read() == g.read()
+    assert abs(os.path.getsize(first) - size) < benchmark.PADDING_WIDTH * 2
+
+    # The padding survives normalization
+    normalized = str(tmp_path / "normalized.pdf")
+    sign.normalize_pdf(first, normalized)
+    assert os.path.getsize(normalized) > size - benchmark.PADDING_WIDTH * 2
+
+def test_report(tmp_path):
+    output = str(tmp_path / "report.json")
+
+    assert benchmark.main(["--docs", "2", "--pages", "2", "--size-mb", "0.1", "--key-bits", "1024",
+                           "--kdf-profile", "low", "--output", output]) == 0
+
+    with open(output) as f:
+        stages = json.load(f)["stages"]
+    assert list(stages) == ["keygen", "normalize_pdf", "create_pdf_hash", "sign_hash_with_pkey",
+                            "add_signature_to_metadata", "verify_pdf"]
+    assert all(stage["count"] == 2 for name, stage in stages.items() if name != "keygen")
+    peaks = [stage["cumulative_peak_rss_mb"] for stage in stages.values()]
+    if benchmark.resource is not None:
+        assert peaks == sorted(peaks)
@@ -0,0 +1,167 @@
+##
+# @file test_cli.py
+# @brief Input expansion, password sources, JSON output and exit codes of the command-line interface.
+
+import io
+import json
+import os
+import shutil
+import pytest
+import cli
+import sign
+import utils
+from conftest import PASSWORD
+
+##
+# @brief Tree with PDFs at two levels, a signed file and a file that is not a PDF.
+@pytest.fixture
+def tree(tmp_path, sample_pdf):
+    (tmp_path / "sub").mkdir()
+    for name in ("a.pdf", "a_signed.pdf", "sub/b.pdf"):
+        shutil.copyfile(sample_pdf, tmp_path / name)
+    (tmp_path / "notes.txt").write_text("not a pdf")
+    os.remove(sample_pdf)
+    return tmp_path
+
+##
+# @brief Runs the command-line interface and parses its JSON lines.
+# @return Tuple `(exit_code, results)`.
+def run(capsys, *argv):
+    exit_code = cli.main(list(argv))
+    out = capsys.readouterr().out
+    return exit_code, [json.loads(line) for line in out.splitlines()]
+
+def test_expand_directory(tree):
+    assert cli.expand_inputs([str(tree)]) == [str(tree / "a.pdf"), str(tree / "a_signed.pdf")]
+    assert cli.expand_inputs([str(tree)], recursive=True, skip_signed=True) == [
+        str(tree / "a.pdf"), str(tree / "sub" / "b.pdf")]
+
+def test_expand_glob(tree):
+    assert cli.expand_inputs([str(tree / "**" / "*.pdf")]) == [
+        str(tree / "a.pdf"), str(tree / "a_signed.pdf"), str(tree / "sub" / "b.pdf")]
+    assert cli.expand_inputs([str(tree / "*_signed.pdf")], skip_signed=True) == [str(tree / "a_signed.pdf")]
+
+def test_expand_keeps_files_and_drops_duplicates(tree):
+    missing = str(tree / "missing.pdf")
+    assert cli.expand_inputs([missing, str(tree / "a.pdf"), str(tree)]) == [
+        missing, str(tree / "a.pdf"), str(tree / "a_signed.pdf")]
+
+##
+# @brief Parses keygen arguments with the given password source options.
+def password_args(password_env=None, password_stdin=False):
+    return cli.build_parser().parse_args(
+        ["keygen", "keys"] + (["--password-env", password_env] if password_env else [])
+        + (["--password-stdin"] if password_stdin else []))
+
+def test_password_from_environment(monkeypatch):
+    monkeypatch.setenv("TEST_PDF_KEY_PASSWORD", "from-env")
+    assert cli.read_password(password_args(password_env="TEST_PDF_KEY_PASSWORD")) == "from-env"
+
+    monkeypatch.delenv("TEST_PDF_KEY_PASSWORD")
+    with pytest.raises(ValueError):
+        cli.read_password(password_args(password_env="TEST_PDF_KEY_PASSWORD"))
+
+def test_password_from_stdin(monkeypatch):
+    monkeypatch.setattr("sys.stdin", io.StringIO("from stdin\r\nnext line\n"))
+    assert cli.read_password(password_args(password_stdin=True)) == "from stdin"
+
+def test_password_prompt(monkeypatch):
+    stdin = io.StringIO()
+    stdin.isatty = lambda: True
+    monkeypatch.setattr("sys.stdin", stdin)
+    monkeypatch.setattr(cli.getpass, "getpass", lambda prompt, stream: "typed")
+    assert cli.read_password(password_args()) == "typed"
+
+def test_no_password_source(monkeypatch, capsys):
+    monkeypatch.setattr("sys.stdin", io.StringIO())
+    with pytest.raises(ValueError):
+        cli.read_password(password_args())
+    assert cli.main(["keygen", "keys"]) == cli.EXIT_USAGE
+
+def test_sign_all_succeed(tree, key_files, monkeypatch, capsys):
+    monkeypatch.setenv("TEST_PDF_KEY_PASSWORD", PASSWORD)
+    exit_code, results = run(capsys, "sign", str(tree), "--recursive", "--key", key_files[0],
+                             "--password-env", "TEST_PDF_KEY_PASSWORD", "--format", utils.FORMAT_INCREMENTAL)
+
+    assert exit_code == cli.EXIT_OK
+    assert results == [
+        {"pdf_path": str(tree / "a.pdf"), "status": "signed", "output": str(tree / "a_signed.pdf")},
+        {"pdf_path": str(tree / "sub" / "b.pdf"), "status": "signed", "output": str(tree / "sub" / "b_signed.pdf")},
+    ]
+
+def test_sign_some_fail(tree, key_files, monkeypatch, capsys):
+    (tree / "broken.pdf").write_bytes(b"not a pdf")
+    monkeypatch.setattr("sys.stdin", io.StringIO(PASSWORD + "\n"))
+    exit_code, results = run(capsys, "sign", str(tree), "--key", key_files[0], "--password-stdin")
+
+    assert exit_code == cli.EXIT_FAILED
+    assert [(os.path.basename(r["pdf_path"]), r["status"]) for r in results] == [
+        ("a.pdf", "signed"), ("broken.pdf", "error")]
+    assert set(results[1]) == {"pdf_path", "status", "message"}
+
+def test_sign_all_fail(tmp_path, key_files, monkeypatch, capsys):
+    monkeypatch.setattr("sys.stdin", io.StringIO(PASSWORD + "\n"))
+    exit_code, results = run(capsys, "sign", str(tmp_path / "missing.pdf"), "--key", key_files[0],
+                             "--password-stdin")
+
+    assert exit_code == cli.EXIT_FAILED
+    assert [r["status"] for r in results] == ["error"]
+
+def test_sign_wrong_password(tree, key_files, monkeypatch, capsys):
+    monkeypatch.setattr("sys.stdin", io.StringIO("wrong\n"))
+    exit_code = cli.main(["sign", str(tree), "--key", key_files[0], "--password-stdin"])
+
+    captured = capsys.readouterr()
+    assert exit_code == cli.EXIT_USAGE
+    assert captured.out == ""
+    assert "Wrong private key password" in captured.err
+
+def test_sign_unlocks_key_once(tree, key_files, monkeypatch, capsys):
+    calls = []
+    sign_pdfs = sign.sign_pdfs
+    monkeypatch.setattr(sign, "sign_pdfs", lambda *args, **kwargs: calls.append(args) or sign_pdfs(*args, **kwargs))
+    monkeypatch.setattr("sys.stdin", io.StringIO(PASSWORD + "\n"))
+    run(capsys, "sign", str(tree), "--recursive", "--key", key_files[0], "--password-stdin")
+
+    assert len(calls) == 1
+
+def test_verify_exit_codes(tree, key_files, capsys):
+    assert sign.sign_pdf(str(tree / "a.pdf"), key_files[0], PASSWORD)
+    signed = str(tree / "a_signed.pdf")
+    unsigned = str(tree / "sub" / "b.pdf")
+
+    exit_code, results = run(capsys, "verify", signed, "--public-key", key_files[1], "--workers", "1")
+    assert exit_code == cli.EXIT_OK
+    assert results == [{"pdf_path": signed, "status": "valid", "message": results[0]["message"]}]
+
+    exit_code, results = run(capsys, "verify", signed, unsigned, "--public-key", key_files[1], "--workers", "1")
+    assert exit_code == cli.EXIT_FAILED
+    assert [r["status"] for r in results] == ["valid", "unsigned"]
+
+    exit_code, results = run(capsys, "verify", unsigned, "--public-key", key_files[1], "--workers", "1")
+    assert exit_code == cli.EXIT_FAILED
+    assert [r["status"] for r in results] == ["unsigned"]
+
+def test_keygen(tmp_path, key, monkeypatch, capsys):
+    # A 4096-bit key takes seconds, the session key is used instead
+    monkeypatch.setattr(utils.RSA, "generate", lambda bits: key)
+    monkeypatch.setattr("sys.stdin", io.StringIO(PASSWORD + "\n"))
+    exit_code, results = run(capsys, "keygen", str(tmp_path), "--password-stdin", "--kdf-profile", "low")
+
+    assert exit_code == cli.EXIT_OK
+    assert results == [{
+        "private_key": str(tmp_path / "private_key.pem"),
+        "public_key": str(tmp_path / "public_key.pem"),
+        "kdf_profile": "low",
+        "status": "generated",
+    }]
+    assert utils.load_private_key(results[0]["private_key"], PASSWORD).n == key.n
+
+def test_keygen_fails(tmp_path, key, monkeypatch, capsys):
+    monkeypatch.setattr(utils.RSA, "generate", lambda bits: key)
+    monkeypatch.setattr("sys.stdin", io.StringIO(PASSWORD + "\n"))
+    exit_code, results = run(capsys, "keygen", str(tmp_path / "missing"), "--password-stdin",
+                             "--kdf-profile", "low")
+
+    assert exit_code == cli.EXIT_FAILED
+    assert [r["status"] for r in results] == ["error"]
@@ -0,0 +1,116 @@
+##
+# @file test_http_service.py
+# @brief Local HTTP service: access token, signing and verification endpoints.
+
+import asyncio
+import http.client
+import json
+import os
+import socket
+import threading
+import time
+import pytest
+import http_service
+from conftest import SAMPLE_PDF
+
+TOKEN = "test-token"
+
+@pytest.fixture(scope="module")
+def service(key, key_files):
+    return http_service.SigningHttpService(key, [key_files[1]], max_workers=1, token=TOKEN)
+
+@pytest.fixture(scope="module")
+def server(service):
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_until_complete, args=(service.serve("127.0.0.1", 0),))
+    thread.start()
+    deadline = time.monotonic() + 10
+    while service.server is None or not service.server.sockets:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+    yield service.server.sockets[0].getsockname()[1]
+
+    loop.call_soon_threadsafe(service.server.close)
+    thread.join(10)
+    loop.close()
+
+def _request(port, method, path, body=None, token=TOKEN):
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    headers = {"Authorization": f"Bearer {token}"} if token else {}
+    connection.request(method, path, body=body, headers=headers)
+    response = connection.getresponse()
+    data = response.read()
+    connection.close()
+    return response.status, response.getheader("Content-Type"), data
+
+def _sample():
+    with open(SAMPLE_PDF, "rb") as f:
+        return f.read()
+
+def test_health_needs_no_token(server):
+    status, _, data = _request(server, "GET", "/health", token=None)
+
+    assert status == 200
+    assert json.loads(data)["sign"] is True
+
+@pytest.mark.parametrize("token", [None, "wrong-token"])
+@pytest.mark.parametrize("path", ["/sign", "/verify"])
+def test_token_required(server, path, token):
+    status, _, data = _request(server, "POST", path, _sample(), token=token)
+
+    assert status == 401
+    assert "token" in json.loads(data)["error"]
+
+def test_sign_then_verify(server):
+    status, content_type, signed = _request(server, "POST", "/sign?format=incremental", _sample())
+    assert status == 200
+    assert content_type == "application/pdf"
+
+    status, _, data = _request(server, "POST", "/verify", signed)
+    assert status == 200
+    assert json.loads(data)["status"] == "valid"
+
+def test_sign_detached_returns_sidecar(server):
+    status, content_type, data = _request(server, "POST", "/sign?format=detached", _sample())
+
+    assert status == 200
+    assert content_type.startswith("application/json")
+    assert json.loads(data)["size"] == len(_sample())
+
+def test_unknown_format(server):
+    status, _, _ = _request(server, "POST", "/sign?format=pkcs7", _sample())
+
+    assert status == 400
+
+##
+# @brief Sends raw request bytes and reads the whole response until the server closes the connection.
+def _raw_request(port, data):
+    with socket.create_connection(("127.0.0.1", port), timeout=10) as connection:
+        connection.sendall(data)
+        response = b""
+        while True:
+            chunk = connection.recv(65536)
+            if not chunk:
+                return response
+            response += chunk
+
+@pytest.mark.parametrize("request_line, status", [
+    (b"POST /health HTTP/1.1", b"405"),
+    (b"POST /made-up HTTP/1.1", b"404"),
+    (b"POST /sign HTTP/1.1", b"401"),
+])
+def test_unauthenticated_body_is_never_read(service, server, request_line, status):
+    # The announced body is never sent: reading it would block until the timeout
+    response = _raw_request(server, request_line + b"\r\nHost: localhost\r\nContent-Length: 100000000\r\n\r\n")
+
+    assert response.split(b" ")[1] == status
+    assert os.listdir(service.work_dir) == []
+
+def test_get_with_body_is_rejected(server):
+    response = _raw_request(server, b"GET /health HTTP/1.1\r\nHost: localhost\r\nContent-Length: 28\r\n\r\n"
+                                    b"GET /health HTTP/1.1\r\n\r\n")
+
+    # One error response, then the connection is closed instead of reading the body as a request
+    assert response.startswith(b"HTTP/1.1 400 ")
+    assert response.count(b"HTTP/1.1") == 1
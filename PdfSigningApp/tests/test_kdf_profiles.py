@@ -0,0 +1,38 @@
+##
+# @file test_kdf_profiles.py
+# @brief Key protection profiles: shared table, detection and calibration.
+
+import importlib.util
+import os
+import pytest
+import utils
+from conftest import PASSWORD, REPO_DIR
+
+##
+# @brief Imports KeyGenerationApp/utils.py under another name (both apps use flat module names).
+def _key_generation_utils():
+    spec = importlib.util.spec_from_file_location("key_generation_utils",
+                                                  os.path.join(REPO_DIR, "KeyGenerationApp", "utils.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def test_profiles_match_key_generation_app():
+    key_generation_utils = _key_generation_utils()
+
+    assert list(key_generation_utils.KDF_PROFILES.items()) == list(utils.KDF_PROFILES.items())
+    assert key_generation_utils.DEFAULT_KDF_PROFILE == utils.DEFAULT_KDF_PROFILE
+
+@pytest.mark.parametrize("profile", ["compat", "low"])
+def test_detect_profile(key, profile):
+    pem = utils.encrypt_private_key(key, PASSWORD, profile)
+
+    assert utils.detect_kdf_profile(pem)["profile"] == profile
+
+def test_calibration_orders_by_declared_strength(monkeypatch):
+    # PBKDF2 "compat" is the slowest here, yet weaker than the scrypt profiles
+    timings = {"compat": 0.09, "low": 0.01, "default": 0.05, "high": 0.2, "max": 0.8}
+    monkeypatch.setattr(utils, "measure_kdf_profile", lambda name, rounds: timings[name])
+
+    assert utils.calibrate_kdf_profile(0.1) == ("default", timings)
+    assert utils.calibrate_kdf_profile(0.001) == ("low", timings)
@@ -0,0 +1,130 @@
+##
+# @file test_key_cache.py
+# @brief Reuse, eviction and invalidation of parsed public keys.
+
+import os
+from Cryptodome.PublicKey import RSA
+import pytest
+import key_cache
+import utils
+
+@pytest.fixture(scope="module")
+def public_keys():
+    return [RSA.generate(1024).publickey() for _ in range(3)]
+
+##
+# @brief Writes the public keys to `key0.pem`, `key1.pem`, ...
+# @return List of paths.
+@pytest.fixture
+def key_paths(tmp_path, public_keys):
+    paths = []
+    for number, public_key in enumerate(public_keys):
+        path = str(tmp_path / f"key{number}.pem")
+        with open(path, "wb") as f:
+            f.write(public_key.export_key())
+        paths.append(path)
+    return paths
+
+##
+# @brief Counts how often a key file is parsed.
+@pytest.fixture
+def imports(monkeypatch):
+    calls = []
+    import_key = RSA.import_key
+
+    def counting(data):
+        calls.append(data)
+        return import_key(data)
+
+    monkeypatch.setattr(key_cache.RSA, "import_key", counting)
+    return calls
+
+def test_key_parsed_once(key_paths, imports):
+    cache = key_cache.PublicKeyCache()
+    verifier = cache.get_verifier(key_paths[0])
+
+    assert cache.get_verifier(key_paths[0]) is verifier
+    assert len(imports) == 1
+
+def test_same_key_under_other_path_is_reused(tmp_path, key_paths, imports):
+    copy = str(tmp_path / "copy.pem")
+    with open(key_paths[0], "rb") as src, open(copy, "wb") as dst:
+        dst.write(src.read())
+    cache = key_cache.PublicKeyCache()
+
+    assert cache.get_verifier(copy) is cache.get_verifier(key_paths[0])
+    assert len(imports) == 1
+
+def test_eviction_at_max_keys(key_paths, imports):
+    cache = key_cache.PublicKeyCache(max_keys=2)
+    cache.get_verifier(key_paths[0])
+    cache.get_verifier(key_paths[1])
+    # Key 0 becomes the most recently used, key 1 is evicted by key 2
+    cache.get_verifier(key_paths[0])
+    cache.get_verifier(key_paths[2])
+    assert len(imports) == 3
+
+    cache.get_verifier(key_paths[0])
+    cache.get_verifier(key_paths[2])
+    assert len(imports) == 3
+    cache.get_verifier(key_paths[1])
+    assert len(imports) == 4
+    assert len(cache._verifiers) == 2
+    assert len(cache._paths) == 2
+
+def test_reload_after_rewrite(key_paths, public_keys, imports):
+    cache = key_cache.PublicKeyCache()
+    fingerprint = cache.get_key_fingerprint(key_paths[0])
+    assert fingerprint == utils.public_key_fingerprint(public_keys[0])
+
+    with open(key_paths[0], "wb") as f:
+        f.write(public_keys[1].export_key())
+    # Make sure the change is visible on file systems with coarse timestamps
+    stat = os.stat(key_paths[0])
+    os.utime(key_paths[0], ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    assert cache.get_key_fingerprint(key_paths[0]) == utils.public_key_fingerprint(public_keys[1])
+    assert len(imports) == 2
+
+def test_invalidate_path(key_paths, imports):
+    cache = key_cache.PublicKeyCache()
+    cache.get_verifier(key_paths[0])
+    cache.get_verifier(key_paths[1])
+
+    cache.invalidate(key_paths[0])
+    assert list(cache._paths) == [os.path.abspath(key_paths[1])]
+    assert list(cache._verifiers) == [cache.get_fingerprint(key_paths[1])]
+
+    cache.get_verifier(key_paths[0])
+    assert len(imports) == 3
+
+def test_invalidate_keeps_key_used_by_other_path(tmp_path, key_paths):
+    copy = str(tmp_path / "copy.pem")
+    with open(key_paths[0], "rb") as src, open(copy, "wb") as dst:
+        dst.write(src.read())
+    cache = key_cache.PublicKeyCache()
+    verifier = cache.get_verifier(key_paths[0])
+    cache.get_verifier(copy)
+
+    cache.invalidate(key_paths[0])
+    assert cache.get_verifier(copy) is verifier
+
+def test_invalidate_all(key_paths, imports):
+    cache = key_cache.PublicKeyCache()
+    for path in key_paths:
+        cache.get_verifier(path)
+
+    cache.invalidate()
+    assert not cache._paths
+    assert not cache._verifiers
+
+    cache.get_verifier(key_paths[0])
+    assert len(imports) == 4
+
+def test_invalid_key_file(tmp_path):
+    path = str(tmp_path / "broken.pem")
+    with open(path, "wb") as f:
+        f.write(b"not a key")
+
+    with pytest.raises(ValueError):
+        key_cache.PublicKeyCache().get_verifier(path)
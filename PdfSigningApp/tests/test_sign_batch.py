@@ -0,0 +1,73 @@
+##
+# @file test_sign_batch.py
+# @brief Batch signing with one unlock of the private key.
+
+import os
+import shutil
+import pytest
+import sign
+import utils
+import verify
+from conftest import PASSWORD
+
+##
+# @brief Directory with two sample PDFs, a broken PDF and an already signed file.
+@pytest.fixture
+def batch_dir(tmp_path, sample_pdf):
+    directory = tmp_path / "batch"
+    directory.mkdir()
+    for name in ("a.pdf", "c.pdf", "old_signed.pdf"):
+        shutil.copyfile(sample_pdf, directory / name)
+    (directory / "b.pdf").write_bytes(b"not a pdf")
+    return str(directory)
+
+##
+# @brief Counts calls of `utils.load_private_key`.
+@pytest.fixture
+def unlocks(monkeypatch):
+    calls = []
+    load_private_key = utils.load_private_key
+
+    def counting(path, pwd):
+        calls.append(path)
+        return load_private_key(path, pwd)
+
+    monkeypatch.setattr(utils, "load_private_key", counting)
+    return calls
+
+def test_key_unlocked_once_per_batch(batch_dir, key_files, unlocks):
+    results = sign.sign_pdfs(batch_dir, key_files[0], PASSWORD)
+
+    assert unlocks == [key_files[0]]
+    assert sorted(os.path.basename(p) for p in results) == ["a.pdf", "b.pdf", "c.pdf"]
+
+def test_bad_file_does_not_stop_batch(batch_dir, key_files, capsys):
+    results = sign.sign_pdfs(batch_dir, key_files[0], PASSWORD)
+
+    assert results[os.path.join(batch_dir, "b.pdf")] is None
+    assert "Could not sign" in capsys.readouterr().out
+    for name in ("a.pdf", "c.pdf"):
+        output = results[os.path.join(batch_dir, name)]
+        assert verify.check_pdf_signature(output, key_files[1]).is_valid()
+
+def test_on_result_replaces_printing(batch_dir, key_files, capsys):
+    reported = []
+    results = sign.sign_pdfs(batch_dir, key_files[0], PASSWORD,
+                             on_result=lambda *args: reported.append(args))
+
+    assert capsys.readouterr().out == ""
+    assert [path for path, _, _ in reported] == list(results)
+    for path, output, error in reported:
+        if os.path.basename(path) == "b.pdf":
+            assert output is None and isinstance(error, Exception)
+        else:
+            assert output == results[path] and error is None
+
+def test_file_list_is_signed_as_given(sample_pdf, key_files):
+    results = sign.sign_pdfs([sample_pdf], key_files[0], PASSWORD, signature_format=utils.FORMAT_INCREMENTAL)
+
+    assert verify.check_pdf_signature(results[sample_pdf], key_files[1]).is_valid()
+
+def test_wrong_password_signs_nothing(batch_dir, key_files):
+    assert sign.sign_pdfs(batch_dir, key_files[0], "wrong") is None
+    assert sorted(os.listdir(batch_dir)) == ["a.pdf", "b.pdf", "c.pdf", "old_signed.pdf"]
@@ -0,0 +1,92 @@
+##
+# @file test_sign_detached.py
+# @brief Round trips and tamper detection of detached (sidecar) signatures.
+
+import json
+import os
+import pytest
+import sign
+import utils
+import verify
+
+def _read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+def test_round_trip_leaves_pdf_untouched(sample_pdf, key, key_files):
+    original = _read(sample_pdf)
+    sidecar_file = sign.sign_pdf_with_key(sample_pdf, key, utils.FORMAT_DETACHED)
+
+    assert sidecar_file == sample_pdf + utils.SIDECAR_SUFFIX
+    assert _read(sample_pdf) == original
+    with open(sidecar_file, encoding="utf-8") as f:
+        sidecar = json.load(f)
+    assert sidecar["size"] == len(original)
+    assert sidecar["hash_algorithm"] == utils.DETACHED_HASH_ALGORITHM
+    assert sidecar["key_fingerprint"] == utils.public_key_fingerprint(key)
+
+def test_verify_through_sidecar_or_pdf(sample_pdf, key, key_files):
+    sidecar_file = sign.sign_pdf_with_key(sample_pdf, key, utils.FORMAT_DETACHED)
+
+    assert verify.check_pdf_signature(sidecar_file, key_files[1]).status == verify.VALID
+    assert verify.check_pdf_signature(sample_pdf, key_files[1]).status == verify.VALID
+    assert verify.verify_pdf(sidecar_file, key_files[1])
+
+def test_modified_pdf_is_invalid(sample_pdf, key, key_files):
+    sign.sign_pdf_with_key(sample_pdf, key, utils.FORMAT_DETACHED)
+    data = bytearray(_read(sample_pdf))
+    data[1000] ^= 0x01
+    with open(sample_pdf, "wb") as f:
+        f.write(data)
+
+    assert verify.check_pdf_signature(sample_pdf, key_files[1]).status == verify.INVALID
+
+def test_modified_digest_is_invalid(sample_pdf, key, key_files):
+    # A forged digest matching a modified file must still fail the RSA check
+    sidecar_file = sign.sign_pdf_with_key(sample_pdf, key, utils.FORMAT_DETACHED)
+    with open(sample_pdf, "ab") as f:
+        f.write(b"%")
+    with open(sidecar_file, encoding="utf-8") as f:
+        sidecar = json.load(f)
+    sidecar["size"] = os.path.getsize(sample_pdf)
+    sidecar["digest"] = utils.create_pdf_hash(sample_pdf).hexdigest()
+    with open(sidecar_file, "w", encoding="utf-8") as f:
+        json.dump(sidecar, f)
+
+    assert verify.check_pdf_signature(sidecar_file, key_files[1]).status == verify.INVALID
+
+def test_other_key_is_reported(sample_pdf, key, other_public_key_path, capsys):
+    sidecar_file = sign.sign_pdf_with_key(sample_pdf, key, utils.FORMAT_DETACHED)
+
+    result = verify.check_pdf_signature(sidecar_file, other_public_key_path)
+    assert result.status == verify.INVALID
+    assert result.message == "Signed with a different key!"
+    assert not verify.verify_pdf(sidecar_file, other_public_key_path)
+    assert "Signed with a different key!" in capsys.readouterr().out
+
+def test_unsupported_hash_algorithm(sample_pdf, key, key_files):
+    sidecar_file = sign.sign_pdf_with_key(sample_pdf, key, utils.FORMAT_DETACHED)
+    with open(sidecar_file, encoding="utf-8") as f:
+        sidecar = json.load(f)
+    sidecar["hash_algorithm"] = "MD5"
+    with open(sidecar_file, "w", encoding="utf-8") as f:
+        json.dump(sidecar, f)
+
+    assert verify.check_pdf_signature(sidecar_file, key_files[1]).status == verify.ERROR
+
+def test_cache_is_bypassed(sample_pdf, key, key_files, tmp_path):
+    cache_path = str(tmp_path / "cache.sqlite")
+    sign.sign_pdf_with_key(sample_pdf, key, utils.FORMAT_DETACHED)
+    assert verify.check_pdf_signature_cached(sample_pdf, key_files[1], cache_path).status == verify.VALID
+
+    os.remove(utils.sidecar_path(sample_pdf))
+    assert verify.check_pdf_signature_cached(sample_pdf, key_files[1], cache_path).status == verify.UNSIGNED
+
+def test_not_a_pdf(tmp_path, key):
+    path = str(tmp_path / "junk.pdf")
+    with open(path, "wb") as f:
+        f.write(b"not a pdf at all")
+
+    with pytest.raises(ValueError):
+        sign.sign_pdf_with_key(path, key, utils.FORMAT_DETACHED)
+    assert not os.path.exists(utils.sidecar_path(path))
@@ -0,0 +1,96 @@
+##
+# @file test_sign_incremental.py
+# @brief Round trips and tamper detection of the incremental-update signature format.
+
+import os
+import threading
+from PyPDF2 import PdfReader, PdfWriter
+import pytest
+import sign
+import utils
+import verify
+
+def _read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+def _write(path, data):
+    with open(path, "wb") as f:
+        f.write(data)
+
+def test_round_trip_keeps_original_bytes(sample_pdf, key, key_files):
+    signed_path = sign.sign_pdf_with_key(sample_pdf, key, utils.FORMAT_INCREMENTAL)
+
+    assert _read(signed_path).startswith(_read(sample_pdf))
+    assert verify.check_pdf_signature(signed_path, key_files[1]).status == verify.VALID
+    assert len(PdfReader(signed_path).pages) == len(PdfReader(sample_pdf).pages)
+
+def test_xref_stream_round_trip(xref_stream_pdf, key, key_files):
+    signed_path = sign.sign_pdf_with_key(xref_stream_pdf, key, utils.FORMAT_INCREMENTAL)
+
+    reader = PdfReader(signed_path, strict=True)
+    assert reader.metadata["/Producer"] == "xref stream fixture"
+    assert len(reader.pages) == 1
+    assert verify.check_pdf_signature(signed_path, key_files[1]).status == verify.VALID
+
+def test_xref_stream_edit_is_invalid(xref_stream_pdf, key, key_files):
+    signed_path = sign.sign_pdf_with_key(xref_stream_pdf, key, utils.FORMAT_INCREMENTAL)
+    data = _read(signed_path)
+    _write(signed_path, data.replace(b"(xref) Tj", b"(XREF) Tj"))
+
+    assert verify.check_pdf_signature(signed_path, key_files[1]).status == verify.INVALID
+
+def test_edit_inside_signed_range_is_invalid(sample_pdf, key, key_files):
+    signed_path = sign.sign_pdf_with_key(sample_pdf, key, utils.FORMAT_INCREMENTAL)
+    data = _read(signed_path)
+    _write(signed_path, data.replace(b"(Brochure)", b"(Brochurf)"))
+
+    assert verify.check_pdf_signature(signed_path, key_files[1]).status == verify.INVALID
+
+def test_appended_data_is_invalid(sample_pdf, key, key_files):
+    signed_path = sign.sign_pdf_with_key(sample_pdf, key, utils.FORMAT_INCREMENTAL)
+    with open(signed_path, "ab") as f:
+        f.write(b"% appended after signing\n")
+
+    result = verify.check_pdf_signature(signed_path, key_files[1])
+    assert result.status == verify.INVALID
+    assert "cover" in result.message
+
+def test_other_key_is_invalid(sample_pdf, key, other_public_key_path):
+    signed_path = sign.sign_pdf_with_key(sample_pdf, key, utils.FORMAT_INCREMENTAL)
+
+    assert verify.check_pdf_signature(signed_path, other_public_key_path).status == verify.INVALID
+
+def test_stages_skip_normalize(sample_pdf, key):
+    stages = []
+    sign.sign_pdf_with_key(sample_pdf, key, utils.FORMAT_INCREMENTAL, progress=stages.append)
+
+    assert stages == [sign.STAGE_HASH, sign.STAGE_SIGN, sign.STAGE_WRITE]
+
+def test_cancel_leaves_no_output(sample_pdf, key):
+    cancel_event = threading.Event()
+
+    def progress(stage):
+        if stage == sign.STAGE_SIGN:
+            cancel_event.set()
+
+    with pytest.raises(sign.SigningCancelled):
+        sign.sign_pdf_with_key(sample_pdf, key, utils.FORMAT_INCREMENTAL,
+                               progress=progress, cancel_event=cancel_event)
+    assert os.listdir(os.path.dirname(sample_pdf)) == ["sample.pdf"]
+
+def test_encrypted_pdf_is_refused(sample_pdf, key, key_files):
+    writer = PdfWriter()
+    for page in PdfReader(sample_pdf).pages:
+        writer.add_page(page)
+    writer.encrypt("user", "owner")
+    with open(sample_pdf, "wb") as f:
+        writer.write(f)
+
+    with pytest.raises(ValueError, match="Encrypted"):
+        sign.sign_pdf_with_key(sample_pdf, key, utils.FORMAT_INCREMENTAL)
+    assert os.listdir(os.path.dirname(sample_pdf)) == ["sample.pdf"]
+
+    # The suggested detached format keeps working
+    signed_path = sign.sign_pdf_with_key(sample_pdf, key, utils.FORMAT_DETACHED)
+    assert verify.check_pdf_signature(signed_path, key_files[1]).status == verify.VALID
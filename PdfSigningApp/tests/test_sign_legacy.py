@@ -0,0 +1,145 @@
+##
+# @file test_sign_legacy.py
+# @brief Round trips of the legacy signature format, including files of the original implementation.
+
+import os
+from Cryptodome.Hash import SHA256
+from Cryptodome.Signature import pkcs1_15
+from PyPDF2 import PdfReader, PdfWriter
+import pytest
+import sign
+import utils
+import verify
+from conftest import PASSWORD
+
+##
+# @brief Signs a PDF the way the first release did (normalized copy, hash, signed copy).
+def baseline_sign(pdf_path, key):
+    reader = PdfReader(pdf_path)
+    writer = PdfWriter()
+    writer.add_metadata(reader.metadata)
+    for page in reader.pages:
+        writer.add_page(page)
+    normalized_path = pdf_path + ".normalized.pdf"
+    with open(normalized_path, "wb") as f:
+        writer.write(f)
+    with open(normalized_path, "rb") as f:
+        signature = pkcs1_15.new(key).sign(SHA256.new(f.read())).hex()
+
+    reader = PdfReader(normalized_path)
+    metadata = reader.metadata
+    writer = PdfWriter()
+    for page in reader.pages:
+        writer.add_page(page)
+    metadata.update({"/Signature": signature})
+    writer.add_metadata(metadata)
+    signed_path = pdf_path + ".baseline_signed.pdf"
+    with open(signed_path, "wb") as f:
+        writer.write(f)
+    os.remove(normalized_path)
+    return signed_path
+
+##
+# @brief Verifies a PDF the way the first release did.
+def baseline_verify(pdf_path, key):
+    reader = PdfReader(pdf_path)
+    metadata = reader.metadata
+    signature_bytes = bytes.fromhex(metadata.pop("/Signature"))
+    writer = PdfWriter()
+    for page in reader.pages:
+        writer.add_page(page)
+    writer.add_metadata(metadata)
+    temp_path = pdf_path + ".temp.pdf"
+    with open(temp_path, "wb") as f:
+        writer.write(f)
+    with open(temp_path, "rb") as f:
+        new_hash = SHA256.new(f.read())
+    os.remove(temp_path)
+    try:
+        pkcs1_15.new(key.publickey()).verify(new_hash, signature_bytes)
+        return True
+    except ValueError:
+        return False
+
+def test_legacy_round_trip(sample_pdf, key, key_files):
+    signed_path = sign.sign_pdf_with_key(sample_pdf, key, utils.FORMAT_LEGACY)
+
+    assert signed_path == sample_pdf[:-4] + "_signed.pdf"
+    assert verify.check_pdf_signature(signed_path, key_files[1]).status == verify.VALID
+
+def test_sign_pdf_unlocks_key_file(sample_pdf, key_files):
+    assert sign.sign_pdf(sample_pdf, key_files[0], PASSWORD)
+    assert verify.check_pdf_signature(sample_pdf[:-4] + "_signed.pdf", key_files[1]).is_valid()
+
+def test_sign_pdf_wrong_password(sample_pdf, key_files):
+    assert not sign.sign_pdf(sample_pdf, key_files[0], "wrong")
+    assert not os.path.exists(sample_pdf[:-4] + "_signed.pdf")
+
+def test_no_intermediate_files(sample_pdf, key):
+    sign.sign_pdf_with_key(sample_pdf, key, utils.FORMAT_LEGACY)
+
+    assert sorted(os.listdir(os.path.dirname(sample_pdf))) == ["sample.pdf", "sample_signed.pdf"]
+
+def test_output_verifies_with_baseline(sample_pdf, key):
+    signed_path = sign.sign_pdf_with_key(sample_pdf, key, utils.FORMAT_LEGACY)
+
+    assert baseline_verify(signed_path, key)
+
+def test_baseline_output_verifies(sample_pdf, key, key_files):
+    signed_path = baseline_sign(sample_pdf, key)
+
+    assert verify.check_pdf_signature(signed_path, key_files[1]).status == verify.VALID
+
+def test_same_bytes_as_baseline(sample_pdf, key):
+    # PKCS#1 v1.5 signatures are deterministic, so both implementations write the same file
+    with open(sign.sign_pdf_with_key(sample_pdf, key, utils.FORMAT_LEGACY), "rb") as f:
+        signed = f.read()
+    with open(baseline_sign(sample_pdf, key), "rb") as f:
+        assert f.read() == signed
+
+def test_modified_metadata_is_invalid(sample_pdf, key, key_files):
+    signed_path = sign.sign_pdf_with_key(sample_pdf, key, utils.FORMAT_LEGACY)
+
+    reader = PdfReader(signed_path)
+    writer = PdfWriter()
+    for page in reader.pages:
+        writer.add_page(page)
+    metadata = reader.metadata
+    metadata.update({"/Title": "Changed"})
+    writer.add_metadata(metadata)
+    with open(signed_path, "wb") as f:
+        writer.write(f)
+
+    assert verify.check_pdf_signature(signed_path, key_files[1]).status == verify.INVALID
+
+def test_other_key_is_invalid(sample_pdf, key, other_public_key_path):
+    signed_path = sign.sign_pdf_with_key(sample_pdf, key, utils.FORMAT_LEGACY)
+
+    assert verify.check_pdf_signature(signed_path, other_public_key_path).status == verify.INVALID
+
+def test_unknown_format(sample_pdf, key):
+    with pytest.raises(ValueError):
+        sign.sign_pdf_with_key(sample_pdf, key, "pkcs7")
+
+def test_low_memory_output_is_identical(sample_pdf, key, key_files):
+    with open(sign.sign_pdf_legacy(sample_pdf, key, low_memory=False), "rb") as f:
+        default = f.read()
+    signed_path = sign.sign_pdf_legacy(sample_pdf, key, low_memory=True)
+    with open(signed_path, "rb") as f:
+        assert f.read() == default
+    assert verify.check_pdf_signature(signed_path, key_files[1]).status == verify.VALID
+
+def test_low_memory_chosen_by_size(sample_pdf, key, monkeypatch):
+    sinks = []
+    hashing_sink = utils.HashingSink
+
+    def recording_sink(*args):
+        sinks.append(hashing_sink(*args))
+        return sinks[-1]
+
+    monkeypatch.setattr(sign, "LOW_MEMORY_THRESHOLD", os.path.getsize(sample_pdf))
+    monkeypatch.setattr(utils, "HashingSink", recording_sink)
+    sign.sign_pdf_legacy(sample_pdf, key)
+
+    # Only the low-memory mode serializes the document into a hashing sink
+    assert len(sinks) == 1
@@ -0,0 +1,92 @@
+##
+# @file test_stream_hash.py
+# @brief Every source type of `utils.update_stream_hash` hashes like `hashlib.sha256` of the data.
+
+import array
+import hashlib
+import io
+import mmap
+import pytest
+import utils
+
+##
+# @brief File-like object without `readinto()`, read through `read()` only.
+class ReadOnlyStream:
+    def __init__(self, data):
+        self._stream = io.BytesIO(data)
+
+    def read(self, size=-1):
+        return self._stream.read(size)
+
+##
+# @brief Writes the data to a file and returns its path.
+def write_file(tmp_path, data):
+    path = tmp_path / "data.bin"
+    path.write_bytes(data)
+    return str(path)
+
+SOURCES = {
+    "bytes": lambda tmp_path, data: data,
+    "bytearray": lambda tmp_path, data: bytearray(data),
+    "memoryview": lambda tmp_path, data: memoryview(data),
+    "readinto": lambda tmp_path, data: io.BytesIO(data),
+    "read": lambda tmp_path, data: ReadOnlyStream(data),
+    "path": write_file,
+}
+
+DATA = {
+    "empty": b"",
+    "one-chunk": b"%PDF-1.7\n",
+    "many-chunks": bytes(range(256)) * 41 + b"tail",
+}
+
+@pytest.mark.parametrize("chunk_size", [utils.HASH_CHUNK_SIZE, 7])
+@pytest.mark.parametrize("data", DATA.values(), ids=DATA.keys())
+@pytest.mark.parametrize("source", SOURCES.values(), ids=SOURCES.keys())
+def test_matches_hashlib(tmp_path, source, data, chunk_size):
+    h = utils.update_stream_hash(hashlib.sha256(), source(tmp_path, data), chunk_size)
+    assert h.hexdigest() == hashlib.sha256(data).hexdigest()
+
+def test_memoryview_of_wider_items():
+    data = array.array("I", range(1000))
+    h = utils.update_stream_hash(hashlib.sha256(), memoryview(data), chunk_size=7)
+    assert h.hexdigest() == hashlib.sha256(data.tobytes()).hexdigest()
+
+def test_stream_hashed_from_current_position():
+    stream = io.BytesIO(b"header|body")
+    stream.seek(7)
+    assert utils.update_stream_hash(hashlib.sha256(), stream).digest() == hashlib.sha256(b"body").digest()
+
+##
+# @brief Lowers `MMAP_THRESHOLD` and records the files mapped by `update_stream_hash`.
+@pytest.fixture
+def mapped(monkeypatch):
+    calls = []
+    real_mmap = mmap.mmap
+
+    def recording(fileno, length, **kwargs):
+        calls.append(fileno)
+        return real_mmap(fileno, length, **kwargs)
+
+    monkeypatch.setattr(utils, "MMAP_THRESHOLD", 1024)
+    monkeypatch.setattr(utils.mmap, "mmap", recording)
+    return calls
+
+@pytest.mark.parametrize("chunk_size", [utils.HASH_CHUNK_SIZE, 1000])
+def test_large_file_is_memory_mapped(tmp_path, mapped, chunk_size):
+    data = bytes(range(256)) * 20
+    path = write_file(tmp_path, data)
+
+    h = utils.update_stream_hash(hashlib.sha256(), path, chunk_size)
+    assert h.hexdigest() == hashlib.sha256(data).hexdigest()
+    assert len(mapped) == 1
+
+def test_small_file_and_disabled_mmap_are_read(tmp_path, mapped):
+    small = b"x" * 1023
+    assert utils.update_stream_hash(hashlib.sha256(), write_file(tmp_path, small)).digest() \
+        == hashlib.sha256(small).digest()
+
+    large = b"x" * 4096
+    h = utils.update_stream_hash(hashlib.sha256(), write_file(tmp_path, large), use_mmap=False)
+    assert h.digest() == hashlib.sha256(large).digest()
+    assert mapped == []
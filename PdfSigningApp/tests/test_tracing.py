@@ -0,0 +1,40 @@
+##
+# @file test_tracing.py
+# @brief Pipeline spans of signing and verification.
+
+import os
+import pytest
+import sign
+import tracing
+import verify
+from conftest import PASSWORD
+
+def test_sign_and_verify_spans(sample_pdf, key_files):
+    private_key_path, public_key_path = key_files
+    spans = []
+
+    with tracing.tracer(spans.append):
+        assert sign.sign_pdf(sample_pdf, private_key_path, PASSWORD)
+        signed_path = os.path.splitext(sample_pdf)[0] + "_signed.pdf"
+        assert verify.check_pdf_signature(signed_path, public_key_path).status == verify.VALID
+
+    names = [span.name for span in spans]
+    assert names[:5] == [tracing.SPAN_KEY_LOAD, tracing.SPAN_PARSE, tracing.SPAN_NORMALIZE_WRITE,
+                         tracing.SPAN_HASH, tracing.SPAN_RSA]
+    # Key loads are identified by the key file, every other stage by the document
+    assert [span.file_id for span in spans if span.name == tracing.SPAN_KEY_LOAD] == \
+        [private_key_path, public_key_path]
+    assert {span.file_id for span in spans if span.name != tracing.SPAN_KEY_LOAD} == {sample_pdf, signed_path}
+    assert spans[1].bytes == os.path.getsize(sample_pdf)
+    assert not any(span.failed for span in spans)
+
+@pytest.mark.parametrize("low_memory", [False, True])
+def test_no_size_lookup_without_tracer(sample_pdf, key, monkeypatch, low_memory):
+    def fail(path):
+        raise AssertionError("file size only needed for tracing")
+
+    monkeypatch.setattr(os.path, "getsize", fail)
+
+    signed_path = sign.sign_pdf_legacy(sample_pdf, key, low_memory=low_memory)
+
+    assert os.path.exists(signed_path)
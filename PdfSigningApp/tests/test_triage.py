@@ -0,0 +1,93 @@
+##
+# @file test_triage.py
+# @brief Fast signature triage and its use as an opt-in verification prefilter.
+
+import re
+import pytest
+import sign
+import triage
+import utils
+import verify
+
+# More trailing data than the 1 MiB window PyPDF2 once used for `%%EOF`
+TRAILING_DATA = bytes(range(256)) * (1100 * 1024 // 256)
+
+def _append(path, data):
+    with open(path, "ab") as f:
+        f.write(data)
+
+def test_classification(sample_pdf, xref_stream_pdf, key):
+    assert triage.triage_pdf(sample_pdf) == triage.UNSIGNED
+    assert triage.triage_pdf(xref_stream_pdf) == triage.UNSIGNED
+
+    legacy = sign.sign_pdf_with_key(sample_pdf, key, utils.FORMAT_LEGACY)
+    assert triage.triage_pdf(legacy) == triage.SIGNED_LEGACY
+
+    incremental = sign.sign_pdf_with_key(xref_stream_pdf, key, utils.FORMAT_INCREMENTAL)
+    assert triage.triage_pdf(incremental) == triage.SIGNED_INCREMENTAL
+
+def test_not_a_pdf(tmp_path):
+    path = tmp_path / "junk.pdf"
+    path.write_bytes(b"definitely not a PDF document")
+
+    assert triage.triage_pdf(str(path)) == triage.MALFORMED
+
+@pytest.mark.parametrize("prefilter", [False, True])
+def test_trailing_data_keeps_verdict(sample_pdf, key, key_files, prefilter):
+    signed_path = sign.sign_pdf_with_key(sample_pdf, key, utils.FORMAT_LEGACY)
+    _append(signed_path, TRAILING_DATA)
+
+    assert triage.triage_pdf(signed_path) == triage.SIGNED_LEGACY
+    assert verify.check_pdf_signature(signed_path, key_files[1], prefilter).status == verify.VALID
+
+@pytest.mark.parametrize("prefilter", [False, True])
+def test_missing_header_keeps_verdict(sample_pdf, key, key_files, prefilter):
+    with open(sample_pdf, "rb") as f:
+        data = f.read()
+    # PyPDF2 tolerates a broken header; keep every offset by overwriting it
+    with open(sample_pdf, "wb") as f:
+        f.write(b"XXXXX" + data[5:])
+    assert triage.triage_pdf(sample_pdf) == triage.UNSIGNED
+
+    signed_path = sign.sign_pdf_with_key(sample_pdf, key, utils.FORMAT_INCREMENTAL)
+
+    assert triage.triage_pdf(signed_path) == triage.SIGNED_INCREMENTAL
+    assert verify.check_pdf_signature(signed_path, key_files[1], prefilter).status == verify.VALID
+
+def test_default_verification_does_not_triage(sample_pdf, key, key_files, monkeypatch):
+    def fail(pdf_path):
+        raise AssertionError("triage must be opt-in")
+
+    monkeypatch.setattr(triage, "triage_pdf", fail)
+    signed_path = sign.sign_pdf_with_key(sample_pdf, key, utils.FORMAT_LEGACY)
+
+    assert verify.check_pdf_signature(signed_path, key_files[1]).status == verify.VALID
+    assert verify.check_pdf_signature(sample_pdf, key_files[1]).status == verify.UNSIGNED
+
+def test_prefilter_skips_parse_of_unsigned(sample_pdf, key_files, monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("unsigned file must not be parsed")
+
+    monkeypatch.setattr(verify, "PdfReader", fail)
+
+    assert verify.check_pdf_signature(sample_pdf, key_files[1], prefilter=True).status == verify.UNSIGNED
+
+def test_prefilter_parses_malformed(tmp_path, key_files):
+    path = tmp_path / "junk.pdf"
+    path.write_bytes(b"definitely not a PDF document")
+
+    result = verify.check_pdf_signature(str(path), key_files[1], prefilter=True)
+    assert result.status == verify.ERROR
+
+def test_startxref_out_of_range_needs_full_parse(sample_pdf, key, key_files):
+    with open(sample_pdf, "rb") as f:
+        data = f.read()
+    match = list(re.finditer(rb"startxref\s+(\d+)", data))[-1]
+    with open(sample_pdf, "wb") as f:
+        f.write(data[:match.start(1)] + b"%d" % (len(data) + 1000) + data[match.end(1):])
+
+    assert triage.triage_pdf(sample_pdf) == triage.UNKNOWN
+    # PyPDF2 reads the file, so it can be verified and signed
+    assert verify.check_pdf_signature(sample_pdf, key_files[1], prefilter=True).status == verify.UNSIGNED
+    sidecar_file = sign.sign_pdf_with_key(sample_pdf, key, utils.FORMAT_DETACHED)
+    assert verify.check_pdf_signature(sidecar_file, key_files[1]).status == verify.VALID
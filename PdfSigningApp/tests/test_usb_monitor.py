@@ -0,0 +1,162 @@
+##
+# @file test_usb_monitor.py
+# @brief USB monitor driven by the scripted fake drive backend.
+
+import os
+import queue
+import shutil
+import threading
+import pytest
+import drive_backends
+import sign
+import usb_monitor
+import utils
+from conftest import PASSWORD
+
+@pytest.fixture(autouse=True)
+def fast_monitor(monkeypatch):
+    monkeypatch.setattr(usb_monitor, "DEBOUNCE_DELAY", 0.05)
+    monkeypatch.setattr(usb_monitor, "_volume_key_cache", {})
+    monkeypatch.setattr(usb_monitor, "_unlocked_key_fingerprints", {})
+
+##
+# @brief Creates a directory acting as a drive with the private key in `keys/`.
+# @return Tuple `(drive, key_path)`.
+def _key_drive(tmp_path, name, private_key_path):
+    drive = tmp_path / name
+    (drive / "keys").mkdir(parents=True)
+    key_path = str(drive / "keys" / "private_key.pem")
+    shutil.copyfile(private_key_path, key_path)
+    return str(drive), key_path
+
+@pytest.fixture
+def running_monitor():
+    backend = drive_backends.FakeBackend()
+    updates = queue.Queue()
+    monitor = usb_monitor.USBMonitor(updates.put, backend)
+    monitor.start_monitoring()
+    yield monitor, backend, updates
+    monitor.stop_monitoring()
+
+def test_plug_and_unplug(running_monitor, tmp_path, key_files):
+    monitor, backend, updates = running_monitor
+    drive, key_path = _key_drive(tmp_path, "usb", key_files[0])
+
+    backend.plug(drive)
+    assert updates.get(timeout=5) is True
+    assert monitor.get_key_file_path() == key_path
+    assert monitor.get_key_file_drive() == drive
+    assert [entry.path for entry in monitor.get_keys()] == [key_path]
+
+    backend.unplug(drive)
+    assert updates.get(timeout=5) is False
+    assert monitor.get_key_file_path() is None
+    assert monitor.get_keys() == []
+
+def test_unplug_selects_remaining_key(tmp_path, key_files):
+    first, _ = _key_drive(tmp_path, "a", key_files[0])
+    second, second_key = _key_drive(tmp_path, "b", key_files[0])
+    backend = drive_backends.FakeBackend([first, second])
+    updates = []
+    monitor = usb_monitor.USBMonitor(updates.append, backend)
+    monitor.run_initial_key_check()
+    assert monitor.get_key_file_drive() == first
+
+    backend.unplug(first)
+    monitor.handle_drive_change()
+
+    assert monitor.get_key_file_path() == second_key
+    assert updates == [True, True]
+
+def test_drive_without_key(running_monitor, tmp_path):
+    monitor, backend, updates = running_monitor
+    (tmp_path / "empty").mkdir()
+
+    backend.plug(str(tmp_path / "empty"))
+    backend.unplug(str(tmp_path / "empty"))
+    backend.plug(str(tmp_path / "empty"))
+
+    with pytest.raises(queue.Empty):
+        updates.get(timeout=0.5)
+    assert monitor.get_keys() == []
+
+def test_change_during_debounce_survives_initial_check(tmp_path, key_files):
+    drive, key_path = _key_drive(tmp_path, "usb", key_files[0])
+    backend = drive_backends.FakeBackend()
+    updates = queue.Queue()
+    monitor = usb_monitor.USBMonitor(updates.put, backend)
+
+    # The drive is plugged while the startup check is still queued behind the change
+    backend.plug(drive)
+    monitor.events.put(usb_monitor.DRIVES_CHANGED)
+    monitor.events.put(usb_monitor.INITIAL_CHECK)
+    threading.Thread(target=monitor.run_scanner, daemon=True).start()
+
+    assert updates.get(timeout=5) is False
+    assert updates.get(timeout=5) is True
+    assert monitor.get_key_file_path() == key_path
+
+def test_generated_key_found_by_fingerprint(tmp_path, sample_pdf, key, key_files):
+    drive, key_path = _key_drive(tmp_path, "usb", key_files[0])
+    backend = drive_backends.FakeBackend([drive])
+    monitor = usb_monitor.USBMonitor(lambda key_found: None, backend)
+    monitor.run_initial_key_check()
+    fingerprint = utils.public_key_fingerprint(key)
+
+    # Generated keys are encrypted, so the fingerprint is only known once the key is unlocked
+    assert monitor.find_key(fingerprint) is None
+    assert sign.sign_pdf(sample_pdf, key_path, PASSWORD,
+                         key_loaded=lambda unlocked: monitor.register_fingerprint(key_path, unlocked))
+    assert monitor.find_key(fingerprint).path == key_path
+
+    # The fingerprint is remembered when the drive is plugged in again
+    backend.unplug(drive)
+    monitor.handle_drive_change()
+    assert monitor.find_key(fingerprint) is None
+    backend.plug(drive)
+    monitor.handle_drive_change()
+    assert monitor.find_key(fingerprint).path == key_path
+
+def test_cached_location_is_read_first(tmp_path, key_files, monkeypatch):
+    drive, key_path = _key_drive(tmp_path, "usb", key_files[0])
+    assert list(usb_monitor.find_key_files(drive, serial="1234-ABCD")) == [key_path]
+
+    def fail(*args, **kwargs):
+        raise AssertionError("cached key location must not be searched")
+
+    monkeypatch.setattr(usb_monitor, "_scan_dir", fail)
+
+    assert list(usb_monitor.find_key_files(drive, serial="1234-ABCD")) == [key_path]
+
+def test_well_known_location_skips_scan(tmp_path, key_files):
+    drive, key_path = _key_drive(tmp_path, "usb", key_files[0])
+    deep = os.path.join(drive, "a", "b")
+    os.makedirs(deep)
+    deep_key = os.path.join(deep, "backup.pem")
+    shutil.copyfile(key_files[0], deep_key)
+
+    assert list(usb_monitor.find_key_files(drive)) == [key_path]
+
+    # Without a key in a well-known directory the drive is scanned
+    os.remove(key_path)
+    assert list(usb_monitor.find_key_files(drive)) == [deep_key]
+
+def test_linux_volume_serial_of_mount_point_with_space(tmp_path, monkeypatch):
+    device = tmp_path / "sdb1"
+    device.touch()
+    by_uuid = tmp_path / "by-uuid"
+    by_uuid.mkdir()
+    (by_uuid / "1234-ABCD").symlink_to(device)
+    (by_uuid / "5678-EF01").symlink_to(tmp_path / "sdc1")
+    mounts = tmp_path / "mounts"
+    mounts.write_text("/dev/root / ext4 rw 0 0\n"
+                      f"{tmp_path}/sdc1 /media/user/MY 0 vfat rw 0 0\n"
+                      f"{device} /media/user/MY\\040STICK\\134x vfat rw,nosuid 0 0\n")
+
+    backend = drive_backends.LinuxBackend()
+    monkeypatch.setattr(backend, "MOUNTS_FILE", str(mounts))
+    monkeypatch.setattr(backend, "BY_UUID_DIR", str(by_uuid))
+
+    assert backend.get_volume_serial("/media/user/MY STICK\\x") == "1234-ABCD"
+    assert backend.get_volume_serial("/media/user/MY\\040STICK\\134x") is None
+    assert backend.get_volume_serial("/media/user/OTHER") is None
@@ -0,0 +1,63 @@
+##
+# @file test_verify.py
+# @brief Verification results, in-memory verification and batch verification.
+
+import os
+import pathlib
+import shutil
+import sign
+import utils
+import verify
+
+def test_verify_writes_no_files(sample_pdf, key, key_files):
+    signed_path = sign.sign_pdf_with_key(sample_pdf, key, utils.FORMAT_LEGACY)
+    directory = os.path.dirname(signed_path)
+    before = sorted(os.listdir(directory))
+
+    assert verify.verify_pdf(signed_path, key_files[1])
+    assert sorted(os.listdir(directory)) == before
+
+def test_unsigned_file(sample_pdf, key_files, capsys):
+    result = verify.check_pdf_signature(sample_pdf, key_files[1])
+
+    assert result.status == verify.UNSIGNED
+    assert not verify.verify_pdf(sample_pdf, key_files[1])
+    assert "No signature in given file" in capsys.readouterr().out
+
+def test_modified_signature_is_invalid(sample_pdf, key, key_files, capsys):
+    signed_path = sign.sign_pdf_with_key(sample_pdf, key, utils.FORMAT_LEGACY)
+    with open(signed_path, "rb") as f:
+        data = f.read()
+    # Flip the first hex digit of the stored signature
+    position = data.index(b"/Signature (") + len(b"/Signature (")
+    flipped = b"0" if data[position:position + 1] != b"0" else b"1"
+    with open(signed_path, "wb") as f:
+        f.write(data[:position] + flipped + data[position + 1:])
+
+    assert verify.check_pdf_signature(signed_path, key_files[1]).status == verify.INVALID
+    assert not verify.verify_pdf(signed_path, key_files[1])
+    assert "Invalid signature" in capsys.readouterr().out
+
+def test_missing_file_is_error(tmp_path, key_files):
+    result = verify.check_pdf_signature(str(tmp_path / "missing.pdf"), key_files[1])
+
+    assert result.status == verify.ERROR
+
+def test_verify_pdfs_keeps_order(sample_pdf, key, key_files):
+    signed_path = sign.sign_pdf_with_key(sample_pdf, key, utils.FORMAT_LEGACY)
+    copy_path = os.path.join(os.path.dirname(sample_pdf), "copy.pdf")
+    shutil.copyfile(sample_pdf, copy_path)
+
+    results = list(verify.verify_pdfs([signed_path, copy_path, sample_pdf], key_files[1], max_workers=2))
+
+    assert [r.pdf_path for r in results] == [signed_path, copy_path, sample_pdf]
+    assert [r.status for r in results] == [verify.VALID, verify.UNSIGNED, verify.UNSIGNED]
+
+def test_path_objects_are_accepted(sample_pdf, key, key_files, tmp_path):
+    signed_path = pathlib.Path(sign.sign_pdf_with_key(sample_pdf, key, utils.FORMAT_LEGACY))
+    public_key_path = pathlib.Path(key_files[1])
+
+    assert verify.verify_pdf(signed_path, public_key_path)
+    assert verify.check_pdf_signature(signed_path, public_key_path).status == verify.VALID
+    cache_path = str(tmp_path / "cache.sqlite")
+    assert verify.check_pdf_signature_cached(signed_path, public_key_path, cache_path).status == verify.VALID
@@ -0,0 +1,116 @@
+##
+# @file test_verify_cache.py
+# @brief Persistent verdict cache: hits, misses, trusted mtimes, pruning and the stat guard.
+
+import itertools
+import os
+import pytest
+import sign
+import triage
+import utils
+import verify
+import verify_cache
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return str(tmp_path / "cache.sqlite")
+
+##
+# @brief Counts full verifications done by `check_pdf_signature_cached`.
+@pytest.fixture
+def verifications(monkeypatch):
+    calls = []
+    check = verify.check_pdf_signature
+
+    def counting_check(pdf_path, public_key_path, prefilter=False):
+        calls.append(pdf_path)
+        return check(pdf_path, public_key_path, prefilter)
+
+    monkeypatch.setattr(verify, "check_pdf_signature", counting_check)
+    return calls
+
+def test_hit_and_miss(sample_pdf, key, key_files, other_public_key_path, cache_path, verifications):
+    signed_path = sign.sign_pdf_with_key(sample_pdf, key, utils.FORMAT_LEGACY)
+
+    for _ in range(2):
+        assert verify.check_pdf_signature_cached(signed_path, key_files[1], cache_path).status == verify.VALID
+    assert len(verifications) == 1
+
+    # Another public key is another entry
+    result = verify.check_pdf_signature_cached(signed_path, other_public_key_path, cache_path)
+    assert result.status == verify.INVALID
+    assert len(verifications) == 2
+
+    # Other content is a miss, even under the same path
+    with open(signed_path, "ab") as f:
+        f.write(b"\n")
+    verify.check_pdf_signature_cached(signed_path, key_files[1], cache_path)
+    assert len(verifications) == 3
+
+def test_trust_mtime_skips_reading(sample_pdf, key_files, cache_path, verifications, monkeypatch):
+    assert verify.check_pdf_signature_cached(sample_pdf, key_files[1], cache_path,
+                                             trust_mtime=True).status == verify.UNSIGNED
+
+    def fail(f):
+        raise AssertionError("file must not be read")
+
+    monkeypatch.setattr(verify_cache, "file_digest", fail)
+
+    assert verify.check_pdf_signature_cached(sample_pdf, key_files[1], cache_path,
+                                             trust_mtime=True).status == verify.UNSIGNED
+    assert len(verifications) == 1
+
+    # Without trust_mtime the content is hashed (failing here means: verified without the cache)
+    verify.check_pdf_signature_cached(sample_pdf, key_files[1], cache_path)
+    assert len(verifications) == 2
+
+def test_changed_file_is_not_stored(sample_pdf, key_files, cache_path, monkeypatch):
+    check = verify.check_pdf_signature
+
+    # The file is rewritten while it is being verified
+    def check_and_modify(pdf_path, public_key_path, prefilter=False):
+        result = check(pdf_path, public_key_path, prefilter)
+        with open(pdf_path, "ab") as f:
+            f.write(b"\n")
+        return result
+
+    monkeypatch.setattr(verify, "check_pdf_signature", check_and_modify)
+    verify.check_pdf_signature_cached(sample_pdf, key_files[1], cache_path)
+
+    assert len(verify_cache.get_cache(cache_path)) == 0
+
+def test_prefilter_verdict_is_not_reused(sample_pdf, key_files, cache_path, verifications, monkeypatch):
+    # A triage false negative: the fast scan calls the file unsigned
+    monkeypatch.setattr(triage, "triage_pdf", lambda pdf_path: triage.UNSIGNED)
+    assert verify.check_pdf_signature_cached(sample_pdf, key_files[1], cache_path,
+                                             prefilter=True).status == verify.UNSIGNED
+
+    verify.check_pdf_signature_cached(sample_pdf, key_files[1], cache_path)
+
+    assert len(verifications) == 2
+    assert len(verify_cache.get_cache(cache_path)) == 1
+
+def test_prune_keeps_most_recently_used(tmp_path, monkeypatch):
+    clock = itertools.count(1000)
+    monkeypatch.setattr(verify_cache.time, "time", lambda: next(clock))
+    cache = verify_cache.VerificationCache(str(tmp_path / "cache.sqlite"), max_entries=3, max_age=None)
+    stat = os.stat(__file__)
+    for i in range(5):
+        cache.store(f"doc{i}.pdf", stat, f"digest{i}", "key", verify.VALID, "ok")
+
+    assert cache.prune() == 2
+    assert len(cache) == 3
+    assert cache.lookup("digest0", stat.st_size, "key") is None
+    assert cache.lookup("digest4", stat.st_size, "key") == (verify.VALID, "ok")
+    cache.close()
+
+def test_prune_by_age_and_errors_not_stored(tmp_path):
+    cache = verify_cache.VerificationCache(str(tmp_path / "cache.sqlite"), max_age=60)
+    stat = os.stat(__file__)
+    cache.store("a.pdf", stat, "digest", "key", verify.ERROR, "broken")
+    assert len(cache) == 0
+
+    cache.store("a.pdf", stat, "digest", "key", verify.VALID, "ok")
+    cache.db.execute("UPDATE verdicts SET last_used = last_used - 120")
+    assert cache.prune() == 1
+    cache.close()
@@ -0,0 +1,140 @@
+##
+# @file test_watch_service.py
+# @brief Watch-folder signing service: delivery, quarantine and moves across file systems.
+
+import errno
+import os
+import shutil
+import time
+import pytest
+import utils
+import verify
+import watch_service
+from conftest import SAMPLE_PDF
+
+@pytest.fixture
+def folders(tmp_path):
+    names = ("inbox", "outbox", "quarantine", "archive")
+    for name in names:
+        (tmp_path / name).mkdir()
+    return {name: str(tmp_path / name) for name in names}
+
+def _drop(folders, name, data=None):
+    path = os.path.join(folders["inbox"], name)
+    if data is None:
+        shutil.copyfile(SAMPLE_PDF, path)
+    else:
+        with open(path, "wb") as f:
+            f.write(data)
+
+##
+# @brief Runs the service until the inbox is empty and every claimed file is handled.
+def _run_until_idle(service, timeout=60):
+    service.start()
+    try:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            service.poll_once()
+            if not service.pending and os.listdir(service.inbox) == [watch_service.PROCESSING_DIR]:
+                break
+            time.sleep(0.05)
+    finally:
+        service.shutdown()
+
+def _service(folders, key, signature_format=utils.FORMAT_LEGACY, archive=True):
+    return watch_service.SigningService(folders["inbox"], folders["outbox"], folders["quarantine"], key,
+                                        signature_format, archive=folders["archive"] if archive else None,
+                                        max_workers=1, poll_interval=0.05, stable_time=0)
+
+def test_signs_and_archives(folders, key, key_files):
+    _drop(folders, "a.pdf")
+    _drop(folders, "b.pdf")
+    _drop(folders, "broken.pdf", b"not a pdf")
+    service = _service(folders, key)
+
+    _run_until_idle(service)
+
+    assert sorted(os.listdir(folders["outbox"])) == ["a_signed.pdf", "b_signed.pdf"]
+    assert sorted(os.listdir(folders["archive"])) == ["a.pdf", "b.pdf"]
+    assert sorted(os.listdir(folders["quarantine"])) == ["broken.pdf", "broken.pdf.error.txt"]
+    assert (service.signed, service.failed) == (2, 1)
+    result = verify.check_pdf_signature(os.path.join(folders["outbox"], "a_signed.pdf"), key_files[1])
+    assert result.status == verify.VALID
+
+def test_detached_keeps_original_next_to_sidecar(folders, key, key_files):
+    _drop(folders, "a.pdf")
+    service = _service(folders, key, utils.FORMAT_DETACHED, archive=False)
+
+    _run_until_idle(service)
+
+    assert sorted(os.listdir(folders["outbox"])) == ["a.pdf", "a.pdf" + utils.SIDECAR_SUFFIX]
+    result = verify.check_pdf_signature(os.path.join(folders["outbox"], "a.pdf"), key_files[1])
+    assert result.status == verify.VALID
+
+def test_moves_across_file_systems(folders, key, monkeypatch):
+    replace = os.replace
+
+    # Renames into the outbox or archive behave as if they were on another device
+    def cross_device_replace(src, dst):
+        target_dir = os.path.dirname(dst)
+        if target_dir in (folders["outbox"], folders["archive"]) and os.path.dirname(src) != target_dir:
+            raise OSError(errno.EXDEV, "Invalid cross-device link")
+        replace(src, dst)
+
+    monkeypatch.setattr(os, "replace", cross_device_replace)
+    _drop(folders, "a.pdf")
+    service = _service(folders, key)
+
+    _run_until_idle(service)
+
+    assert os.listdir(folders["outbox"]) == ["a_signed.pdf"]
+    assert os.listdir(folders["archive"]) == ["a.pdf"]
+    assert service.signed == 1
+
+def test_failed_delivery_is_quarantined(folders, key, monkeypatch):
+    move = watch_service._move
+
+    def failing_move(path, target):
+        if os.path.basename(target) == "a_signed.pdf":
+            raise OSError(errno.EACCES, "Permission denied")
+        move(path, target)
+
+    monkeypatch.setattr(watch_service, "_move", failing_move)
+    _drop(folders, "a.pdf")
+    _drop(folders, "b.pdf")
+    service = _service(folders, key)
+
+    _run_until_idle(service)
+
+    # The service keeps running and the other file is delivered
+    assert os.listdir(folders["outbox"]) == ["b_signed.pdf"]
+    assert sorted(os.listdir(folders["quarantine"])) == ["a.pdf", "a.pdf.error.txt"]
+    assert os.listdir(os.path.join(folders["inbox"], watch_service.PROCESSING_DIR)) == []
+    assert (service.signed, service.failed) == (1, 1)
+
+def test_restart_returns_only_originals(folders, key):
+    processing = os.path.join(folders["inbox"], watch_service.PROCESSING_DIR)
+    os.mkdir(processing)
+    # State left by a run interrupted while signing a.pdf and b.pdf
+    shutil.copyfile(SAMPLE_PDF, os.path.join(processing, "a.pdf"))
+    shutil.copyfile(SAMPLE_PDF, os.path.join(processing, "b.pdf"))
+    with open(os.path.join(processing, "a_signed.pdf"), "wb") as f:
+        f.write(b"%PDF-1.4 truncated")
+    with open(os.path.join(processing, "b.pdf" + utils.SIDECAR_SUFFIX), "w") as f:
+        f.write("{")
+    # A dropped file that only looks like an output is an original
+    shutil.copyfile(SAMPLE_PDF, os.path.join(processing, "c_signed.pdf"))
+    service = _service(folders, key)
+
+    service.start()
+    try:
+        assert sorted(os.listdir(folders["inbox"])) == [watch_service.PROCESSING_DIR, "a.pdf", "b.pdf",
+                                                        "c_signed.pdf"]
+        assert os.listdir(processing) == []
+    finally:
+        service.shutdown()
+
+    _run_until_idle(service)
+
+    assert sorted(os.listdir(folders["outbox"])) == ["a_signed.pdf", "b_signed.pdf", "c_signed_signed.pdf"]
+    assert os.listdir(folders["quarantine"]) == []
@@ -0,0 +1,160 @@
+##
+# @file tracing.py
+# @brief Per-stage timing spans of the signing and verification pipeline.
+#
+# `sign` and `verify` wrap each stage of their work in `span()`. When a tracer is installed
+# with `set_tracer()` (or temporarily with `tracer()`), every finished stage is passed to it
+# as a `Span` with its duration, the number of bytes processed and the file it belongs to
+# (the key file for `SPAN_KEY_LOAD`, the document for every other span).
+# Without a tracer `span()` returns a shared no-op object, so the pipeline pays only
+# a function call per stage.
+#
+# The tracer is process-wide. Worker processes of `verify.verify_pdfs` do not inherit it.
+#
+# Example:
+#   spans = []
+#   with tracing.tracer(spans.append):
+#       sign.sign_pdf("doc.pdf", "E:/private_key.pem", pwd)
+#   print([s.to_dict() for s in spans])
+
+import contextlib
+import logging
+import time
+
+# Span names
+SPAN_PARSE = "parse"
+SPAN_NORMALIZE_WRITE = "normalize-write"
+SPAN_HASH = "hash"
+SPAN_KEY_LOAD = "key-load"
+SPAN_RSA = "rsa"
+SPAN_OUTPUT_WRITE = "output-write"
+SPANS = (SPAN_PARSE, SPAN_NORMALIZE_WRITE, SPAN_HASH, SPAN_KEY_LOAD, SPAN_RSA, SPAN_OUTPUT_WRITE)
+
+# Callback receiving finished spans, None = tracing disabled
+_tracer = None
+
+##
+# @class Span
+# @brief Timing of a single pipeline stage for a single file.
+#
+# Used as a context manager; the duration is measured between enter and exit
+# and the span is passed to the tracer on exit, also when the stage raised.
+class Span:
+    __slots__ = ("name", "file_id", "bytes", "start", "duration", "failed")
+
+    ##
+    # @param name One of the `SPAN_*` constants.
+    # @param file_id Identifier of the processed file (usually its path).
+    # @param bytes Number of bytes processed, may also be set inside the `with` block.
+    def __init__(self, name, file_id, bytes=None):
+        self.name = name
+        self.file_id = file_id
+        self.bytes = bytes
+        self.start = None
+        self.duration = None
+        self.failed = False
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = time.perf_counter() - self.start
+        self.failed = exc_type is not None
+        tracer = _tracer
+        if tracer is not None:
+            tracer(self)
+        return False
+
+    ##
+    # @brief Returns the span as a dictionary (e.g. for JSON output or a metrics system).
+    # @return Dictionary with `name`, `file_id`, `duration`, `bytes` and `failed` keys.
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "file_id": self.file_id,
+            "duration": self.duration,
+            "bytes": self.bytes,
+            "failed": self.failed,
+        }
+
+    def __repr__(self):
+        return f"Span({self.name!r}, {self.file_id!r}, duration={self.duration!r}, bytes={self.bytes!r})"
+
+##
+# @class _NullSpan
+# @brief Span returned while tracing is disabled; measures and stores nothing.
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    @property
+    def bytes(self):
+        return None
+
+    @bytes.setter
+    def bytes(self, value):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+##
+# @brief Tells whether a tracer is installed.
+#
+# Lets callers skip work that is only needed for span attributes.
+#
+# @return True if finished spans are passed to a tracer.
+def enabled():
+    return _tracer is not None
+
+##
+# @brief Creates a span for a pipeline stage.
+# @param name One of the `SPAN_*` constants.
+# @param file_id Identifier of the processed file (usually its path).
+# @param bytes Number of bytes processed, if already known.
+# @return Context manager measuring the stage (a no-op object while tracing is disabled).
+def span(name, file_id, bytes=None):
+    if _tracer is None:
+        return _NULL_SPAN
+    return Span(name, file_id, bytes)
+
+##
+# @brief Installs the process-wide tracer.
+# @param callback Callable receiving each finished `Span`, or None to disable tracing.
+# @return The previously installed tracer.
+def set_tracer(callback):
+    global _tracer
+    previous = _tracer
+    _tracer = callback
+    return previous
+
+##
+# @brief Installs a tracer for the duration of a `with` block.
+# @param callback Callable receiving each finished `Span`.
+@contextlib.contextmanager
+def tracer(callback):
+    previous = set_tracer(callback)
+    try:
+        yield callback
+    finally:
+        set_tracer(previous)
+
+##
+# @brief Creates a tracer that writes spans to a logger.
+# @param logger `logging.Logger` to use (None = logger named "tracing").
+# @param level Logging level of span records.
+# @return Callable to pass to `set_tracer()`.
+def logging_tracer(logger=None, level=logging.DEBUG):
+    logger = logger if logger is not None else logging.getLogger("tracing")
+
+    def log_span(s):
+        logger.log(level, "%s %s %.3f ms %s bytes%s", s.name, s.file_id, s.duration * 1000,
+                   s.bytes if s.bytes is not None else "-", " (failed)" if s.failed else "")
+
+    return log_span
@@ -0,0 +1,170 @@
+##
+# @file triage.py
+# @brief Fast classification of PDF files by signature presence without a full parse.
+#
+# Building a `PdfReader` and reading the metadata costs far more than finding out
+# that most files of a shared folder are not signed at all. `triage_pdf` memory-maps
+# the file and reads only:
+# - the last `%%EOF` marker and the `startxref` before it,
+# - the last trailer, where an incremental signature is referenced by `/Sig`,
+# - the Info dictionary (located through the cross-reference table), where
+#   a legacy signature is stored under `/Signature`.
+#
+# When the file uses cross-reference streams (no classic `xref` table), the whole file
+# is searched for `/Signature` through the memory map instead. A file whose objects
+# may be compressed in object streams cannot be ruled out that way and is reported
+# as `UNKNOWN`, meaning a full parse is needed.
+#
+# A file is reported as `MALFORMED` only where PyPDF2 (non-strict) fails as well:
+# a missing header is tolerated and `%%EOF` may be followed by any amount of data.
+
+import mmap
+import os
+import re
+
+# Triage results
+UNSIGNED = "unsigned"
+SIGNED_LEGACY = "signed-legacy"
+SIGNED_INCREMENTAL = "signed-incremental"
+MALFORMED = "malformed"
+UNKNOWN = "unknown"
+
+# `startxref` must be within this many bytes before `%%EOF`
+TAIL_WINDOW = 1024
+
+# Longest trailer or Info dictionary read (bytes)
+DICT_READ_LIMIT = 64 * 1024
+
+# Longest `/Prev` chain followed when looking for the Info object
+MAX_XREF_SECTIONS = 64
+
+_STARTXREF = re.compile(rb"startxref\s+(\d+)")
+_SUBSECTION = re.compile(rb"\s*(\d+)\s+(\d+)\s*?\r?\n")
+_ENTRY = re.compile(rb"(\d{10}) (\d{5}) ([nf])")
+_INFO_REF = re.compile(rb"/Info\s+(\d+)\s+(\d+)\s+R")
+_SIG_REF = re.compile(rb"/Sig\s+\d+\s+\d+\s+R")
+_PREV = re.compile(rb"/Prev\s+(\d+)")
+_SIGNATURE_KEY = re.compile(rb"/Signature[\s/<(\[]")
+
+##
+# @brief Raised internally when the file structure cannot be read the fast way.
+class _NotClassic(Exception):
+    pass
+
+##
+# @brief Parses a classic cross-reference section.
+# @param mm Memory map of the file.
+# @param offset Offset of the `xref` keyword.
+# @return Tuple `(subsections, trailer)`: list of `(first, count, entries_offset)` and trailer bytes.
+# @throws _NotClassic If there is no classic table at the offset.
+def _read_xref_section(mm, offset):
+    if mm[offset:offset + 4] != b"xref":
+        raise _NotClassic()
+
+    subsections = []
+    position = offset + 4
+    while True:
+        while mm[position:position + 1] in (b" ", b"\r", b"\n", b"\t"):
+            position += 1
+        if mm[position:position + 7] == b"trailer":
+            break
+        match = _SUBSECTION.match(mm, position)
+        if match is None:
+            raise _NotClassic()
+        first, count = int(match.group(1)), int(match.group(2))
+        subsections.append((first, count, match.end()))
+        # Entries are exactly 20 bytes long
+        position = match.end() + 20 * count
+
+    end = mm.find(b"startxref", position, position + DICT_READ_LIMIT)
+    if end < 0:
+        raise _NotClassic()
+    return subsections, mm[position:end]
+
+##
+# @brief Finds the offset of an object through the chain of cross-reference sections.
+# @param mm Memory map of the file.
+# @param offset Offset of the last `xref` keyword.
+# @param obj_num Object number to find.
+# @return Offset of the object, or None if it is not in use.
+def _find_object_offset(mm, offset, obj_num):
+    for _ in range(MAX_XREF_SECTIONS):
+        subsections, trailer = _read_xref_section(mm, offset)
+        for first, count, entries_offset in subsections:
+            if first <= obj_num < first + count:
+                entry = _ENTRY.match(mm, entries_offset + 20 * (obj_num - first))
+                if entry is None:
+                    raise _NotClassic()
+                return int(entry.group(1)) if entry.group(3) == b"n" else None
+
+        prev = _PREV.search(trailer)
+        if prev is None:
+            return None
+        offset = int(prev.group(1))
+    raise _NotClassic()
+
+##
+# @brief Classifies a memory-mapped PDF using its trailer and Info dictionary.
+# @param mm Memory map of the file.
+# @param xref_offset Offset from the last `startxref`.
+# @return One of the triage results.
+def _classify_classic(mm, xref_offset):
+    subsections, trailer = _read_xref_section(mm, xref_offset)
+    if _SIG_REF.search(trailer):
+        return SIGNED_INCREMENTAL
+
+    info = _INFO_REF.search(trailer)
+    if info is None:
+        return UNSIGNED
+
+    obj_num, generation = int(info.group(1)), int(info.group(2))
+    obj_offset = _find_object_offset(mm, xref_offset, obj_num)
+    if obj_offset is None:
+        return UNSIGNED
+    if not re.match(rb"%d\s+%d\s+obj" % (obj_num, generation), mm[obj_offset:obj_offset + 32]):
+        raise _NotClassic()
+
+    end = mm.find(b"endobj", obj_offset, obj_offset + DICT_READ_LIMIT)
+    if end < 0:
+        raise _NotClassic()
+    return SIGNED_LEGACY if _SIGNATURE_KEY.search(mm, obj_offset, end) else UNSIGNED
+
+##
+# @brief Classifies a PDF file by the kind of signature it carries.
+#
+# The result is a hint for skipping expensive work; it does not check the signature.
+# `SIGNED_LEGACY` and `SIGNED_INCREMENTAL` files still have to be verified,
+# `UNKNOWN` files need a full parse to tell.
+#
+# @param pdf_path Path to the PDF file.
+# @return `UNSIGNED`, `SIGNED_LEGACY`, `SIGNED_INCREMENTAL`, `MALFORMED` or `UNKNOWN`.
+# @throws OSError If the file cannot be opened.
+def triage_pdf(pdf_path):
+    with open(pdf_path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < len(b"%PDF-1.0%%EOF"):
+            return MALFORMED
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            # Searched backwards from the end like PyPDF2 does, usually found within the last bytes
+            eof = mm.rfind(b"%%EOF")
+            if eof < 0:
+                return MALFORMED
+            startxref = None
+            for startxref in _STARTXREF.finditer(mm[max(0, eof - TAIL_WINDOW):eof]):
+                pass
+            if startxref is None:
+                return MALFORMED
+            if int(startxref.group(1)) >= size:
+                # PyPDF2 rebuilds the cross-reference table of such files
+                return UNKNOWN
+
+            try:
+                return _classify_classic(mm, int(startxref.group(1)))
+            except (_NotClassic, ValueError):
+                pass
+
+            # Cross-reference streams: search the raw bytes
+            if _SIGNATURE_KEY.search(mm):
+                return SIGNED_LEGACY
+            return UNKNOWN if mm.find(b"/ObjStm") >= 0 else UNSIGNED
@@ -1,50 +1,193 @@
 ##
 # @file usb_monitor.py
-# @brief Module responsible for monitoring USB drive plug/unplug events on Windows.
+# @brief Module responsible for monitoring USB drive plug/unplug events.
 #
 # Detects private key files on USB drives and updates the application interface accordingly.
+# Platform specifics (Win32 message pump, Linux mount points, scripted fake drives) live
+# in `drive_backends`. Device change notifications are only queued by the backend thread;
+# drive scans run on a separate scanner thread and results reach Tk through a queue
+# polled with `after()`.
 
 import os
-import win32api
-import win32file
-import win32con
-import win32gui
+import queue
+import time
+from collections import deque
+from Cryptodome.PublicKey import RSA
+import drive_backends
 import threading
+import utils
 
 # Extensions that may contain private keys
 PRIVATE_KEY_EXTENSIONS = ".pem"
 
-# Windows USB Events
-# https://learn.microsoft.com/en-us/windows/win32/devio/wm-devicechange
-WM_DEVICECHANGE = 0x0219
-DBT_DEVICEARRIVAL = 0x8000
-DBT_DEVICEREMOVECOMPLETE = 0x8004
+# Directories (relative to the drive root) checked first, in this order
+WELL_KNOWN_KEY_DIRS = ("", "keys", "key", "private", ".keys")
+
+# Directories never searched for keys
+SKIPPED_DIRS = ("$recycle.bin", "system volume information")
+
+# Limits of the search for a private key on a drive
+MAX_SEARCH_DEPTH = 3
+SEARCH_TIMEOUT = 2.0
+
+# Volume serial number -> path of the key (relative to the drive root) found last time
+_volume_key_cache = {}
+
+# (key file path, size, modification time) -> fingerprint of encrypted keys unlocked in this process
+_unlocked_key_fingerprints = {}
+
+# Key files larger than this are not read when building the key inventory (bytes)
+MAX_KEY_FILE_SIZE = 64 * 1024
+
+# Quiet period after the last device change message before drives are rescanned (s)
+DEBOUNCE_DELAY = 0.5
+
+# How often the UI queue is polled when attached to a Tk widget (ms)
+UI_POLL_INTERVAL = 100
+
+# Scanner queue message requesting the startup key check
+INITIAL_CHECK = "initial"
+
+# Scanner queue message reported by the drive backend
+DRIVES_CHANGED = "changed"
 
 ##
-# @brief Returns a list of currently connected removable USB drives.
-# @return List of removable drive letters (e.g., ['E:\\', 'F:\\']).
-def get_removable_drives():
-    """Returns list of currently attached USB drives."""
-    drives = [i for i in win32api.GetLogicalDriveStrings().split('\\\x00') if i]
-    return [d for d in drives if win32file.GetDriveType(d) == win32con.DRIVE_REMOVABLE]
+# @brief Lists a single directory looking for private key files.
+# @param path Directory to list.
+# @param found List that receives every key file in the directory.
+# @param subdirs List that receives subdirectories to search later (None = do not collect).
+def _scan_dir(path, found, subdirs=None):
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                name = entry.name.lower()
+                # Cheap extension check before any stat call
+                if name.endswith(PRIVATE_KEY_EXTENSIONS):
+                    if entry.is_file():
+                        found.append(entry.path)
+                elif subdirs is not None and name not in SKIPPED_DIRS and entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.path)
+    except OSError:
+        pass
 
 ##
-# @brief Searches for a private key file on the given drive.
+# @brief Searches for the private key files on the given drive.
+#
+# The search is bounded so that a large drive cannot block the caller, and stops
+# at the first step that finds a private key:
+# 1. the location where a key was found last time on the same volume (by volume serial),
+# 2. well-known directories (`WELL_KNOWN_KEY_DIRS`),
+# 3. breadth-first scan up to `max_depth` directory levels, stopped after `timeout` seconds
+#    (the keys found so far are returned).
+#
+# Files containing a public key are skipped.
+#
 # @param drive The root path of the USB drive to search.
-# @return Full path to the found key file or None if not found.
-def find_key_file(drive):
-    """Searches for path to the private key on a drive."""
-    for root, _, files in os.walk(drive):
-        for file in files:
-            if file.lower().endswith(PRIVATE_KEY_EXTENSIONS):
-                return os.path.join(root, file)
-    return None
+# @param max_depth Maximum depth of the breadth-first scan (0 = drive root only).
+# @param timeout Maximum time spent on the scan in seconds.
+# @param serial Volume serial number of the drive (None = the location is not cached).
+# @return Dictionary mapping full key file paths to public key fingerprints
+#         (None for encrypted keys not unlocked before, see `USBMonitor.register_fingerprint`).
+def find_key_files(drive, max_depth=MAX_SEARCH_DEPTH, timeout=SEARCH_TIMEOUT, serial=None):
+    cached = _volume_key_cache.get(serial)
+    if cached:
+        keys = _private_keys([os.path.join(drive, cached)])
+        if keys:
+            return keys
+
+    found = []
+    for directory in WELL_KNOWN_KEY_DIRS:
+        _scan_dir(os.path.join(drive, directory), found)
+    keys = _private_keys(found)
+
+    if not keys:
+        deadline = time.monotonic() + timeout
+        queue = deque([(drive, 0)])
+        while queue:
+            if time.monotonic() > deadline:
+                print(f"Private key search on drive {drive} timed out")
+                break
+
+            path, depth = queue.popleft()
+            subdirs = [] if depth < max_depth else None
+            _scan_dir(path, found, subdirs)
+            if subdirs:
+                queue.extend((subdir, depth + 1) for subdir in subdirs)
+        keys = _private_keys(found)
+
+    if keys and serial is not None:
+        _volume_key_cache[serial] = os.path.relpath(next(iter(keys)), drive)
+    return keys
+
+##
+# @brief Keeps the private keys among candidate key files.
+# @param paths Candidate file paths (duplicates are ignored).
+# @return Dictionary mapping full key file paths to fingerprints (see `find_key_files`).
+def _private_keys(paths):
+    keys = {}
+    for key_file in dict.fromkeys(os.path.normpath(p) for p in paths):
+        is_private, fingerprint = _inspect_key_file(key_file)
+        if is_private:
+            keys[key_file] = fingerprint
+    return keys
+
+##
+# @brief Reads a PEM file to tell whether it holds a private key and to fingerprint it if possible.
+# @param path Normalized path to the PEM file.
+# @return Tuple `(is_private, fingerprint)`; the fingerprint is None for encrypted keys
+#         that were not unlocked before (see `USBMonitor.register_fingerprint`).
+def _inspect_key_file(path):
+    try:
+        stat = os.stat(path)
+        if stat.st_size > MAX_KEY_FILE_SIZE:
+            return False, None
+        with open(path, "rb") as f:
+            pem = f.read()
+    except OSError:
+        return False, None
+
+    if b"PUBLIC KEY-----" in pem:
+        return False, None
+    if b"ENCRYPTED" in pem:
+        # Known only if the same file was unlocked before
+        return True, _unlocked_key_fingerprints.get((path, stat.st_size, stat.st_mtime_ns))
+    try:
+        return True, utils.public_key_fingerprint(RSA.import_key(pem))
+    except (ValueError, IndexError, TypeError):
+        # Unknown content, kept as a candidate like before the inventory existed
+        return True, None
+
+##
+# @class KeyEntry
+# @brief Private key file found on a removable drive.
+class KeyEntry:
+    ##
+    # @param path Full path to the key file.
+    # @param drive Root path of the drive holding the file.
+    # @param fingerprint Public key fingerprint (`utils.public_key_fingerprint`), or None if unknown.
+    # @param last_seen `time.time()` of the scan that found the file.
+    def __init__(self, path, drive, fingerprint, last_seen):
+        self.path = path
+        self.drive = drive
+        self.fingerprint = fingerprint
+        self.last_seen = last_seen
+
+    def to_dict(self):
+        return {
+            "path": self.path,
+            "drive": self.drive,
+            "fingerprint": self.fingerprint,
+            "last_seen": self.last_seen,
+        }
+
+    def __repr__(self):
+        return f"KeyEntry({self.path!r}, {self.drive!r}, {self.fingerprint!r})"
 
 ##
 # @class USBMonitor
-# @brief Class responsible for detecting USB plug/unplug events on Windows.
+# @brief Class responsible for detecting USB plug/unplug events.
 #
-# Uses a hidden window to listen for system device change notifications.
+# Listens for device change notifications of a `drive_backends` backend.
 # Can identify USB drives containing private keys and notify the GUI.
 class USBMonitor:
     """Class to watch for USB events (plug/unplug)."""
@@ -52,98 +195,234 @@ class USBMonitor:
     ##
     # @brief Initializes the USBMonitor.
     # @param update_ui Callback function to update UI on key detection.
-    def __init__(self, update_ui):
-        # Handle for hidden window - detection USB plug/unplug
-        self.hwnd = None
+    # @param backend Drive backend (None = `drive_backends.default_backend()`).
+    def __init__(self, update_ui, backend=None):
+        self.backend = backend if backend is not None else drive_backends.default_backend()
 
         # Store initially connected drives.
-        self.current_drives = get_removable_drives()
+        self.current_drives = self.backend.get_removable_drives()
 
+        # Selected key (the most recently found one)
         self.key_file_path = None
         self.key_file_drive = None
 
+        # Inventory of all keys on attached drives: path -> KeyEntry
+        self.keys = {}
+        self.keys_lock = threading.Lock()
+
         # Callback to update the UI
         self.update_ui = update_ui
 
+        # Device change messages from the message pump to the scanner thread
+        self.events = queue.Queue()
+
+        # Key found/lost notifications from the scanner thread to the Tk thread
+        self.ui_events = queue.Queue()
+        self.widget = None
+
+    ##
+    # @brief Delivers `update_ui` calls on the Tk thread of the given widget.
+    #
+    # Without an attached widget `update_ui` is called directly on the scanner thread.
+    #
+    # @param widget Tk widget whose `after()` is used to poll for notifications.
+    def attach(self, widget):
+        self.widget = widget
+        self.widget.after(UI_POLL_INTERVAL, self._poll_ui)
+
+    ##
+    # @brief Calls `update_ui` for every queued notification (runs on the Tk thread).
+    def _poll_ui(self):
+        while True:
+            try:
+                key_found = self.ui_events.get_nowait()
+            except queue.Empty:
+                break
+            self.update_ui(key_found)
+        self.widget.after(UI_POLL_INTERVAL, self._poll_ui)
+
+    ##
+    # @brief Reports key presence to the UI in a thread-safe way.
+    # @param key_found True if a private key is available, False otherwise.
+    def _notify(self, key_found):
+        if self.widget is None:
+            self.update_ui(key_found)
+        else:
+            self.ui_events.put(key_found)
+
     ##
     # @brief Starts monitoring USB events in a background thread.
     def start_monitoring(self):
         """Monitoring USB plug/unplug events in a separate thread."""
         thread = threading.Thread(target=self.run_monitor, daemon=True)
         thread.start()
+        scanner = threading.Thread(target=self.run_scanner, daemon=True)
+        scanner.start()
 
     ##
-    # @brief Creates a hidden window and starts the message loop for USB event handling.
+    # @brief Runs the backend's change detection (blocks the monitor thread).
+    #
+    # Notifications are only queued, so the backend never waits for a drive scan.
     def run_monitor(self):
-        """Set up the Windows event loop to monitor USB devices."""
-        wc = win32gui.WNDCLASS()
-        wc.lpfnWndProc = self.window_proc
-        wc.lpszClassName = "USBMonitorWindow"
-        wc.hInstance = win32gui.GetModuleHandle(None)
-        class_atom = win32gui.RegisterClass(wc)
-        self.hwnd = win32gui.CreateWindow(class_atom, "USB Monitor", 0, 0, 0, 0, 0, 0, 0, wc.hInstance, None)
-        win32gui.PumpMessages()
-
-    ##
-    # @brief Handles Windows messages for USB plug/unplug events.
-    def window_proc(self, hwnd, msg, wparam, lparam):
-        """Handle Windows messages related to USB plug/unplug events."""
-        if msg == WM_DEVICECHANGE:
-            if wparam == DBT_DEVICEARRIVAL:
-                self.handle_usb_plug()
-            elif wparam == DBT_DEVICEREMOVECOMPLETE:
-                self.handle_usb_unplug()
-        return 0
-
-    ##
-    # @brief Handles logic for when a USB device is plugged in.
-    def handle_usb_plug(self):
-        """Handles USB plug-in event and checks for private keys."""
-        new_drives = get_removable_drives()
+        """Watch for USB plug/unplug events."""
+        self.backend.run(lambda: self.events.put(DRIVES_CHANGED))
+
+    ##
+    # @brief Stops the backend's change detection where the backend supports it.
+    def stop_monitoring(self):
+        self.backend.stop()
+
+    ##
+    # @brief Scanner thread: debounces device change messages and rescans drives.
+    #
+    # A burst of messages (e.g. a USB hub with several devices) results in a single rescan
+    # once no new message arrived for `DEBOUNCE_DELAY` seconds. The startup check is not
+    # delayed; when it arrives together with a change, the change is handled after it.
+    def run_scanner(self):
+        while True:
+            pending = {self.events.get()}
+            if INITIAL_CHECK not in pending:
+                while True:
+                    try:
+                        pending.add(self.events.get(timeout=DEBOUNCE_DELAY))
+                    except queue.Empty:
+                        break
+
+            if INITIAL_CHECK in pending:
+                self.run_initial_key_check()
+            if DRIVES_CHANGED in pending:
+                self.handle_drive_change()
+
+    ##
+    # @brief Compares attached drives with the last known state and handles the difference.
+    def handle_drive_change(self):
+        new_drives = self.backend.get_removable_drives()
         added_drives = [d for d in new_drives if d not in self.current_drives]
+        removed_drives = [d for d in self.current_drives if d not in new_drives]
+        self.current_drives = new_drives
+
+        self.handle_usb_unplug(removed_drives)
+        self.handle_usb_plug(added_drives)
 
+    ##
+    # @brief Handles logic for when USB devices are plugged in.
+    # @param added_drives Drives that appeared since the last check.
+    def handle_usb_plug(self, added_drives):
+        """Handles USB plug-in event and checks for private keys."""
         for drive in added_drives:
             print(f"[USB Plugged In] Drive {drive} detected. Checking for private keys...")
-            key_file = find_key_file(drive)
-            if key_file:
-                print(f"Private key found: {key_file} on drive {drive}")
-                self.key_file_path = key_file
+            entries = self._scan_drive_keys(drive)
+            if entries:
+                print(f"Private key found: {entries[0].path} on drive {drive}")
+                self.key_file_path = entries[0].path
                 self.key_file_drive = drive
-                self.update_ui(True)
+                self._notify(True)
             else:
                 print(f"No private key found on drive {drive}")
 
-        self.current_drives = new_drives
-
     ##
-    # @brief Handles logic for when a USB device is unplugged.
-    def handle_usb_unplug(self):
+    # @brief Handles logic for when USB devices are unplugged.
+    #
+    # Only the keys of the removed drives leave the inventory. If the selected key was
+    # on a removed drive, another key from the inventory is selected when available.
+    #
+    # @param removed_drives Drives that disappeared since the last check.
+    def handle_usb_unplug(self, removed_drives):
         """Handles USB unplug event and determines which drive was removed."""
-        new_drives = get_removable_drives()
-        removed_drives = [d for d in self.current_drives if d not in new_drives]
-
         for drive in removed_drives:
             print(f"[USB Removed] Drive {drive} has been unplugged.")
+            with self.keys_lock:
+                for path in [p for p, e in self.keys.items() if e.drive == drive]:
+                    del self.keys[path]
+                remaining = next(iter(self.keys.values()), None)
+
             if drive == self.key_file_drive:
                 # Unplugged drive with private key
-                self.update_ui(False)
-        self.current_drives = new_drives
+                self.key_file_path = remaining.path if remaining else None
+                self.key_file_drive = remaining.drive if remaining else None
+                self._notify(remaining is not None)
 
     ##
     # @brief On application start, checks already connected USBs for private keys.
+    #
+    # The check runs on the scanner thread, the result is reported through `update_ui`.
     def initial_key_check(self):
         """Search already plugged in USB drives for private key on startup."""
+        self.events.put(INITIAL_CHECK)
+
+    ##
+    # @brief Searches already connected drives for private keys (runs on the scanner thread).
+    def run_initial_key_check(self):
         found_key = False
         for drive in self.current_drives:
-            key_file = find_key_file(drive)
-            if key_file:
-                print(f"Private key found on startup: {key_file} on drive {drive}")
-                self.key_file_path = key_file
+            entries = self._scan_drive_keys(drive)
+            if entries and not found_key:
+                print(f"Private key found on startup: {entries[0].path} on drive {drive}")
+                self.key_file_path = entries[0].path
                 self.key_file_drive = drive
                 found_key = True
-                break
 
-        self.update_ui(found_key)
+        self._notify(found_key)
+
+    ##
+    # @brief Searches a drive for key files and replaces its entries in the inventory.
+    # @param drive Root path of the drive.
+    # @return List of `KeyEntry` objects found on the drive.
+    def _scan_drive_keys(self, drive):
+        keys = find_key_files(drive, serial=self.backend.get_volume_serial(drive))
+        now = time.time()
+        entries = [KeyEntry(path, drive, fingerprint, now) for path, fingerprint in keys.items()]
+
+        with self.keys_lock:
+            for path in [p for p, e in self.keys.items() if e.drive == drive]:
+                del self.keys[path]
+            for entry in entries:
+                self.keys[entry.path] = entry
+        return entries
+
+    ##
+    # @brief Returns every private key found on the attached drives.
+    # @return List of `KeyEntry` objects in the order they were found.
+    def get_keys(self):
+        with self.keys_lock:
+            return list(self.keys.values())
+
+    ##
+    # @brief Looks up a key in the inventory by its public key fingerprint.
+    # @param fingerprint Hex fingerprint as returned by `utils.public_key_fingerprint`.
+    # @return Matching `KeyEntry`, or None.
+    def find_key(self, fingerprint):
+        with self.keys_lock:
+            for entry in self.keys.values():
+                if entry.fingerprint == fingerprint:
+                    return entry
+        return None
+
+    ##
+    # @brief Records the fingerprint of an encrypted key once it has been unlocked.
+    #
+    # Encrypted keys are listed without a fingerprint, because the public part
+    # cannot be read without the password. The fingerprint is also remembered for
+    # later scans of the same, unchanged file (e.g. after the drive is plugged in again).
+    # Called by the signing frame through the `key_loaded` callback of `sign.sign_pdf`.
+    #
+    # @param path Path of the key file.
+    # @param key Unlocked `RsaKey` object loaded from that file.
+    # @return The updated `KeyEntry`, or None if the path is not in the inventory.
+    def register_fingerprint(self, path, key):
+        fingerprint = utils.public_key_fingerprint(key)
+        path = os.path.normpath(path)
+        try:
+            stat = os.stat(path)
+            _unlocked_key_fingerprints[(path, stat.st_size, stat.st_mtime_ns)] = fingerprint
+        except OSError:
+            pass
+
+        with self.keys_lock:
+            entry = self.keys.get(path)
+            if entry is not None:
+                entry.fingerprint = fingerprint
+            return entry
 
     ##
     # @brief Returns the full path to the detected private key file.
@@ -7,20 +7,248 @@
 
 import time
 from Cryptodome.Hash import SHA256
+from Cryptodome.IO import PEM
+from Cryptodome.Protocol.KDF import PBKDF2, scrypt
 from Cryptodome.PublicKey import RSA
 from Cryptodome.Signature import pkcs1_15
+from Cryptodome.Util.asn1 import DerObjectId, DerSequence
+import mmap
 import os
 
+# Key protection profiles: name -> (PKCS#8 protection scheme, KDF parameters).
+# The KDF parameters are stored inside every encrypted key file (PKCS#8 / PBES2),
+# so the profile used for a key can be detected when it is loaded.
+# Ordered from the weakest to the strongest protection; KeyGenerationApp/utils.py
+# ships the same table (checked by the tests).
+KDF_PROFILES = {
+    "compat": ("PBKDF2WithHMAC-SHA256AndAES256-CBC", {"iteration_count": 10000}),
+    "low": ("scryptAndAES256-CBC", {"iteration_count": 2 ** 12}),
+    "default": ("scryptAndAES256-CBC", {"iteration_count": 2 ** 14}),
+    "high": ("scryptAndAES256-CBC", {"iteration_count": 2 ** 16}),
+    "max": ("scryptAndAES256-CBC", {"iteration_count": 2 ** 18}),
+}
+
+# Profile matching the PyCryptodome defaults used by earlier versions
+DEFAULT_KDF_PROFILE = "default"
+
+# Object identifiers found in PKCS#8 encrypted keys
+_OID_PBES2 = "1.2.840.113549.1.5.13"
+_OID_PBKDF2 = "1.2.840.113549.1.5.12"
+_OID_SCRYPT = "1.3.6.1.4.1.11591.4.11"
+
+# Signature formats
+# - legacy: document re-serialized by PyPDF2, signature stored in metadata under `/Signature`
+# - incremental: signature appended as a PDF incremental update with a `/ByteRange` digest
+# - detached: the PDF is left untouched, the signature of its raw bytes goes to a sidecar file
+FORMAT_LEGACY = "legacy"
+FORMAT_INCREMENTAL = "incremental"
+FORMAT_DETACHED = "detached"
+FORMATS = (FORMAT_LEGACY, FORMAT_INCREMENTAL, FORMAT_DETACHED)
+
+# Detached signatures are stored next to the PDF in `<file name>.sig.json`
+SIDECAR_SUFFIX = ".sig.json"
+SIDECAR_VERSION = 1
+DETACHED_HASH_ALGORITHM = "SHA-256"
+
+# Trailer key pointing to the signature dictionary of the incremental format
+INCREMENTAL_SIGNATURE_KEY = "/Sig"
+INCREMENTAL_FILTER = "PdfSigningApp"
+INCREMENTAL_SUBFILTER = "rsa.sha256"
+
+# Default size of a single hash update when streaming data (1 MiB)
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Files at least this large are hashed through a memory map instead of read() calls
+MMAP_THRESHOLD = 64 * 1024 * 1024
+
+##
+# @brief Feeds a memoryview into a hash object in fixed-size slices.
+# @param h Hash object to update.
+# @param view Memoryview over the data.
+# @param chunk_size Size of a single update in bytes.
+def _update_from_view(h, view, chunk_size):
+    for offset in range(0, len(view), chunk_size):
+        h.update(view[offset:offset + chunk_size])
+
+##
+# @brief Feeds a file-like object into a hash object chunk by chunk.
+#
+# Uses a single reusable buffer with `readinto()` when the object supports it,
+# so memory use stays at one chunk regardless of the stream length.
+#
+# @param h Hash object to update.
+# @param f Binary file-like object opened for reading.
+# @param chunk_size Size of a single read in bytes.
+def _update_from_stream(h, f, chunk_size):
+    if hasattr(f, "readinto"):
+        buffer = bytearray(chunk_size)
+        view = memoryview(buffer)
+        while True:
+            n = f.readinto(buffer)
+            if not n:
+                break
+            h.update(view[:n])
+    else:
+        while True:
+            data = f.read(chunk_size)
+            if not data:
+                break
+            h.update(data)
+
+##
+# @brief Updates a hash object with the content of a file.
+#
+# Large files are mapped into memory and hashed without being copied
+# into Python objects; smaller files are read in chunks.
+#
+# @param h Hash object to update.
+# @param path Path to the file.
+# @param chunk_size Size of a single update in bytes.
+# @param use_mmap Whether the memory-mapped fast path may be used.
+def _update_from_file(h, path, chunk_size, use_mmap):
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if use_mmap and size >= MMAP_THRESHOLD:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                if hasattr(mm, "madvise") and hasattr(mmap, "MADV_SEQUENTIAL"):
+                    mm.madvise(mmap.MADV_SEQUENTIAL)
+                with memoryview(mm) as view:
+                    _update_from_view(h, view, chunk_size)
+        else:
+            _update_from_stream(h, f, chunk_size)
+
+##
+# @brief Updates an existing hash object with data using incremental updates.
+#
+# Accepted sources:
+# - path to a file (`str` or path-like),
+# - binary file-like object (read from its current position to the end),
+# - bytes-like object (`bytes`, `bytearray`, `memoryview`).
+#
+# Peak memory does not depend on the size of the data.
+#
+# @param h Hash object to update.
+# @param source Data to hash.
+# @param chunk_size Size of a single hash update in bytes.
+# @param use_mmap Whether files larger than `MMAP_THRESHOLD` may be memory-mapped.
+# @return The updated hash object.
+def update_stream_hash(h, source, chunk_size=HASH_CHUNK_SIZE, use_mmap=True):
+    if isinstance(source, (str, os.PathLike)):
+        _update_from_file(h, source, chunk_size, use_mmap)
+    elif isinstance(source, (bytes, bytearray, memoryview)):
+        with memoryview(source) as view:
+            _update_from_view(h, view.cast("B"), chunk_size)
+    else:
+        _update_from_stream(h, source, chunk_size)
+    return h
+
+##
+# @brief Creates a SHA-256 hash of data using incremental updates.
+#
+# See `update_stream_hash` for the accepted sources.
+#
+# @param source Data to hash.
+# @param chunk_size Size of a single hash update in bytes.
+# @param use_mmap Whether files larger than `MMAP_THRESHOLD` may be memory-mapped.
+# @return SHA-256 hash object of the data.
+def create_stream_hash(source, chunk_size=HASH_CHUNK_SIZE, use_mmap=True):
+    """Create SHA-256 hash of a file, file-like object or buffer."""
+    return update_stream_hash(SHA256.new(), source, chunk_size, use_mmap)
+
+##
+# @brief Creates a SHA-256 hash over selected byte ranges of a file.
+#
+# The ranges are hashed in the given order, which is how a PDF `/ByteRange`
+# signature digest is computed.
+#
+# @param path Path to the file.
+# @param byte_ranges Iterable of `(offset, length)` pairs.
+# @param chunk_size Size of a single read in bytes.
+# @return SHA-256 hash object of the concatenated ranges.
+# @throws ValueError If a range reaches past the end of the file.
+def create_file_range_hash(path, byte_ranges, chunk_size=HASH_CHUNK_SIZE):
+    h = SHA256.new()
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    with open(path, "rb") as f:
+        for offset, length in byte_ranges:
+            f.seek(offset)
+            remaining = length
+            while remaining > 0:
+                n = f.readinto(view[:min(chunk_size, remaining)])
+                if not n:
+                    raise ValueError("Byte range exceeds file size")
+                h.update(view[:n])
+                remaining -= n
+    return h
+
+##
+# @class HashingSink
+# @brief Write-only binary stream that feeds everything written to it into a hash.
+#
+# Can be passed to `PdfWriter.write()` to hash a serialized PDF without
+# keeping it in memory or writing it to disk. Optionally forwards the data
+# to another binary stream.
+class HashingSink:
+    ##
+    # @brief Creates a sink with a fresh SHA-256 hash.
+    # @param target Optional binary stream that receives a copy of the data.
+    def __init__(self, target=None):
+        self.hash = SHA256.new()
+        self.target = target
+        self.position = 0
+        self.mode = "wb"
+
+    ##
+    # @brief Hashes (and forwards) a block of data.
+    # @param data Bytes-like object.
+    # @return Number of bytes written.
+    def write(self, data):
+        self.hash.update(data)
+        if self.target is not None:
+            self.target.write(data)
+        n = len(data)
+        self.position += n
+        return n
+
+    ##
+    # @brief Returns the number of bytes written so far.
+    # @return Current stream position.
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        if self.target is not None:
+            self.target.flush()
+
 ##
 # @brief Creates a SHA-256 hash of the given PDF file.
+#
+# The file is streamed through the hash, it is never loaded into memory as a whole.
+#
 # @param pdf_path Path to the input PDF file.
+# @param chunk_size Size of a single hash update in bytes.
 # @return SHA-256 hash object of the file content.
-def create_pdf_hash(pdf_path):
+def create_pdf_hash(pdf_path, chunk_size=HASH_CHUNK_SIZE):
     """Create SHA-256 hash of a PDF file."""
-    with open(pdf_path, "rb") as f:
-        data = f.read()
-    h = SHA256.new(data)
-    return h
+    return create_stream_hash(pdf_path, chunk_size)
+
+##
+# @brief Encrypts a private RSA key with a passphrase using a key protection profile.
+#
+# @param key `RsaKey` object with the private key.
+# @param pwd Password used to encrypt the private key.
+# @param profile Name of a profile from `KDF_PROFILES`.
+# @return Encrypted private key in PKCS#8 PEM format (bytes).
+# @throws KeyError If the profile does not exist.
+def encrypt_private_key(key, pwd, profile=DEFAULT_KDF_PROFILE):
+    protection, prot_params = KDF_PROFILES[profile]
+    return key.export_key(
+        passphrase=pwd,
+        pkcs=8,
+        protection=protection,
+        prot_params=prot_params
+    )
 
 ##
 # @brief Generates a 4096-bit RSA key pair and saves it to the specified directory.
@@ -29,18 +257,15 @@ def create_pdf_hash(pdf_path):
 #
 # @param dir_path Directory path where the keys should be saved.
 # @param pwd Password used to encrypt the private key.
-def generate_key_pair(dir_path, pwd):
+# @param profile Name of the key protection profile (see `KDF_PROFILES`).
+def generate_key_pair(dir_path, pwd, profile=DEFAULT_KDF_PROFILE):
     start = time.time()
 
     key = RSA.generate(4096)
     print(f"RSA key generation time: {time.time() - start:.2f} seconds")
 
     start = time.time()
-    private_key_encrypted = key.export_key(
-        passphrase=pwd,
-        pkcs=8,
-        protection="scryptAndAES256-CBC"
-    )
+    private_key_encrypted = encrypt_private_key(key, pwd, profile)
     print(f"Private key encryption time (AES): {time.time() - start:.2f} seconds")
 
     public_key = key.publickey().export_key()
@@ -55,16 +280,165 @@ def generate_key_pair(dir_path, pwd):
         f.write(private_key_encrypted)
 
 ##
-# @brief Signs a hash using a private RSA key loaded from a PEM file.
+# @brief Reads the key derivation parameters stored in an encrypted private key.
+#
+# Works without the password: the parameters are part of the PKCS#8 header.
+#
+# @param private_key_pem Content of the PEM file (bytes or str).
+# @return Dictionary with `kdf` ("scrypt" or "pbkdf2"), `cost` (scrypt N or PBKDF2 iterations)
+#         and `profile` (name from `KDF_PROFILES` or "custom"),
+#         or None if the key is not an encrypted PKCS#8 key.
+def detect_kdf_profile(private_key_pem):
+    if isinstance(private_key_pem, bytes):
+        private_key_pem = private_key_pem.decode("ascii")
+
+    try:
+        der, marker, _ = PEM.decode(private_key_pem)
+    except ValueError:
+        return None
+    if marker != "ENCRYPTED PRIVATE KEY":
+        return None
+
+    algorithm = DerSequence().decode(DerSequence().decode(der)[0])
+    if DerObjectId().decode(algorithm[0]).value != _OID_PBES2:
+        return None
+
+    kdf = DerSequence().decode(DerSequence().decode(algorithm[1])[0])
+    kdf_oid = DerObjectId().decode(kdf[0]).value
+    kdf_params = DerSequence().decode(kdf[1])
+
+    if kdf_oid == _OID_SCRYPT:
+        name, protection = "scrypt", "scryptAndAES256-CBC"
+    elif kdf_oid == _OID_PBKDF2:
+        name, protection = "pbkdf2", "PBKDF2WithHMAC-SHA256AndAES256-CBC"
+    else:
+        return None
+    cost = kdf_params[1]
+
+    profile = "custom"
+    for profile_name, (profile_protection, prot_params) in KDF_PROFILES.items():
+        if profile_protection == protection and prot_params["iteration_count"] == cost:
+            profile = profile_name
+            break
+
+    return {"kdf": name, "cost": cost, "profile": profile}
+
+##
+# @brief Measures how long unlocking a key protected with a profile takes on this machine.
+#
+# Runs only the key derivation function, which dominates the unlock time.
+#
+# @param profile Name of a profile from `KDF_PROFILES`.
+# @param rounds Number of measurements; the fastest one is returned.
+# @return Unlock time in seconds.
+def measure_kdf_profile(profile, rounds=3):
+    protection, prot_params = KDF_PROFILES[profile]
+    salt = os.urandom(16)
+    best = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        if protection.startswith("scrypt"):
+            scrypt("password", salt, 32, prot_params["iteration_count"], 8, 1)
+        else:
+            PBKDF2("password", salt, 32, prot_params["iteration_count"], hmac_hash_module=SHA256)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+##
+# @brief Picks the strongest key protection profile that unlocks within a target latency.
+#
+# Strength is the declared order of `KDF_PROFILES`, not the measured time: a slow
+# PBKDF2 profile is not stronger than a faster, memory-hard scrypt one.
+#
+# @param target_seconds Maximum acceptable unlock time in seconds.
+# @param rounds Number of measurements per profile.
+# @return Tuple `(profile, timings)` where `profile` is the chosen profile name
+#         (the cheapest one if none fits) and `timings` maps every profile to its unlock time.
+def calibrate_kdf_profile(target_seconds, rounds=3):
+    timings = {name: measure_kdf_profile(name, rounds) for name in KDF_PROFILES}
+
+    fitting = [name for name, elapsed in timings.items() if elapsed <= target_seconds]
+    if fitting:
+        profile = max(fitting, key=list(KDF_PROFILES).index)
+    else:
+        profile = min(timings, key=timings.get)
+    return profile, timings
+
+##
+# @brief Loads and decrypts a private RSA key from a PEM file.
+#
+# Decryption runs the key derivation function the key was protected with,
+# which is the most expensive part of signing. Its parameters are read from the key file,
+# so keys protected with any profile from `KDF_PROFILES` are loaded the same way.
+# Keep the returned key to sign many hashes with a single unlock.
 #
 # @param pkey_path Path to the PEM-formatted private key file.
-# @param file_hash Hash object to be signed (e.g., SHA-256 hash).
 # @param pwd Password to decrypt the private key.
-# @return Hexadecimal string of the generated signature.
-def sign_hash_with_pkey(pkey_path, file_hash, pwd):
+# @return Decrypted `RsaKey` object.
+# @throws ValueError If the password is wrong or the file is not a valid key.
+def load_private_key(pkey_path, pwd):
     with open(pkey_path, "rb") as f:
         private_key_pem = f.read()
 
-    private_key = RSA.import_key(private_key_pem, passphrase=pwd)
+    return RSA.import_key(private_key_pem, passphrase=pwd)
+
+##
+# @brief Signs a hash using an already decrypted private RSA key.
+#
+# @param private_key Decrypted `RsaKey` object.
+# @param file_hash Hash object to be signed (e.g., SHA-256 hash).
+# @return Hexadecimal string of the generated signature.
+def sign_hash_with_key(private_key, file_hash):
     signature = pkcs1_15.new(private_key).sign(file_hash)
     return signature.hex()
+
+##
+# @brief Signs a hash using a private RSA key loaded from a PEM file.
+#
+# @param pkey_path Path to the PEM-formatted private key file.
+# @param file_hash Hash object to be signed (e.g., SHA-256 hash).
+# @param pwd Password to decrypt the private key.
+# @return Hexadecimal string of the generated signature.
+def sign_hash_with_pkey(pkey_path, file_hash, pwd):
+    private_key = load_private_key(pkey_path, pwd)
+    return sign_hash_with_key(private_key, file_hash)
+
+##
+# @brief Computes the fingerprint of an RSA key pair.
+#
+# Same definition as in KeyGenerationApp, so fingerprints match its key manifest.
+#
+# @param key `RsaKey` object (public or private).
+# @return Hex SHA-256 digest of the DER-encoded public key.
+def public_key_fingerprint(key):
+    return SHA256.new(key.publickey().export_key(format="DER")).hexdigest()
+
+##
+# @brief Returns the path of the detached signature file of a PDF.
+# @param pdf_path Path to the PDF file.
+# @return Path of the sidecar file.
+def sidecar_path(pdf_path):
+    return f"{pdf_path}{SIDECAR_SUFFIX}"
+
+##
+# @brief Expands a directory or a list of paths into a list of PDF files.
+#
+# @param source Path to a directory, path to a single PDF file, or an iterable of paths.
+# @param recursive Whether subdirectories of a directory should be searched too.
+# @return Sorted list of PDF file paths (for a directory) or the given paths in order.
+def collect_pdf_files(source, recursive=False):
+    if isinstance(source, (str, os.PathLike)):
+        if not os.path.isdir(source):
+            return [source]
+
+        pdf_files = []
+        for root, dirs, files in os.walk(source):
+            for file in files:
+                if file.lower().endswith(".pdf"):
+                    pdf_files.append(os.path.join(root, file))
+            if not recursive:
+                break
+        return sorted(pdf_files)
+
+    return list(source)
@@ -2,40 +2,79 @@
 # @file verify.py
 # @brief Provides functionality to verify a digitally signed PDF using RSA and SHA-256.
 #
-# This module extracts the digital signature from a PDF's metadata,
-# reconstructs a clean copy without the signature, generates its hash,
+# This module extracts the digital signature from a PDF's metadata
+# (or from an incremental update appended to the file, or from a detached sidecar file),
+# reconstructs the signed data, generates its hash,
 # and validates the signature using a provided RSA public key.
 
-from Cryptodome.PublicKey import RSA
-from Cryptodome.Signature import pkcs1_15
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from PyPDF2 import PdfReader, PdfWriter
+import key_cache
+import tracing
+import triage
 import utils
+import verify_cache
+import json
 import os
 
+# Verification statuses reported in `VerificationResult.status`
+VALID = "valid"
+INVALID = "invalid"
+UNSIGNED = "unsigned"
+ERROR = "error"
+
 ##
-# @brief Verifies the digital signature of a PDF file.
-#
-# This function reads the embedded signature from the metadata (under `/Signature` key),
-# removes the signature from the metadata to obtain a clean version of the PDF,
-# creates a SHA-256 hash of this clean copy, and then verifies the hash against
-# the stored signature using the provided RSA public key.
+# @class VerificationResult
+# @brief Outcome of verifying a single PDF file.
 #
-# @param pdf_path Path to the signed PDF file.
-# @param public_key_path Path to the public key file (PEM format).
-# @return True if the signature is valid and the PDF was not modified; False otherwise.
-def verify_pdf(pdf_path, public_key_path):
-    base, ext = os.path.splitext(pdf_path)
-    temp_pdf_path = f"{base}_temp{ext}"
+# Instances are plain data and can be passed between processes.
+class VerificationResult:
+    ##
+    # @brief Creates a verification result.
+    # @param pdf_path Path to the verified PDF file.
+    # @param status One of `VALID`, `INVALID`, `UNSIGNED`, `ERROR`.
+    # @param message Human readable description of the outcome.
+    def __init__(self, pdf_path, status, message=""):
+        self.pdf_path = pdf_path
+        self.status = status
+        self.message = message
+
+    ##
+    # @brief Tells whether the signature was found and is valid.
+    # @return True for status `VALID`.
+    def is_valid(self):
+        return self.status == VALID
+
+    ##
+    # @brief Returns the result as a dictionary (e.g. for JSON output).
+    # @return Dictionary with `pdf_path`, `status` and `message` keys.
+    def to_dict(self):
+        return {"pdf_path": self.pdf_path, "status": self.status, "message": self.message}
+
+    def __repr__(self):
+        return f"VerificationResult({self.pdf_path!r}, {self.status!r}, {self.message!r})"
 
-    reader = PdfReader(pdf_path)
+##
+# @brief Raised when an incremental signature does not cover the whole file.
+class SignatureCoverageError(Exception):
+    pass
+
+##
+# @brief Reads a legacy signature and hashes the document it was created for.
+#
+# Removes the `/Signature` key from the metadata to obtain a clean version of the PDF
+# and serializes this clean copy directly into a SHA-256 hash.
+#
+# @param reader `PdfReader` of the signed PDF file.
+# @param pdf_path Path to the signed PDF file (identifies the tracing spans).
+# @return Tuple `(hash, signature_bytes)` or None if the file has no legacy signature.
+def _read_legacy_signature(reader, pdf_path=None):
     metadata = reader.metadata
 
-    try:
-        stored_signature = metadata.pop("/Signature")
-    except KeyError:
-        print("No signature in given file")
-        return False
+    if metadata is None or "/Signature" not in metadata:
+        return None
 
+    stored_signature = metadata.pop("/Signature")
     signature_bytes = bytes.fromhex(stored_signature)
 
     # Create a clean version of the PDF without the signature
@@ -45,20 +84,267 @@ def verify_pdf(pdf_path, public_key_path):
 
     writer.add_metadata(metadata)
 
-    with open(temp_pdf_path, "wb") as f:
-        writer.write(f)
+    # Serialize the clean copy straight into the hash, nothing is written to disk
+    with tracing.span(tracing.SPAN_HASH, pdf_path) as span:
+        sink = utils.HashingSink()
+        writer.write(sink)
+        span.bytes = sink.tell()
+    return sink.hash, signature_bytes
+
+##
+# @brief Reads an incremental update signature and hashes its byte ranges.
+#
+# The `/ByteRange` must start at the beginning of the file and end at its end,
+# so that no data can be appended after the signature.
+#
+# @param pdf_path Path to the signed PDF file.
+# @param f The same file opened in binary mode.
+# @param reader `PdfReader` created from `f`.
+# @return Tuple `(hash, signature_bytes)`.
+# @throws SignatureCoverageError If the byte ranges do not cover the whole file.
+def _read_incremental_signature(pdf_path, f, reader):
+    signature_dict = reader.trailer[utils.INCREMENTAL_SIGNATURE_KEY].get_object()
+    byte_range = [int(value) for value in signature_dict["/ByteRange"]]
+    file_size = os.fstat(f.fileno()).st_size
+
+    if (len(byte_range) != 4 or byte_range[0] != 0 or byte_range[1] >= byte_range[2]
+            or byte_range[2] + byte_range[3] != file_size):
+        raise SignatureCoverageError("Signature does not cover the whole file!")
 
-    new_hash = utils.create_pdf_hash(temp_pdf_path)
-    os.remove(temp_pdf_path)
+    # `/Contents` is read from the gap between the ranges, exactly as it is stored
+    f.seek(byte_range[1])
+    contents = f.read(byte_range[2] - byte_range[1])
+    if contents[:1] != b"<" or contents[-1:] != b">":
+        raise SignatureCoverageError("Signature does not cover the whole file!")
+    signature_bytes = bytes.fromhex(contents[1:-1].decode("ascii"))
 
-    with open(public_key_path, "rb") as f:
-        public_key_data = f.read()
+    with tracing.span(tracing.SPAN_HASH, pdf_path, byte_range[1] + byte_range[3]):
+        new_hash = utils.create_file_range_hash(
+            pdf_path,
+            [(byte_range[0], byte_range[1]), (byte_range[2], byte_range[3])]
+        )
+    return new_hash, signature_bytes
 
+##
+# @brief Checks a detached signature stored in a sidecar file.
+#
+# The signer key fingerprint recorded at signing time must match the given public key,
+# then the size and digest of the PDF are compared with the recorded ones
+# before the RSA signature over the digest is verified.
+#
+# @param result_path Path reported in the result.
+# @param pdf_path Path to the PDF file.
+# @param sidecar_file Path to the sidecar file (see `utils.sidecar_path`).
+# @param public_key_path Path to the public key file (PEM format).
+# @return `VerificationResult` describing the outcome.
+def _check_detached_signature(result_path, pdf_path, sidecar_file, public_key_path):
     try:
-        public_key = RSA.import_key(public_key_data)
-        pkcs1_15.new(public_key).verify(new_hash, signature_bytes)
-        print("Signature is valid! File not modified! ✅")
-        return True
+        with open(sidecar_file, "r", encoding="utf-8") as f:
+            sidecar = json.load(f)
+        if sidecar.get("hash_algorithm") != utils.DETACHED_HASH_ALGORITHM:
+            return VerificationResult(result_path, ERROR,
+                                      f"Unsupported hash algorithm: {sidecar.get('hash_algorithm')}")
+        signature_bytes = bytes.fromhex(sidecar["signature"])
+
+        with tracing.span(tracing.SPAN_KEY_LOAD, public_key_path):
+            verifier = key_cache.get_verifier(public_key_path)
+            key_fingerprint = key_cache.get_key_fingerprint(public_key_path)
+        if sidecar.get("key_fingerprint") != key_fingerprint:
+            return VerificationResult(result_path, INVALID, "Signed with a different key!")
+
+        with open(pdf_path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size != sidecar["size"]:
+                return VerificationResult(result_path, INVALID, "Invalid signature! File was modified!")
+            with tracing.span(tracing.SPAN_HASH, pdf_path, size):
+                new_hash = utils.create_stream_hash(f)
+        if new_hash.hexdigest() != sidecar["digest"]:
+            return VerificationResult(result_path, INVALID, "Invalid signature! File was modified!")
+    except Exception as e:
+        return VerificationResult(result_path, ERROR, str(e))
+
+    try:
+        with tracing.span(tracing.SPAN_RSA, pdf_path):
+            verifier.verify(new_hash, signature_bytes)
+        return VerificationResult(result_path, VALID, "Signature is valid! File not modified!")
     except ValueError:
-        print("Invalid signature! File was modified! ❌")
-        return False
+        return VerificationResult(result_path, INVALID, "Invalid signature! File was modified!")
+
+##
+# @brief Result for a PDF without an embedded signature: checks its sidecar file if there is one.
+def _check_unsigned(pdf_path, public_key_path):
+    sidecar_file = utils.sidecar_path(pdf_path)
+    if os.path.isfile(sidecar_file):
+        return _check_detached_signature(pdf_path, pdf_path, sidecar_file, public_key_path)
+    return VerificationResult(pdf_path, UNSIGNED, "No signature in given file")
+
+##
+# @brief Checks the digital signature of a PDF file without printing anything.
+#
+# All signature formats are recognized:
+# - legacy: signature stored in the metadata under `/Signature`, the document
+#   is re-serialized without it and hashed,
+# - incremental: signature appended as an incremental update, the file
+#   is hashed over the `/ByteRange` of the signature dictionary,
+# - detached: signature stored in a sidecar file, the raw PDF bytes are hashed;
+#   either the sidecar file or the PDF (when it has no embedded signature) may be given.
+# The hash is then verified against the stored signature using the provided RSA public key.
+#
+# With `prefilter` the file is classified by `triage.triage_pdf` first and a file triage
+# finds unsigned is reported without a full parse. This is much faster for folders of mostly
+# unsigned files, but the verdict relies on the fast scan, so it is opt-in.
+#
+# @param pdf_path Path to the signed PDF file or to its sidecar file.
+# @param public_key_path Path to the public key file (PEM format).
+# @param prefilter Whether to trust an unsigned verdict of `triage.triage_pdf`.
+# @return `VerificationResult` describing the outcome.
+def check_pdf_signature(pdf_path, public_key_path, prefilter=False):
+    # Also accepts `pathlib.Path` objects, like earlier versions
+    pdf_path = os.fspath(pdf_path)
+    if pdf_path.endswith(utils.SIDECAR_SUFFIX):
+        return _check_detached_signature(pdf_path, pdf_path[:-len(utils.SIDECAR_SUFFIX)], pdf_path,
+                                         public_key_path)
+
+    try:
+        # Any other triage result, including malformed, gets the full parse
+        if prefilter and triage.triage_pdf(pdf_path) == triage.UNSIGNED:
+            return _check_unsigned(pdf_path, public_key_path)
+
+        # Reading from an open file avoids loading the whole PDF into memory
+        with open(pdf_path, "rb") as f:
+            with tracing.span(tracing.SPAN_PARSE, pdf_path, os.fstat(f.fileno()).st_size):
+                reader = PdfReader(f)
+                incremental = utils.INCREMENTAL_SIGNATURE_KEY in reader.trailer
+            if incremental:
+                signed = _read_incremental_signature(pdf_path, f, reader)
+            else:
+                signed = _read_legacy_signature(reader, pdf_path)
+
+        if signed is None:
+            return _check_unsigned(pdf_path, public_key_path)
+
+        new_hash, signature_bytes = signed
+
+        # Parsed public keys are reused between verifications
+        with tracing.span(tracing.SPAN_KEY_LOAD, public_key_path):
+            verifier = key_cache.get_verifier(public_key_path)
+    except SignatureCoverageError as e:
+        return VerificationResult(pdf_path, INVALID, str(e))
+    except Exception as e:
+        return VerificationResult(pdf_path, ERROR, str(e))
+
+    try:
+        with tracing.span(tracing.SPAN_RSA, pdf_path):
+            verifier.verify(new_hash, signature_bytes)
+        return VerificationResult(pdf_path, VALID, "Signature is valid! File not modified!")
+    except ValueError:
+        return VerificationResult(pdf_path, INVALID, "Invalid signature! File was modified!")
+
+##
+# @brief Checks the digital signature of a PDF file, reusing a cached verdict when possible.
+#
+# The raw file is hashed with `verify_cache.file_digest`; if the cache holds a verdict
+# for the same content and public key, it is returned without parsing the PDF.
+# Otherwise `check_pdf_signature` runs and its verdict is stored, unless the file
+# changed while it was being verified or the verdict is an unsigned one that may come
+# from the prefilter. When the cache cannot be used (e.g. the database is locked for
+# too long) the file is verified without it. Detached signatures are always verified
+# directly, since the verdict depends on the sidecar file as well.
+#
+# @param pdf_path Path to the signed PDF file.
+# @param public_key_path Path to the public key file (PEM format).
+# @param cache_path Path to the SQLite database of the cache.
+# @param trust_mtime Whether an unchanged path, size and mtime is enough to reuse a verdict.
+# @param prefilter See `check_pdf_signature`.
+# @return `VerificationResult` describing the outcome.
+def check_pdf_signature_cached(pdf_path, public_key_path, cache_path, trust_mtime=False, prefilter=False):
+    pdf_path = os.fspath(pdf_path)
+    if pdf_path.endswith(utils.SIDECAR_SUFFIX) or os.path.exists(utils.sidecar_path(pdf_path)):
+        return check_pdf_signature(pdf_path, public_key_path, prefilter)
+
+    try:
+        cache = verify_cache.get_cache(cache_path, trust_mtime)
+        fingerprint = key_cache.default_cache.get_fingerprint(public_key_path)
+
+        cached = cache.lookup_stat(pdf_path, os.stat(pdf_path), fingerprint)
+        if cached is None:
+            with open(pdf_path, "rb") as f:
+                stat = os.fstat(f.fileno())
+                digest = verify_cache.file_digest(f)
+            cached = cache.lookup(digest, stat.st_size, fingerprint)
+        if cached is not None:
+            return VerificationResult(pdf_path, *cached)
+    except Exception:
+        return check_pdf_signature(pdf_path, public_key_path, prefilter)
+
+    result = check_pdf_signature(pdf_path, public_key_path, prefilter)
+    if prefilter and result.status == UNSIGNED:
+        # May come from the fast scan only; later calls without the prefilter must not reuse it
+        return result
+    try:
+        after = os.stat(pdf_path)
+        if (after.st_size, after.st_mtime_ns) == (stat.st_size, stat.st_mtime_ns):
+            cache.store(pdf_path, stat, digest, fingerprint, result.status, result.message)
+    except Exception:
+        pass
+    return result
+
+##
+# @brief Verifies the digital signature of a PDF file.
+#
+# Runs `check_pdf_signature` and prints the outcome.
+#
+# @param pdf_path Path to the signed PDF file or to its detached signature sidecar file.
+# @param public_key_path Path to the public key file (PEM format).
+# @return True if the signature is valid and the PDF was not modified; False otherwise.
+def verify_pdf(pdf_path, public_key_path):
+    result = check_pdf_signature(pdf_path, public_key_path)
+
+    if result.status == VALID:
+        print("Signature is valid! File not modified! ✅")
+    elif result.status == INVALID:
+        print(f"{result.message} ❌")
+    elif result.status == UNSIGNED:
+        print("No signature in given file")
+    else:
+        print(f"Error: Could not verify {pdf_path}: {result.message}")
+
+    return result.is_valid()
+
+##
+# @brief Verifies many PDF files in parallel worker processes.
+#
+# Each file is verified with `check_pdf_signature` in a `ProcessPoolExecutor`,
+# so parsing, hashing and RSA verification use all available cores.
+#
+# @param source Directory with PDF files or a list of PDF file paths.
+# @param public_key_path Path to the public key file (PEM format).
+# @param max_workers Number of worker processes (None = number of CPUs).
+# @param ordered If True results are yielded in input order,
+#                otherwise as soon as each file is verified.
+# @param recursive Whether subdirectories of a directory should be verified too.
+# @param cache_path Path to a `verify_cache` database; None = verify every file.
+# @param trust_mtime See `check_pdf_signature_cached`.
+# @param prefilter Whether unsigned files are recognized by `triage.triage_pdf` (see `check_pdf_signature`).
+# @return Generator of `VerificationResult` objects, one per file.
+def verify_pdfs(source, public_key_path, max_workers=None, ordered=True, recursive=False,
+                cache_path=None, trust_mtime=False, prefilter=False):
+    """Verifies a list or a directory of PDF files using a process pool."""
+    pdf_paths = utils.collect_pdf_files(source, recursive)
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        if cache_path is None:
+            futures = {executor.submit(check_pdf_signature, pdf_path, public_key_path, prefilter): pdf_path
+                       for pdf_path in pdf_paths}
+        else:
+            futures = {executor.submit(check_pdf_signature_cached, pdf_path, public_key_path,
+                                       cache_path, trust_mtime, prefilter): pdf_path
+                       for pdf_path in pdf_paths}
+        done = futures if ordered else as_completed(futures)
+
+        for future in done:
+            try:
+                yield future.result()
+            except Exception as e:
+                # Worker process died (e.g. killed by the OS)
+                yield VerificationResult(futures[future], ERROR, str(e))
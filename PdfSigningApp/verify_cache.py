@@ -0,0 +1,201 @@
+##
+# @file verify_cache.py
+# @brief Persistent cache of signature verification verdicts.
+#
+# Verifying a signature means parsing, re-serializing and hashing the whole PDF.
+# Hashing the raw file with BLAKE2b is several times cheaper, so the verdict of an
+# unchanged file can be looked up instead of recomputed. Entries live in an SQLite
+# database and are keyed by:
+# - the BLAKE2b digest and size of the raw file,
+# - the fingerprint of the public key file (`key_cache.get_fingerprint`).
+# Path and modification time are stored too; with `trust_mtime` a file whose path,
+# size and mtime match an entry is not read at all (faster, but a file modified
+# with a forged mtime would keep its old verdict).
+#
+# Only definite verdicts (valid, invalid, unsigned) are cached, errors are not.
+# Eviction: entries not used for `max_age` seconds are removed, and the least recently
+# used entries are removed once there are more than `max_entries` of them.
+# The database can be shared by several processes (WAL mode with a busy timeout).
+
+import hashlib
+import os
+import sqlite3
+import time
+import utils
+
+# Default limits of the cache
+DEFAULT_MAX_ENTRIES = 1_000_000
+DEFAULT_MAX_AGE = 90 * 24 * 3600
+
+# Eviction runs after this many stored verdicts (and when the cache is opened)
+PRUNE_INTERVAL = 1000
+
+# `last_used` of a hit is only rewritten when older than this (s), so reads rarely write
+LAST_USED_RESOLUTION = 24 * 3600
+
+# Verdicts that may be cached
+CACHEABLE_STATUSES = ("valid", "invalid", "unsigned")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS verdicts (
+    digest TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    fingerprint TEXT NOT NULL,
+    path TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    message TEXT NOT NULL,
+    verified_at REAL NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (digest, size, fingerprint)
+);
+CREATE INDEX IF NOT EXISTS verdicts_path ON verdicts (path, fingerprint);
+CREATE INDEX IF NOT EXISTS verdicts_last_used ON verdicts (last_used);
+"""
+
+##
+# @brief Computes the fast content digest of an open file.
+# @param f File opened in binary mode, positioned at its start.
+# @return Hex BLAKE2b-256 digest of the file content.
+def file_digest(f):
+    return utils.update_stream_hash(hashlib.blake2b(digest_size=32), f).hexdigest()
+
+##
+# @class VerificationCache
+# @brief SQLite-backed map from (file content, public key) to a verification verdict.
+class VerificationCache:
+    ##
+    # @brief Opens (or creates) the cache database.
+    # @param db_path Path to the SQLite database file.
+    # @param max_entries Maximum number of cached verdicts.
+    # @param max_age Entries unused for this many seconds are removed (None = never).
+    # @param trust_mtime Whether an unchanged path, size and mtime is enough to reuse a verdict.
+    def __init__(self, db_path, max_entries=DEFAULT_MAX_ENTRIES, max_age=DEFAULT_MAX_AGE, trust_mtime=False):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.trust_mtime = trust_mtime
+        self.stored = 0
+
+        self.db = sqlite3.connect(db_path, timeout=30)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(_SCHEMA)
+        self.prune()
+
+    ##
+    # @brief Looks up the verdict for a file by its path and modification time only.
+    #
+    # Used only when `trust_mtime` is enabled.
+    #
+    # @param pdf_path Path to the PDF file.
+    # @param stat `os.stat_result` of the file.
+    # @param fingerprint Public key fingerprint.
+    # @return Tuple `(status, message)` or None.
+    def lookup_stat(self, pdf_path, stat, fingerprint):
+        if not self.trust_mtime:
+            return None
+        row = self.db.execute(
+            "SELECT digest, size, status, message, last_used FROM verdicts"
+            " WHERE path = ? AND fingerprint = ? AND size = ? AND mtime_ns = ?",
+            (os.path.abspath(pdf_path), fingerprint, stat.st_size, stat.st_mtime_ns)).fetchone()
+        if row is None:
+            return None
+        self._touch(row[0], row[1], fingerprint, row[4])
+        return row[2], row[3]
+
+    ##
+    # @brief Looks up the verdict for a file content.
+    # @param digest Digest from `file_digest`.
+    # @param size Size of the file in bytes.
+    # @param fingerprint Public key fingerprint.
+    # @return Tuple `(status, message)` or None.
+    def lookup(self, digest, size, fingerprint):
+        row = self.db.execute(
+            "SELECT status, message, last_used FROM verdicts WHERE digest = ? AND size = ? AND fingerprint = ?",
+            (digest, size, fingerprint)).fetchone()
+        if row is None:
+            return None
+        self._touch(digest, size, fingerprint, row[2])
+        return row[0], row[1]
+
+    ##
+    # @brief Stores a verdict.
+    # @param pdf_path Path to the PDF file.
+    # @param stat `os.stat_result` of the file taken when the digest was computed.
+    # @param digest Digest from `file_digest`.
+    # @param fingerprint Public key fingerprint.
+    # @param status Verification status; statuses outside `CACHEABLE_STATUSES` are ignored.
+    # @param message Verification message.
+    def store(self, pdf_path, stat, digest, fingerprint, status, message):
+        if status not in CACHEABLE_STATUSES:
+            return
+        now = time.time()
+        with self.db:
+            self.db.execute(
+                "INSERT OR REPLACE INTO verdicts VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (digest, stat.st_size, fingerprint, os.path.abspath(pdf_path), stat.st_mtime_ns,
+                 status, message, now, now))
+
+        self.stored += 1
+        if self.stored % PRUNE_INTERVAL == 0:
+            self.prune()
+
+    ##
+    # @brief Applies the eviction policy.
+    # @return Number of removed entries.
+    def prune(self):
+        with self.db:
+            removed = 0
+            if self.max_age is not None:
+                removed += self.db.execute("DELETE FROM verdicts WHERE last_used < ?",
+                                           (time.time() - self.max_age,)).rowcount
+            excess = self.db.execute("SELECT COUNT(*) FROM verdicts").fetchone()[0] - self.max_entries
+            if excess > 0:
+                removed += self.db.execute(
+                    "DELETE FROM verdicts WHERE rowid IN"
+                    " (SELECT rowid FROM verdicts ORDER BY last_used LIMIT ?)", (excess,)).rowcount
+        return removed
+
+    ##
+    # @brief Removes all entries.
+    def clear(self):
+        with self.db:
+            self.db.execute("DELETE FROM verdicts")
+
+    ##
+    # @brief Returns the number of cached verdicts.
+    # @return Number of entries.
+    def __len__(self):
+        return self.db.execute("SELECT COUNT(*) FROM verdicts").fetchone()[0]
+
+    ##
+    # @brief Closes the database connection.
+    def close(self):
+        self.db.close()
+
+    ##
+    # @brief Refreshes `last_used` of an entry if it is older than `LAST_USED_RESOLUTION`.
+    def _touch(self, digest, size, fingerprint, last_used):
+        now = time.time()
+        if now - last_used < LAST_USED_RESOLUTION:
+            return
+        with self.db:
+            self.db.execute("UPDATE verdicts SET last_used = ? WHERE digest = ? AND size = ? AND fingerprint = ?",
+                            (now, digest, size, fingerprint))
+
+
+# Caches opened in this process: (db_path, trust_mtime) -> VerificationCache
+_open_caches = {}
+
+##
+# @brief Returns a cache opened once per process (used by verification worker processes).
+# @param db_path Path to the SQLite database file.
+# @param trust_mtime See `VerificationCache`.
+# @return `VerificationCache` instance.
+def get_cache(db_path, trust_mtime=False):
+    key = (os.path.abspath(db_path), trust_mtime)
+    cache = _open_caches.get(key)
+    if cache is None:
+        cache = _open_caches[key] = VerificationCache(db_path, trust_mtime=trust_mtime)
+    return cache
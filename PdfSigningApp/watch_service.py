@@ -0,0 +1,295 @@
+##
+# @file watch_service.py
+# @brief Long-running service that signs PDF files dropped into an inbox directory.
+#
+# The private key is unlocked once at startup and handed to the worker processes
+# (see `signing_worker`), so every worker holds a ready `RsaKey`.
+#
+# Flow of a file:
+# 1. it appears in the inbox and is picked up only after its size and modification time
+#    stayed the same for `stable_time` seconds (the writer has finished),
+# 2. it is moved into `<inbox>/.processing` (an atomic rename claims it),
+# 3. a worker signs it; the signed copy is moved to the outbox and the original is
+#    moved to the archive directory, or deleted when no archive is configured
+#    (with the detached format the original is moved to the outbox next to its sidecar file),
+# 4. if signing or moving the results fails, the original is moved to the quarantine
+#    directory together with a `<name>.error.txt` file describing the failure.
+#
+# The outbox, archive and quarantine may be on another file system or a network share;
+# files are then copied under a hidden `.partial` name and renamed once complete.
+#
+# At most `max_pending` files are claimed at a time. When the workers fall behind,
+# new files simply stay in the inbox until there is room (backpressure).
+# Originals left in `.processing` by an interrupted run are returned to the inbox on start,
+# partial results of that run are deleted.
+
+import os
+import shutil
+import time
+import signing_worker
+import utils
+
+# Name of the directory (inside the inbox) holding files being signed
+PROCESSING_DIR = ".processing"
+
+# Default timing of the service (s)
+DEFAULT_POLL_INTERVAL = 1.0
+DEFAULT_STABLE_TIME = 2.0
+
+##
+# @brief Returns a path in a directory that does not exist yet.
+# @param directory Target directory.
+# @param name Desired file name; a counter is added before the extension if it is taken.
+# @return Free path.
+def _free_path(directory, name):
+    path = os.path.join(directory, name)
+    base, ext = os.path.splitext(name)
+    counter = 1
+    while os.path.exists(path):
+        path = os.path.join(directory, f"{base} ({counter}){ext}")
+        counter += 1
+    return path
+
+##
+# @brief Moves a file, also across file systems and network shares.
+#
+# Within one file system the file is renamed atomically. Otherwise it is copied under
+# a hidden `.<name>.partial` name next to the target first, so the target name
+# only appears once the copy is complete.
+#
+# @param path File to move.
+# @param target Destination path (must not exist).
+def _move(path, target):
+    try:
+        os.replace(path, target)
+    except OSError:
+        partial = os.path.join(os.path.dirname(target), f".{os.path.basename(target)}.partial")
+        try:
+            shutil.move(path, partial)
+            os.replace(partial, target)
+        except BaseException:
+            # Never lose the file: drop an incomplete copy, or put back a complete one
+            if os.path.exists(partial):
+                if os.path.exists(path):
+                    os.remove(partial)
+                else:
+                    shutil.move(partial, path)
+            raise
+
+##
+# @class SigningService
+# @brief Watch-folder signing service.
+#
+# Usage:
+#   service = SigningService("inbox", "outbox", "quarantine", utils.load_private_key(key, pwd))
+#   service.run()                 # until interrupted or `stop()`
+class SigningService:
+    ##
+    # @param inbox Directory watched for new PDF files.
+    # @param outbox Directory receiving signed files.
+    # @param quarantine Directory receiving files that could not be signed.
+    # @param private_key Unlocked `RsaKey` object.
+    # @param signature_format One of `utils.FORMATS`.
+    # @param archive Directory receiving the originals of signed files (None = delete them).
+    # @param max_workers Number of worker processes (None = number of CPUs).
+    # @param max_pending Maximum number of files claimed at once (None = twice the workers).
+    # @param poll_interval Time between two scans of the inbox in seconds.
+    # @param stable_time Time a file must stay unchanged before it is picked up, in seconds.
+    def __init__(self, inbox, outbox, quarantine, private_key, signature_format=utils.FORMAT_LEGACY,
+                 archive=None, max_workers=None, max_pending=None,
+                 poll_interval=DEFAULT_POLL_INTERVAL, stable_time=DEFAULT_STABLE_TIME):
+        self.inbox = inbox
+        self.outbox = outbox
+        self.quarantine = quarantine
+        self.archive = archive
+        self.processing = os.path.join(inbox, PROCESSING_DIR)
+        self.signature_format = signature_format
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_pending = max_pending or 2 * self.max_workers
+        self.poll_interval = poll_interval
+        self.stable_time = stable_time
+
+        self.private_key = private_key
+        self.executor = None
+
+        # Claimed path -> future
+        self.pending = {}
+
+        # Inbox path -> (size, mtime_ns, time since when the file has been unchanged)
+        self.candidates = {}
+
+        self.stopped = False
+        self.signed = 0
+        self.failed = 0
+
+    ##
+    # @brief Runs the service until `stop()` is called or the process is interrupted.
+    def run(self):
+        self.start()
+        try:
+            while not self.stopped:
+                self.poll_once()
+                time.sleep(self.poll_interval)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.shutdown()
+
+    ##
+    # @brief Creates the directories, recovers interrupted files and starts the workers.
+    def start(self):
+        for directory in (self.inbox, self.outbox, self.quarantine, self.processing, self.archive):
+            if directory is not None:
+                os.makedirs(directory, exist_ok=True)
+
+        self._recover()
+        self.executor = signing_worker.create_executor(self.private_key, self.max_workers)
+
+    ##
+    # @brief Returns files left in the processing directory by an interrupted run to the inbox.
+    #
+    # Only the claimed originals go back. Outputs of the interrupted signing
+    # (`<name>_signed.pdf` next to its original, sidecar files) may be incomplete and are deleted;
+    # the originals are signed again.
+    def _recover(self):
+        names = set(os.listdir(self.processing))
+        for name in sorted(names):
+            path = os.path.join(self.processing, name)
+            base, ext = os.path.splitext(name)
+            if name.endswith(utils.SIDECAR_SUFFIX) or (base.endswith("_signed") and
+                                                       base[:-len("_signed")] + ext in names):
+                os.remove(path)
+            else:
+                os.replace(path, _free_path(self.inbox, name))
+
+    ##
+    # @brief Asks `run()` to finish after the current iteration.
+    def stop(self):
+        self.stopped = True
+
+    ##
+    # @brief Waits for claimed files and stops the workers.
+    def shutdown(self):
+        if self.executor is None:
+            return
+        self.executor.shutdown(wait=True)
+        self.collect()
+        self.executor = None
+
+    ##
+    # @brief One iteration: handles finished files and claims stable new ones.
+    # @return Number of files submitted for signing.
+    def poll_once(self):
+        self.collect()
+
+        submitted = 0
+        for path in self.find_stable_files():
+            if len(self.pending) >= self.max_pending:
+                # Backpressure: the rest stays in the inbox until workers catch up
+                break
+            claimed = _free_path(self.processing, os.path.basename(path))
+            try:
+                os.replace(path, claimed)
+            except OSError:
+                # Removed or locked by another process in the meantime
+                continue
+            self.candidates.pop(path, None)
+            self.pending[claimed] = self.executor.submit(signing_worker.sign_file, claimed,
+                                                         self.signature_format)
+            submitted += 1
+        return submitted
+
+    ##
+    # @brief Returns inbox files that have not changed for `stable_time` seconds.
+    # @return List of paths, oldest candidates first.
+    def find_stable_files(self):
+        now = time.monotonic()
+        seen = {}
+        try:
+            with os.scandir(self.inbox) as entries:
+                for entry in entries:
+                    if not entry.name.lower().endswith(".pdf") or not entry.is_file():
+                        continue
+                    stat = entry.stat()
+                    previous = self.candidates.get(entry.path)
+                    if previous is not None and previous[:2] == (stat.st_size, stat.st_mtime_ns):
+                        seen[entry.path] = previous
+                    else:
+                        seen[entry.path] = (stat.st_size, stat.st_mtime_ns, now)
+        except OSError as e:
+            print(f"Error: Could not scan inbox {self.inbox}: {e}")
+            return []
+
+        # Forget files that disappeared from the inbox
+        self.candidates = seen
+        return [path for path, (_, _, since) in sorted(seen.items(), key=lambda item: item[1][2])
+                if now - since >= self.stable_time]
+
+    ##
+    # @brief Moves the results of finished files to the outbox, archive or quarantine.
+    def collect(self):
+        for claimed, future in list(self.pending.items()):
+            if not future.done():
+                continue
+            del self.pending[claimed]
+            try:
+                self._deliver(claimed, future.result())
+            except Exception as e:
+                self._quarantine(claimed, e)
+                continue
+            self.signed += 1
+            print(f"Signed {os.path.basename(claimed)}")
+
+    ##
+    # @brief Moves a signed file to the outbox and the original to the archive.
+    #
+    # If a move fails, results already delivered to the outbox are removed again,
+    # so the file ends up either fully delivered or (by the caller) in quarantine.
+    #
+    # @param claimed Path of the original in the processing directory.
+    # @param signed_path Path of the signed file (or sidecar file) in the processing directory.
+    def _deliver(self, claimed, signed_path):
+        delivered = []
+        try:
+            if self.signature_format == utils.FORMAT_DETACHED:
+                # The sidecar name must follow the (possibly renamed) PDF
+                target = _free_path(self.outbox, os.path.basename(claimed))
+                _move(signed_path, utils.sidecar_path(target))
+                delivered.append(utils.sidecar_path(target))
+                _move(claimed, target)
+            else:
+                target = _free_path(self.outbox, os.path.basename(signed_path))
+                _move(signed_path, target)
+                delivered.append(target)
+                if self.archive is not None:
+                    _move(claimed, _free_path(self.archive, os.path.basename(claimed)))
+                else:
+                    os.remove(claimed)
+        except BaseException:
+            for path in delivered:
+                if os.path.exists(path):
+                    os.remove(path)
+            raise
+
+    ##
+    # @brief Moves a file that could not be signed to the quarantine directory.
+    # @param claimed Path of the file in the processing directory.
+    # @param error Exception raised while signing.
+    def _quarantine(self, claimed, error):
+        self.failed += 1
+        name = os.path.basename(claimed)
+        print(f"Error: Could not sign {name}: {error}")
+
+        try:
+            base, ext = os.path.splitext(claimed)
+            for partial in (f"{base}_signed{ext}", utils.sidecar_path(claimed)):
+                if os.path.exists(partial):
+                    os.remove(partial)
+
+            target = _free_path(self.quarantine, name)
+            _move(claimed, target)
+            with open(f"{target}.error.txt", "w", encoding="utf-8") as f:
+                f.write(f"{type(error).__name__}: {error}\n")
+        except OSError as e:
+            # The file stays in the processing directory and returns to the inbox on the next start
+            print(f"Error: Could not quarantine {name}: {e}")